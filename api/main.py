@@ -11,10 +11,44 @@ https://urban-analytics-technology-platform.github.io/demoland-project/book/deve
 """
 
 import os
+import secrets
+import warnings
 from dataclasses import dataclass
+from typing import List, Literal, Optional, Union
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from demoland_engine import batching, threads, timing
+from demoland_engine.admission import AdmissionController, Rejected, scenario_key
+
+# token guarding the admin endpoints, which are disabled if not set
+ADMIN_TOKEN = os.environ.get("DEMOLAND_ADMIN_TOKEN")
+
+# identical concurrent scenarios are computed once, the rest is bounded and
+# rejected with 429 (queue full) or 503 (latency budget in seconds exceeded)
+ADMISSION = AdmissionController(
+    max_concurrency=int(os.environ.get("DEMOLAND_MAX_CONCURRENCY", 2)),
+    max_queue=int(os.environ.get("DEMOLAND_MAX_QUEUE", 32)),
+    latency_budget=float(os.environ.get("DEMOLAND_LATENCY_BUDGET", 10)),
+)
+
+# predictions of concurrent scenarios of an area arriving within the window in
+# milliseconds are stacked into a single call of each model, predicted at once
+# when all the scenarios running at the same time have joined
+if os.environ.get("DEMOLAND_BATCH_WINDOW"):
+    if ADMISSION.max_concurrency == 1:
+        warnings.warn(
+            "DEMOLAND_BATCH_WINDOW has no effect with DEMOLAND_MAX_CONCURRENCY=1, "
+            "as scenarios are computed one at a time. Batching is disabled.",
+            stacklevel=1,
+        )
+    else:
+        batching.enable(
+            window=float(os.environ["DEMOLAND_BATCH_WINDOW"]) / 1000,
+            max_batch=ADMISSION.max_concurrency,
+        )
 
 app = FastAPI()
 
@@ -22,6 +56,7 @@ app.add_middleware(
     CORSMiddleware,
     allow_methods=["POST"],
     allow_origins=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 @dataclass
@@ -33,15 +68,49 @@ class ScenarioRequest:
     """
     scenario_json: dict
     model_identifier: str
+    # additional accessibility modes, a list of modes or "all"
+    modes: Union[List[str], Literal["all"], None] = None
+    # indicators to compute, all if not given
+    indicators: Optional[
+        List[
+            Literal[
+                "air_quality",
+                "house_price",
+                "job_accessibility",
+                "greenspace_accessibility",
+            ]
+        ]
+    ] = None
 
 
 @app.post("/api/scenario")
 async def root_POST(
     body: ScenarioRequest,
+    response: Response,
+    mode: Literal["full", "delta"] = Query(default="full", alias="response"),
+    tolerance: float = Query(default=0, ge=0),
 ):
     """
     Returns a JSON object with the predicted indicator values and signature
-    types for each geometry.
+    types for each geometry. Accessibility of additional modes is included if
+    ``modes`` is given as a list of modes or ``"all"``. If ``indicators`` is
+    given, only the listed indicators are computed and returned.
+
+    With ``?response=delta``, only the geometries whose values differ from the
+    baseline by more than the relative ``tolerance`` are returned, together with
+    the version hash of the baseline, so a client can patch its copy of the
+    baseline (the response to an empty scenario).
+
+    Concurrent identical requests share a single computation. Requests are
+    rejected with 429 if too many scenarios are waiting to be computed
+    (``DEMOLAND_MAX_QUEUE``) and with 503 if the expected latency exceeds
+    ``DEMOLAND_LATENCY_BUDGET`` seconds. At most ``DEMOLAND_MAX_CONCURRENCY``
+    scenarios of an area are computed at the same time. If
+    ``DEMOLAND_BATCH_WINDOW`` is set, model predictions of concurrent scenarios
+    arriving within that many milliseconds are computed in a single call.
+
+    If timing is enabled (``DEMOLAND_TIMING=1``), durations of the individual
+    stages of the computation are returned in the ``Server-Timing`` header.
 
     See the documentation of `scenario_calc`, or the 'Developer Notes' section
     of the DemoLand project book, for more details.
@@ -51,8 +120,118 @@ async def root_POST(
     scenario = body.scenario_json
     model_identifier = body.model_identifier
 
-    # Set the environment variable before importing to avoid loading default
-    # Tyne and Wear data every time this endpoint is called
-    os.environ["DEMOLAND"] = model_identifier
+    kwargs = dict(
+        modes=body.modes,
+        response=mode,
+        tolerance=tolerance,
+        indicators=body.indicators,
+    )
+    key = scenario_key(scenario, model_identifier, **kwargs)
+    try:
+        result, records = await ADMISSION.submit(
+            key, model_identifier, _compute, scenario, model_identifier, **kwargs
+        )
+    except Rejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if records is not None:
+        response.headers["Server-Timing"] = timing.server_timing(records)
+    return result
+
+
+def _compute(scenario, model_identifier, **kwargs):
     from demoland_engine.api import scenario_calc
-    return scenario_calc(scenario, model_identifier)
+
+    if not timing.ENABLED:
+        return scenario_calc(scenario, model_identifier, **kwargs), None
+
+    with timing.collect() as records:
+        result = scenario_calc(scenario, model_identifier, **kwargs)
+    return result, records
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Returns counters and histograms of the durations of the engine stages
+    labeled by the area in the Prometheus text format, populated only if timing
+    is enabled (``DEMOLAND_TIMING=1``), the number of running and waiting
+    scenario computations and the OpenMP threads per prediction call set by
+    ``DEMOLAND_THREADS``.
+    """
+    return PlainTextResponse(
+        timing.render_metrics()
+        + ADMISSION.render_metrics()
+        + threads.render_metrics(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/memory")
+def memory():
+    """
+    Returns the memory in bytes taken by the data of each loaded area broken
+    down by artifact and by cache of derived data, together with the memory
+    budget set by ``DEMOLAND_MEMORY_BUDGET``. If the budget is set, the least
+    recently used areas are dropped once it is exceeded.
+    """
+    from demoland_engine.data import memory_report
+
+    return memory_report()
+
+
+@app.post("/admin/profile")
+async def profile_POST(
+    body: ScenarioRequest,
+    sort: str = "cumulative",
+    limit: int = 50,
+    authorization: Optional[str] = Header(default=None),
+):
+    """
+    Runs a single scenario calculation under cProfile and returns the stats
+    table together with the duration and tracemalloc peak memory of each stage
+    of the engine.
+
+    The calculation waits for the running scenarios and runs alone, as the peak
+    memory is traced for the whole process.
+
+    Available only if the ``DEMOLAND_ADMIN_TOKEN`` environment variable is set
+    and the request carries it as ``Authorization: Bearer <token>``.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404)
+    if authorization is None or not secrets.compare_digest(
+        authorization, f"Bearer {ADMIN_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+    from demoland_engine.profiling import profile_scenario
+
+    key = scenario_key(
+        body.scenario_json, body.model_identifier, profile=True, sort=sort, limit=limit
+    )
+    try:
+        return await ADMISSION.submit_exclusive(
+            key,
+            body.model_identifier,
+            profile_scenario,
+            body.scenario_json,
+            body.model_identifier,
+            sort=sort,
+            limit=limit,
+        )
+    except Rejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,18 @@
+import json
+
+from demoland_engine.api import scenario_calc
+
+from .common import AREAS, N_CHANGED, load_area, random_scenario_dict
+
+
+class ScenarioCalc:
+    params = (AREAS, N_CHANGED)
+    param_names = ["area", "n_changed"]
+    timeout = 300
+
+    def setup(self, area, n_changed):
+        load_area(area)
+        self.scenario = random_scenario_dict(n_changed)
+
+    def time_scenario_calc(self, area, n_changed):
+        json.dumps(scenario_calc(self.scenario, area))
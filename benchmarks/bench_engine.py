@@ -0,0 +1,36 @@
+import pandas as pd
+
+from demoland_engine import Engine, data
+
+from .common import AREAS, load_area
+
+# Engine works on LSOA level which is available only in some areas
+LSOA_AREAS = [area for area in AREAS if "empty_lsoa" in data.files[area]["registry"]]
+
+
+class EngineInit:
+    params = LSOA_AREAS
+    param_names = ["area"]
+    timeout = 300
+
+    def setup(self, area):
+        load_area(area)
+        self.initial_state = pd.read_parquet(data.FILEVAULT.cache.fetch("empty_lsoa"))
+
+    def time_init(self, area):
+        Engine(self.initial_state, random_seed=0)
+
+
+class EngineChange:
+    params = (LSOA_AREAS, [(0, 0, 3), (0, 1, 0.5), (10, 2, 0.2)])
+    param_names = ["area", "change"]
+    timeout = 300
+
+    def setup(self, area, change):
+        load_area(area)
+        initial_state = pd.read_parquet(data.FILEVAULT.cache.fetch("empty_lsoa"))
+        self.engine = Engine(initial_state, random_seed=0)
+
+    def time_change(self, area, change):
+        row, col, val = change
+        self.engine.change((row, col), val)
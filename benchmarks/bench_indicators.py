@@ -0,0 +1,34 @@
+from demoland_engine.data import FILEVAULT
+from demoland_engine.indicators import Model
+
+from .common import AREAS, N_CHANGED, load_area, random_deltas
+
+
+class ModelPredict:
+    params = (AREAS, ["aq_model", "hp_model"])
+    param_names = ["area", "model"]
+
+    def setup(self, area, model):
+        load_area(area)
+        self.model = Model(FILEVAULT["matrix"], FILEVAULT[model])
+        self.X = FILEVAULT["default_data"]
+
+    def time_predict(self, area, model):
+        self.model.predict(self.X)
+
+
+class Accessibility:
+    params = (AREAS, N_CHANGED, ["walk", "transit"])
+    param_names = ["area", "n_changed", "mode"]
+
+    def setup(self, area, n_changed, mode):
+        load_area(area)
+        self.accessibility = FILEVAULT["accessibility"]
+        self.jobs = random_deltas(n_changed, scale=100)
+        self.greenspace = random_deltas(n_changed, scale=10_000)
+
+    def time_job_accessibility(self, area, n_changed, mode):
+        self.accessibility.job_accessibility(self.jobs, mode)
+
+    def time_greenspace_accessibility(self, area, n_changed, mode):
+        self.accessibility.greenspace_accessibility(self.greenspace, mode)
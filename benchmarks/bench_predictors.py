@@ -0,0 +1,22 @@
+from demoland_engine import get_indicators
+from demoland_engine.sampling import get_data
+
+from .common import AREAS, N_CHANGED, load_area, random_scenario
+
+
+class GetIndicators:
+    params = (AREAS, N_CHANGED)
+    param_names = ["area", "n_changed"]
+
+    def setup(self, area, n_changed):
+        load_area(area)
+        self.df = random_scenario(n_changed)
+
+    def time_get_indicators(self, area, n_changed):
+        get_indicators(self.df, random_seed=0)
+
+    def peakmem_get_indicators(self, area, n_changed):
+        get_indicators(self.df, random_seed=0)
+
+    def time_get_data(self, area, n_changed):
+        get_data(self.df, random_seed=0)
@@ -0,0 +1,145 @@
+import os
+import tempfile
+
+from demoland_engine import data
+from demoland_engine.graph import read_parquet
+from demoland_engine.indicators import Features
+from demoland_engine.predictors import INDICATORS, _models, _predict
+from demoland_engine.sampling import get_data
+from demoland_engine.synthetic import generate_area
+
+from .common import random_deltas, random_scenario
+
+# number of cells of synthetic areas
+SIZES = [1_000, 10_000, 50_000, 200_000]
+# chunk sizes and numbers of workers of the chunked inference
+CHUNKS = [None, 20_000]
+WORKERS = [1, 4]
+# the number of cells reachable by car grows quadratically with the travel time,
+# limiting the size of accessibility baselines
+ACCESSIBILITY_SIZES = [1_000, 10_000, 50_000]
+
+
+def _generate(sizes, accessibility):
+    paths = {}
+    for n_cells in sizes:
+        paths[n_cells] = generate_area(
+            n_cells, tempfile.mkdtemp(), accessibility=accessibility
+        )
+    return paths
+
+
+def _load(paths, n_cells):
+    # artifacts are loaded lazily as the accessibility may not be generated
+    area = f"synthetic_{n_cells}"
+    data.register_area(area, paths[n_cells])
+    data.change_area(area)
+
+
+class Scaling:
+    params = (SIZES, [0, 100])
+    param_names = ["n_cells", "n_changed"]
+    timeout = 1200
+
+    def setup_cache(self):
+        return _generate(SIZES, accessibility=False)
+
+    def setup(self, paths, n_cells, n_changed):
+        _load(paths, n_cells)
+        self.df = random_scenario(n_changed)
+        self.matrix = data.FILEVAULT["matrix"]
+        self.matrix.sparse
+        self.vars = data.FILEVAULT["default_data"]
+
+    def time_get_data(self, paths, n_cells, n_changed):
+        get_data(self.df, random_seed=0)
+
+    def peakmem_get_data(self, paths, n_cells, n_changed):
+        get_data(self.df, random_seed=0)
+
+    def time_lag(self, paths, n_cells, n_changed):
+        Features(self.matrix, self.vars)
+
+    def peakmem_lag(self, paths, n_cells, n_changed):
+        Features(self.matrix, self.vars)
+
+
+class ScalingChunked:
+    params = (SIZES, CHUNKS, WORKERS)
+    param_names = ["n_cells", "chunk_size", "n_workers"]
+    timeout = 1200
+
+    def setup_cache(self):
+        return _generate(SIZES, accessibility=False)
+
+    def setup(self, paths, n_cells, chunk_size, n_workers):
+        if chunk_size is None and n_workers > 1:
+            raise NotImplementedError
+        _load(paths, n_cells)
+        self.matrix = data.FILEVAULT["matrix"]
+        self.matrix.sparse
+        self.vars = data.FILEVAULT["default_data"]
+        self.models = _models(self.matrix, INDICATORS)
+
+    def time_predict(self, paths, n_cells, chunk_size, n_workers):
+        _predict(
+            self.models,
+            self.matrix,
+            self.vars,
+            chunk_size=chunk_size,
+            n_workers=n_workers,
+        )
+
+    def peakmem_predict(self, paths, n_cells, chunk_size, n_workers):
+        _predict(
+            self.models,
+            self.matrix,
+            self.vars,
+            chunk_size=chunk_size,
+            n_workers=n_workers,
+        )
+
+
+class ScalingGraph:
+    params = SIZES
+    param_names = ["n_cells"]
+    timeout = 1200
+
+    def setup_cache(self):
+        return _generate(SIZES, accessibility=False)
+
+    def setup(self, paths, n_cells):
+        self.path = os.path.join(paths[n_cells], "matrix")
+
+    def time_read_graph(self, paths, n_cells):
+        read_parquet(self.path).sparse
+
+    def peakmem_read_graph(self, paths, n_cells):
+        read_parquet(self.path).sparse
+
+
+class ScalingAccessibility:
+    params = ACCESSIBILITY_SIZES
+    param_names = ["n_cells"]
+    timeout = 1200
+
+    def setup_cache(self):
+        return _generate(ACCESSIBILITY_SIZES, accessibility=True)
+
+    def setup(self, paths, n_cells):
+        _load(paths, n_cells)
+        self.accessibility = data.FILEVAULT["accessibility"]
+        self.jobs = random_deltas(100, scale=100)
+
+    def time_job_accessibility(self, paths, n_cells):
+        self.accessibility.job_accessibility(self.jobs, "walk")
+
+    def peakmem_job_accessibility(self, paths, n_cells):
+        self.accessibility.job_accessibility(self.jobs, "walk")
+
+    def time_greenspace_accessibility(self, paths, n_cells):
+        self.accessibility.greenspace_accessibility(self.jobs, "walk")
+
+    def peakmem_load_accessibility(self, paths, n_cells):
+        data.change_area(f"synthetic_{n_cells}")
+        data.FILEVAULT["accessibility"]
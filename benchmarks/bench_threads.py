@@ -0,0 +1,49 @@
+"""Throughput of concurrent predictions under different thread limits
+
+Each measurement runs a fixed number of predictions of the air quality model on a
+pool of ``workers`` threads, resembling concurrent scenario computations, with
+the OpenMP threads per call limited to ``threads`` (the library default if None).
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from demoland_engine import threads
+from demoland_engine.data import FILEVAULT
+from demoland_engine.indicators import Features, Model
+
+from .common import AREAS, load_area
+
+# predictions per measurement
+N_CALLS = 16
+
+
+class Throughput:
+    params = (AREAS, [1, 2, 4], [None, 1, 2, 4])
+    param_names = ["area", "workers", "threads"]
+    unit = "predictions/s"
+
+    def setup(self, area, workers, n_threads):
+        load_area(area)
+        self.model = Model(FILEVAULT["matrix"], FILEVAULT["aq_model"])
+        self.features = Features(
+            FILEVAULT["matrix"],
+            FILEVAULT["default_data"],
+            feature_names=self.model.model.feature_names_in_,
+        )
+        self.policy = threads.POLICY
+        threads.set_threads(n_threads)
+
+    def teardown(self, area, workers, n_threads):
+        threads.set_threads(self.policy)
+
+    def track_throughput(self, area, workers, n_threads):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(workers) as executor:
+            list(
+                executor.map(
+                    lambda _: self.model.predict_features(self.features),
+                    range(N_CALLS),
+                )
+            )
+        return N_CALLS / (time.perf_counter() - start)
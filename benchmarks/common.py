@@ -0,0 +1,64 @@
+"""Shared helpers of the benchmark suite"""
+
+import numpy as np
+import pandas as pd
+
+from demoland_engine import data
+
+AREAS = list(data.files)
+
+# number of changed OAs in a synthetic scenario
+N_CHANGED = [0, 1, 10, 100]
+
+
+def load_area(area):
+    """Switch to the study area and load all its artifacts"""
+    data.change_area(area)
+    data.FILEVAULT.load()
+
+
+def random_scenario(k, seed=0):
+    """Generate a scenario changing ``k`` random OAs of the current area
+
+    Parameters
+    ----------
+    k : int
+        number of changed OAs
+    seed : int
+        random seed used to select OAs and their values
+
+    Returns
+    -------
+    DataFrame
+        DataFrame shaped as ``get_empty()``
+    """
+    empty = data.FILEVAULT["empty"]
+    rng = np.random.default_rng(seed)
+    changed = rng.choice(len(empty), size=k, replace=False)
+    df = empty.copy()
+    df.iloc[changed] = np.column_stack(
+        [
+            rng.integers(0, 16, size=k),
+            rng.uniform(-1, 1, size=k),
+            rng.uniform(0, 1, size=k),
+            rng.uniform(0, 1, size=k),
+        ]
+    )
+    return df
+
+
+def random_scenario_dict(k, seed=0):
+    """Generate a scenario changing ``k`` random OAs as expected by ``scenario_calc``"""
+    df = random_scenario(k, seed=seed)
+    return df[df.notna().any(axis=1)].to_dict("index")
+
+
+def random_deltas(k, scale, seed=0):
+    """Generate a Series of ``k`` non-zero deltas as expected by ``Accessibility``"""
+    empty = data.FILEVAULT["empty"]
+    rng = np.random.default_rng(seed)
+    delta = pd.Series(0, index=empty.index.values, dtype=float, name="oa")
+    delta.index.name = "to_id"
+    changed = rng.choice(len(empty), size=k, replace=False)
+    delta.iloc[changed] = rng.uniform(-scale, scale, size=k)
+    return delta
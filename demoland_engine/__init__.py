@@ -1,6 +1,11 @@
 from .predictors import get_indicators, get_indicators_lsoa  # noqa
 from .engine import Engine  # noqa
-from .baselines import get_empty, get_empty_lsoa, get_lsoa_baseline  # noqa
+from .baselines import (  # noqa
+    get_baseline,
+    get_empty,
+    get_empty_lsoa,
+    get_lsoa_baseline,
+)
 
 from importlib.metadata import PackageNotFoundError, version
 
@@ -0,0 +1,324 @@
+"""Admission control of concurrent scenario computations
+
+Used by the FastAPI app to protect the engine from bursts of requests, e.g. a
+workshop loading the same preset at once. :class:`AdmissionController`
+
+- coalesces identical in-flight computations, so concurrent requests with the same
+  :func:`scenario_key` wait on a single computation,
+- limits the number of computations running at the same time per area and never
+  runs computations of different areas at the same time, as the engine holds a
+  single area in memory,
+- serves the areas in turns in the order of arrival, so once a computation of
+  another area is waiting, new computations of the running area wait behind it,
+- runs exclusive computations (e.g. profiling) alone,
+- bounds the number of computations waiting for a slot and rejects new ones once
+  the queue is full (429) or the expected latency exceeds the budget (503).
+"""
+
+import asyncio
+import collections
+import contextvars
+import hashlib
+import json
+import math
+import time
+
+from . import timing
+
+# weight of the latest duration in the moving average of durations per area
+SMOOTHING = 0.2
+
+
+class Rejected(Exception):
+    """Computation rejected by the admission control
+
+    Parameters
+    ----------
+    message : str
+        reason of the rejection
+    status_code : int
+        429 if the queue is full, 503 if the latency budget would be exceeded
+    retry_after : int
+        suggested number of seconds to wait before retrying
+    """
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, int) and not isinstance(value, bool):
+        # signature type 3 and 3.0 lead to the same computation
+        return float(value)
+    return value
+
+
+def scenario_key(scenario, model_identifier, **options):
+    """Canonical hash of a scenario computation
+
+    Parameters
+    ----------
+    scenario : dict[str, dict[str, float]]
+        scenario as accepted by :func:`demoland_engine.api.scenario_calc`
+    model_identifier : str
+        name of the study area
+    **options
+        other arguments of the computation, e.g. ``modes`` or ``response``
+
+    Returns
+    -------
+    str
+        sha256 hex digest independent of the order of keys and of the type of
+        numbers
+    """
+    payload = json.dumps(
+        _canonical([model_identifier, scenario, options]),
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Turn:
+    """Place of a waiting computation of ``area`` in the queue, unique per waiter"""
+
+    __slots__ = ("area", "exclusive")
+
+    def __init__(self, area, exclusive=False):
+        self.area = area
+        self.exclusive = exclusive
+
+
+class AdmissionController:
+    """Coalescing and bounded admission of computations run in a thread pool
+
+    Parameters
+    ----------
+    max_concurrency : int, default 2
+        maximum number of computations of a single area running at the same time
+    max_queue : int, default 32
+        maximum number of computations waiting for a slot across all areas
+    latency_budget : float, default 10
+        maximum expected latency in seconds of a newly admitted computation,
+        estimated from the moving average of durations in the area
+    executor : concurrent.futures.Executor, optional
+        executor running the computations, defaults to the one of the event loop
+
+    Examples
+    --------
+    >>> controller = AdmissionController(max_concurrency=1)
+    >>> key = scenario_key(scenario, "tyne_and_wear")
+    >>> result = await controller.submit(
+    ...     key, "tyne_and_wear", scenario_calc, scenario, "tyne_and_wear"
+    ... )
+    """
+
+    def __init__(
+        self, max_concurrency=2, max_queue=32, latency_budget=10, executor=None
+    ):
+        if max_concurrency < 1:
+            raise ValueError("'max_concurrency' needs to be at least 1.")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.latency_budget = latency_budget
+        self.executor = executor
+        self._inflight = {}
+        self._running = {}
+        self._waiting = {}
+        # turns of the waiting computations in the order of arrival
+        self._queue = collections.deque()
+        self._durations = {}
+        self._active = None
+        self._exclusive = False
+        self._condition = None
+
+    def _admit(self, area):
+        waiting = sum(self._waiting.values())
+        if waiting >= self.max_queue:
+            timing.count("rejected_queue_full", area=area)
+            raise Rejected("Too many scenarios are waiting to be computed.", 429, 1)
+
+        duration = self._durations.get(area)
+        if duration is None:
+            return
+        ahead = self._running.get(area, 0) + self._waiting.get(area, 0)
+        expected = duration * (ahead // self.max_concurrency + 1)
+        if expected > self.latency_budget:
+            timing.count("rejected_latency", area=area)
+            raise Rejected(
+                f"Expected latency of {expected:.1f} s exceeds the budget.",
+                503,
+                math.ceil(expected - self.latency_budget),
+            )
+
+    def _can_run(self, area, exclusive=False):
+        if self._exclusive:
+            return False
+        if exclusive:
+            return not any(self._running.values())
+        if self._active is not None and self._active != area:
+            return False
+        return self._running.get(area, 0) < self.max_concurrency
+
+    def _next(self, turn):
+        """Whether ``turn`` is the computation waiting longest and can run"""
+        return self._queue[0] is turn and self._can_run(turn.area, turn.exclusive)
+
+    def _dequeue(self, turn):
+        if turn in self._queue:
+            self._waiting[turn.area] -= 1
+            self._queue.remove(turn)
+
+    async def _wake(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    def _acquire(self, area, exclusive=False):
+        self._running[area] = self._running.get(area, 0) + 1
+        self._active = area
+        if exclusive:
+            self._exclusive = True
+
+    async def _run(self, area, exclusive, turn, func, args, kwargs):
+        if turn is not None:
+            try:
+                async with self._condition:
+                    try:
+                        await self._condition.wait_for(lambda: self._next(turn))
+                        self._acquire(area, exclusive)
+                    finally:
+                        self._dequeue(turn)
+                        # the computations waiting behind may run now
+                        self._condition.notify_all()
+            finally:
+                # cancelled before getting the lock
+                self._dequeue(turn)
+
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self.executor, lambda: context.run(func, *args, **kwargs)
+            )
+        finally:
+            if not exclusive:
+                duration = time.perf_counter() - start
+                previous = self._durations.get(area, duration)
+                self._durations[area] = previous + SMOOTHING * (duration - previous)
+            async with self._condition:
+                self._running[area] -= 1
+                if exclusive:
+                    self._exclusive = False
+                if not any(self._running.values()):
+                    self._active = None
+                self._condition.notify_all()
+
+    async def submit(self, key, area, func, *args, **kwargs):
+        """Run ``func(*args, **kwargs)`` unless an identical computation is running
+
+        Parameters
+        ----------
+        key : str
+            key identifying identical computations, see :func:`scenario_key`
+        area : str
+            study area of the computation
+        func : callable
+            computation run in the executor
+        *args, **kwargs
+            arguments of ``func``
+
+        Raises
+        ------
+        Rejected
+            if the computation is not admitted
+
+        Returns
+        -------
+        object
+            the result of ``func``, shared by all coalesced requests
+        """
+        return await self._submit(key, area, False, func, args, kwargs)
+
+    async def submit_exclusive(self, key, area, func, *args, **kwargs):
+        """Run ``func(*args, **kwargs)`` with no other computation running
+
+        Like :meth:`submit`, but the computation waits for the running ones to
+        finish and the computations arriving later wait for it. Its duration does
+        not count towards the expected latency of the area.
+        """
+        return await self._submit(key, area, True, func, args, kwargs)
+
+    async def _submit(self, key, area, exclusive, func, args, kwargs):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        future = self._inflight.get(key)
+        if future is not None:
+            timing.count("coalesced", area=area)
+            return await asyncio.shield(future)
+
+        # computations wait behind those of any area waiting already
+        turn = None
+        if self._queue or not self._can_run(area, exclusive):
+            self._admit(area)
+            turn = _Turn(area, exclusive)
+            self._waiting[area] = self._waiting.get(area, 0) + 1
+            self._queue.append(turn)
+        else:
+            self._acquire(area, exclusive)
+        future = asyncio.ensure_future(
+            self._run(area, exclusive, turn, func, args, kwargs)
+        )
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._done(key, turn, f))
+        # the computation continues for the coalesced requests if the caller leaves
+        return await asyncio.shield(future)
+
+    def _done(self, key, turn, future):
+        del self._inflight[key]
+        if turn is not None and turn in self._queue:
+            # cancelled before it started waiting for its turn
+            self._dequeue(turn)
+            asyncio.ensure_future(self._wake())
+        if not future.cancelled():
+            # retrieve the exception if no request is waiting for it anymore
+            future.exception()
+
+    def stats(self):
+        """Number of running and waiting computations per area
+
+        Returns
+        -------
+        dict
+            mapping of area to a dictionary with the number of ``running`` and
+            ``waiting`` computations and the moving average of ``duration`` in
+            seconds
+        """
+        areas = set(self._running) | set(self._waiting) | set(self._durations)
+        return {
+            area: {
+                "running": self._running.get(area, 0),
+                "waiting": self._waiting.get(area, 0),
+                "duration": self._durations.get(area),
+            }
+            for area in sorted(areas)
+        }
+
+    def render_metrics(self):
+        """Render the running and waiting computations as Prometheus gauges"""
+        lines = []
+        stats = self.stats()
+        for name in ("running", "waiting"):
+            lines.append(f"# TYPE demoland_scenarios_{name} gauge")
+            for area, values in stats.items():
+                lines.append(
+                    f'demoland_scenarios_{name}{{area="{area}"}} {values[name]}'
+                )
+        return "\n".join(lines) + "\n"
@@ -1,6 +1,16 @@
-from . import data
-from .baselines import get_empty
-from .predictors import get_indicators
+import threading
+
+import numpy as np
+import pandas as pd
+
+from . import data, timing
+from .baselines import baseline_version, get_baseline, get_empty
+from .predictors import (
+    _from_baseline,
+    _selection,
+    get_indicators,
+    update_indicators,
+)
 
 
 SIG_MAPPING = {
@@ -23,7 +33,117 @@ SIG_MAPPING = {
 }
 
 
-def scenario_calc(scenario: dict, model_identifier: str) -> dict:
+def ingest(scenario, empty):
+    """Convert a scenario to a DataFrame of the changed OAs
+
+    The OA codes are validated at once against the index of the empty template
+    of the area and only the OAs of the scenario are materialized.
+
+    Parameters
+    ----------
+    scenario : dict[str, dict[str, float]]
+        scenario as accepted by :func:`scenario_calc`
+    empty : DataFrame
+        empty template of the area as returned by ``get_empty``
+
+    Returns
+    -------
+    DataFrame
+        DataFrame with the columns of ``empty`` indexed by the OA codes of the
+        scenario
+    """
+    index = pd.Index(list(scenario), dtype=object, name=empty.index.name)
+    positions = empty.index.get_indexer(index)
+    if (positions == -1).any():
+        unknown = index[positions == -1].tolist()
+        raise ValueError(f"OAs {unknown} are not part of the study area.")
+    values = np.empty((len(index), len(empty.columns)))
+    for j, column in enumerate(empty.columns):
+        values[:, j] = np.array(
+            [vals.get(column) for vals in scenario.values()], dtype=float
+        )
+    return pd.DataFrame(values, index=index, columns=empty.columns)
+
+
+def _baseline_response(modes, indicators):
+    """Response to the empty scenario"""
+    baseline = get_baseline()
+    pred = get_indicators(
+        get_empty(), modes=modes, baseline=baseline, indicators=indicators
+    )
+    pred["signature_type"] = baseline.signature_type
+    return pred.dropna(subset=["signature_type"]).to_dict("index")
+
+
+# number of responses to the empty scenario kept per area
+MAX_BASELINE_RESPONSES = 4
+
+# area -> {(baseline version, modes, indicators): response to the empty scenario},
+# the least recently used responses first
+_BASELINE_RESPONSES = {}
+_BASELINE_LOCK = threading.Lock()
+data.register_cache("baseline_responses", _BASELINE_RESPONSES)
+
+
+def _cached_baseline_response(area, version, modes, indicators):
+    """Response to the empty scenario, computed once per area, modes and indicators"""
+    key = (version, tuple(modes), tuple(indicators))
+    with _BASELINE_LOCK:
+        responses = _BASELINE_RESPONSES.setdefault(area, {})
+        if key in responses:
+            responses[key] = responses.pop(key)
+            return responses[key]
+    with timing.stage("baseline"):
+        response = _baseline_response(modes, indicators)
+    with _BASELINE_LOCK:
+        responses = _BASELINE_RESPONSES.setdefault(area, {})
+        responses[key] = response
+        while len(responses) > MAX_BASELINE_RESPONSES:
+            del responses[next(iter(responses))]
+    return response
+
+
+def _normalize_modes(modes):
+    """Sorted unique additional modes of the current area"""
+    accessibility = data.FILEVAULT["accessibility"]
+    if modes == "all":
+        modes = accessibility.modes
+    elif isinstance(modes, str):
+        modes = [modes]
+    modes = sorted(set(modes or []))
+    accessibility.check_modes(modes)
+    return modes
+
+
+RESPONSES = ("full", "delta")
+
+
+def _differs(pred, before, tolerance):
+    """Mask of rows of ``pred`` differing from ``before`` beyond the tolerance
+
+    The tolerance applies to the indicators only, signature types are codes and
+    are compared exactly.
+    """
+    columns = before.columns.drop("signature_type")
+    new = pred[columns].to_numpy(dtype=float)
+    old = before[columns].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        differs = np.abs(new - old) > tolerance * np.abs(old)
+    differs |= np.isnan(new) != np.isnan(old)
+    new_sig = pred.signature_type.to_numpy(dtype=float)
+    old_sig = before.signature_type.to_numpy(dtype=float)
+    sig_differs = (new_sig != old_sig) & ~(np.isnan(new_sig) & np.isnan(old_sig))
+    return differs.any(axis=1) | sig_differs
+
+
+def scenario_calc(
+    scenario: dict,
+    model_identifier: str,
+    modes=None,
+    response: str = "full",
+    tolerance: float = 0,
+    indicators=None,
+) -> dict:
     """
     Parameters
     ----------
@@ -36,6 +156,26 @@ def scenario_calc(scenario: dict, model_identifier: str) -> dict:
         The name of the model to use. See the `data` top-level directory for
         available names.
 
+    modes : list of str | "all", optional
+        Additional accessibility modes returned as 'job_accessibility_{mode}' and
+        'greenspace_accessibility_{mode}' keys in alphabetical order. 'all'
+        denotes all the modes of the area.
+
+    response : {"full", "delta"}, default "full"
+        With 'delta', only area identifiers whose indicator values or signature
+        type differ from the baseline (the empty scenario) are returned.
+
+    tolerance : float, default 0
+        Relative tolerance used with response='delta'. Values differing from the
+        baseline by less than ``tolerance * abs(baseline)`` are considered equal.
+        Signature types are always compared exactly.
+
+    indicators : list of str, optional
+        Indicators to compute, a subset of 'air_quality', 'house_price',
+        'job_accessibility' and 'greenspace_accessibility'. Defaults to all. The
+        models and accessibility passes of the other indicators are skipped and
+        their keys are not returned.
+
     Returns
     -------
     pred : dict[str, dict[str, float]]
@@ -45,22 +185,74 @@ def scenario_calc(scenario: dict, model_identifier: str) -> dict:
         keys of the inner dictionary are 'signature_type', 'house_price',
         'air_quality', 'job_accessibility', and 'greenspace_accessibility'.
 
+        With response='delta', a dictionary with the version hash of the
+        baseline under 'baseline_version' and the values of the area identifiers
+        differing from the baseline under 'values'.
+
+    Only the OAs affected by the scenario are computed, the rest is taken from
+    the baseline. The responses to the empty scenario are computed once per area,
+    modes and indicators and shared by all calls, so they should not be modified.
+    The ``MAX_BASELINE_RESPONSES`` most recently used ones are kept per area as
+    long as the data of the area are loaded.
+
     This function is used both by the FastAPI app (api/main.py) and the Azure
     Functions app (function_app.py).
     """
-    data.change_area(model_identifier)
+    if response not in RESPONSES:
+        raise ValueError(
+            f"'response' needs to be one of {RESPONSES}. '{response}' was given."
+        )
+    indicators = _selection(indicators)
+    timing.count("scenarios", area=model_identifier)
+    with timing.stage("scenario_calc", area=model_identifier):
+        if data.FILEVAULT["case"] != model_identifier:
+            with timing.stage("change_area", area=model_identifier):
+                data.use_area(model_identifier)
+
+        modes = _normalize_modes(modes)
+        version = baseline_version()
+        if response == "full":
+            baseline_response = _cached_baseline_response(
+                model_identifier, version, modes, indicators
+            )
+            if not scenario:
+                return baseline_response
+        elif not scenario:
+            return {"baseline_version": version, "values": {}}
+        baseline = get_baseline()
+
+        with timing.stage("ingest"):
+            changes = ingest(scenario, get_empty())
 
-    df = get_empty()
-    for oa_code, vals in scenario.items():
-        df.loc[oa_code] = vals
+        # indicators of the OAs affected by the change only
+        pred = update_indicators(
+            changes, baseline, random_seed=42, modes=modes, indicators=indicators
+        )
 
-    pred = get_indicators(df, random_seed=42)
-    sig = data.FILEVAULT["oa_key"].primary_type.copy()
+        with timing.stage("signature_type"):
+            sig = baseline.signature_type.loc[pred.index].copy()
+            changed = changes.signature_type.dropna()
+            sig.loc[changed.index] = changed
+            pred["signature_type"] = sig
 
-    sig = sig.map(SIG_MAPPING)
-    changed = df.signature_type[df.signature_type.notna()]
-    sig.loc[changed.index] = changed
-    pred["signature_type"] = sig
-    pred = pred.dropna(subset=["signature_type"])
+        if response == "delta":
+            with timing.stage("delta"):
+                before = _from_baseline(
+                    baseline.loc[pred.index], "walk", modes, indicators
+                )
+                before["signature_type"] = baseline.signature_type.loc[pred.index]
+                pred = pred[
+                    _differs(pred, before, tolerance)
+                    & pred.signature_type.notna().to_numpy()
+                ]
+            with timing.stage("to_dict"):
+                return {"baseline_version": version, "values": pred.to_dict("index")}
 
-    return pred.to_dict("index")
+        with timing.stage("to_dict"):
+            result = dict(baseline_response)
+            for oa_code, values in pred.to_dict("index").items():
+                if pd.isna(values["signature_type"]):
+                    result.pop(oa_code, None)
+                else:
+                    result[oa_code] = values
+        return result
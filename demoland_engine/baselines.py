@@ -1,7 +1,27 @@
+import hashlib
+import os
+import warnings
+
+import joblib
+import numpy as np
 import pandas as pd
 
+from . import data
 from .data import CACHE, FILEVAULT
 
+# registry keys of the artifacts the baseline indicators are derived from
+BASELINE_SOURCES = (
+    "default_data",
+    "empty",
+    "matrix",
+    "oa_key",
+    "air_quality_model",
+    "house_price_model",
+    "accessibility",
+)
+# increase when a change of the engine changes the baseline indicators
+BASELINE_REVISION = 1
+
 
 def get_empty():
     return FILEVAULT["empty"]
@@ -13,3 +33,138 @@ def get_empty_lsoa():
 
 def get_lsoa_baseline():
     return pd.read_parquet(CACHE.fetch("lsoa_baseline.parquet"))
+
+
+def get_baseline():
+    """Get indicators of the empty scenario for all OAs of the current area
+
+    Returns
+    -------
+    DataFrame
+        DataFrame with the air quality and house price predictions, job and
+        greenspace accessibility of all modes as ``job_accessibility_{mode}`` and
+        ``greenspace_accessibility_{mode}`` and the integer signature type code
+    """
+    return FILEVAULT["baseline"]
+
+
+def baseline_version(registry=None):
+    """Hash identifying the baseline indicators of an area
+
+    The hash is derived from the hashes of the artifacts the baseline is computed
+    from, so it changes whenever any of them changes, and from the precision of
+    the engine if it is not ``"float64"``.
+
+    Parameters
+    ----------
+    registry : dict, optional
+        pooch registry of the area, defaults to the current area
+
+    Returns
+    -------
+    str
+    """
+    if registry is None:
+        registry = FILEVAULT.cache.registry
+    digest = hashlib.sha256(f"revision:{BASELINE_REVISION}".encode())
+    for key in BASELINE_SOURCES:
+        digest.update(f"\n{key}:{registry.get(key)}".encode())
+    if data.PRECISION != np.float64:
+        digest.update(f"\nprecision:{data.PRECISION.name}".encode())
+    return digest.hexdigest()[:16]
+
+
+def compute_baseline():
+    """Compute the baseline indicators of the current area
+
+    Returns
+    -------
+    DataFrame
+        see :func:`get_baseline`
+    """
+    from .api import SIG_MAPPING
+    from .predictors import get_indicators
+
+    baseline = get_indicators(get_empty(), random_seed=42, modes="all").drop(
+        columns=["job_accessibility", "greenspace_accessibility"]
+    )
+    baseline["signature_type"] = FILEVAULT["oa_key"].primary_type.map(SIG_MAPPING)
+    return baseline
+
+
+def save_baseline(path, indicators=None, version=None):
+    """Save the baseline indicators of the current area
+
+    The file can be shipped with the area under the ``"baseline"`` key of its
+    registry.
+
+    Parameters
+    ----------
+    path : str
+        path of the file
+    indicators : DataFrame, optional
+        baseline indicators, computed if not given
+    version : str, optional
+        version of the baseline, defaults to the one of the current area
+    """
+    if indicators is None:
+        indicators = compute_baseline()
+    if version is None:
+        version = baseline_version()
+    # write to a temporary file first so a partially written file is never read
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        joblib.dump({"version": version, "indicators": indicators}, f, compress=True)
+    os.replace(tmp_path, path)
+
+
+def load_baseline(cache):
+    """Load the baseline indicators of an area
+
+    The baseline shipped with the area is used if its version matches the hashes
+    of the artifacts. Otherwise, it is computed once and stored in the cache
+    directory next to the artifacts. The shipped baseline is computed in double
+    precision, so it is not used in the single precision mode.
+
+    The baseline is computed from the data of the current area, so the area needs
+    to be the current one unless the baseline has been stored before.
+
+    Parameters
+    ----------
+    cache : pooch.Pooch
+        pooch object of the area
+
+    Returns
+    -------
+    DataFrame
+        see :func:`get_baseline`
+    """
+    version = baseline_version(cache.registry)
+    if "baseline" in cache.registry and data.PRECISION == np.float64:
+        with open(cache.fetch("baseline"), "rb") as f:
+            stored = joblib.load(f)
+        if stored["version"] == version:
+            return stored["indicators"]
+        warnings.warn(
+            "The baseline shipped with the area does not match its artifacts. "
+            "Recomputing.",
+            stacklevel=2,
+        )
+
+    path = os.path.join(cache.abspath, f"baseline_{version}.joblib")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return joblib.load(f)["indicators"]
+
+    if version != baseline_version():
+        raise RuntimeError(
+            "The baseline of an area can only be computed while it is the current "
+            "area. Use change_area first."
+        )
+    indicators = compute_baseline()
+    try:
+        save_baseline(path, indicators, version)
+    except OSError:
+        # read-only cache, keep the baseline only in memory
+        pass
+    return indicators
@@ -0,0 +1,175 @@
+"""Micro-batching of model predictions across concurrent computations
+
+Scenario computations of the FastAPI app run concurrently in a thread pool and each
+of them predicts the rows affected by its scenario separately. When batching is
+enabled, :meth:`demoland_engine.indicators.Model.predict_features` hands the
+feature rows to :class:`MicroBatcher`, which collects the calls of the same model
+arriving within a short window, stacks their rows, predicts them in a single call
+and scatters the predictions back to the waiting computations.
+
+Only the calls of the models are batched. The features and the accessibility
+depend on the scenario and are computed by each computation on its own, while the
+models dominate the time of a scenario.
+
+As models are loaded per area, only computations of the same area are batched.
+A call of a model no other computation is using is predicted at once, so a lone
+computation does not wait. A batch is also predicted as soon as all the
+computations that can run at the same time (``max_batch``) are calling the model.
+Otherwise, batching trades up to ``window`` seconds of latency for fewer, larger
+calls of the models.
+"""
+
+import threading
+
+import numpy as np
+
+from . import threads, timing
+
+# batcher used by the models, batching is disabled if None
+BATCHER = None
+
+
+class _Batch:
+    __slots__ = ("inputs", "rows", "results", "error", "done")
+
+    def __init__(self):
+        self.inputs = []
+        self.rows = 0
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Coalesce concurrent predictions of the same model into a single call
+
+    The first call of a model opens a batch and waits for ``window`` seconds,
+    until the batch holds ``max_rows`` rows or until ``max_batch`` calls of the
+    model are in flight. Calls arriving in the meantime add their rows to the
+    batch and wait for the first one to predict all of them. If no other call of
+    the model is in flight, the call is predicted at once.
+
+    Parameters
+    ----------
+    window : float, default 0.002
+        time in seconds the batch stays open
+    max_rows : int, default 100_000
+        number of rows closing the batch before the end of the window
+    max_batch : int, optional
+        Number of calls of a model in flight closing the batch before the end of
+        the window, typically the number of computations running at the same
+        time, as no other call can join the batch then. Unlimited by default.
+    """
+
+    def __init__(self, window=0.002, max_rows=100_000, max_batch=None):
+        if max_batch is not None and max_batch < 1:
+            raise ValueError("'max_batch' needs to be at least 1.")
+        self.window = window
+        self.max_rows = max_rows
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._closed = threading.Condition(self._lock)
+        # id of model -> open batch
+        self._open = {}
+        # id of model -> number of calls in flight
+        self._inflight = {}
+
+    def predict(self, model, X):
+        """Predict ``X`` using ``model``, together with concurrent calls
+
+        Parameters
+        ----------
+        model : estimator
+            fitted model with a ``predict`` method
+        X : numpy.ndarray
+            feature rows, the same features for all calls of the model
+
+        Returns
+        -------
+        numpy.ndarray
+            predictions of the rows of ``X``
+        """
+        key = id(model)
+        with self._lock:
+            alone = not self._inflight.get(key)
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+            batch = None if alone else self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+            position = len(batch.inputs)
+            batch.inputs.append(X)
+            batch.rows += len(X)
+            if not alone:
+                if leader:
+                    self._open[key] = batch
+                if batch.rows >= self.max_rows or (
+                    self.max_batch is not None
+                    and self._inflight[key] >= self.max_batch
+                ):
+                    # later calls open a new batch
+                    del self._open[key]
+                    self._closed.notify_all()
+                if leader:
+                    self._closed.wait_for(
+                        lambda: self._open.get(key) is not batch, timeout=self.window
+                    )
+                    if self._open.get(key) is batch:
+                        del self._open[key]
+
+        try:
+            if leader:
+                self._run(model, batch)
+            else:
+                batch.done.wait()
+        finally:
+            with self._lock:
+                self._inflight[key] -= 1
+                if not self._inflight[key]:
+                    del self._inflight[key]
+        if batch.error is not None:
+            if leader:
+                raise batch.error
+            # each caller raises its own exception
+            raise RuntimeError(
+                "Prediction of a batch of concurrent calls failed."
+            ) from batch.error
+        return batch.results[position]
+
+    @staticmethod
+    def _run(model, batch):
+        try:
+            X = batch.inputs[0] if len(batch.inputs) == 1 else np.vstack(batch.inputs)
+            with threads.limit():
+                predicted = model.predict(X)
+            bounds = np.cumsum([len(x) for x in batch.inputs])[:-1]
+            batch.results = np.split(predicted, bounds)
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+        timing.count("prediction_batches")
+        timing.count("batched_predictions", value=len(batch.inputs))
+
+
+def enable(window=0.002, max_rows=100_000, max_batch=None):
+    """Batch the predictions of the models across concurrent computations
+
+    Parameters
+    ----------
+    window : float, default 0.002
+        time in seconds a batch stays open
+    max_rows : int, default 100_000
+        number of rows closing a batch before the end of the window
+    max_batch : int, optional
+        number of calls of a model in flight closing a batch before the end of
+        the window, unlimited by default
+    """
+    global BATCHER
+    BATCHER = MicroBatcher(window=window, max_rows=max_rows, max_batch=max_batch)
+
+
+def disable():
+    """Predict each call of the models separately"""
+    global BATCHER
+    BATCHER = None
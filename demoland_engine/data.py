@@ -1,16 +1,53 @@
 import os
+import threading
 
 import joblib
 import numpy as np
 import pandas as pd
 import pooch
 from .graph import read_parquet
+from .memory import area_memory, nbytes
 
 study_area = os.environ.get("DEMOLAND", "tyne_and_wear")
 
+PRECISIONS = ("float64", "float32")
+
+
+def _precision(precision):
+    if str(precision) not in PRECISIONS:
+        raise ValueError(
+            f"'precision' needs to be one of {PRECISIONS}. '{precision}' was given."
+        )
+    return np.dtype(precision)
+
+
+# floating point type of the explanatory variables, their lags and accessibility
+PRECISION = _precision(os.environ.get("DEMOLAND_PRECISION", "float64"))
+
+_UNITS = {"K": 2**10, "M": 2**20, "G": 2**30}
+
+
+def _parse_bytes(value):
+    """Number of bytes given as an int or a string with a K, M or G suffix"""
+    if value is None or isinstance(value, int):
+        return value
+    value = value.strip().upper().rstrip("B")
+    if value[-1:] in _UNITS:
+        return int(float(value[:-1]) * _UNITS[value[-1]])
+    return int(value)
+
+
+# memory in bytes the loaded study areas may take, see set_memory_budget
+MEMORY_BUDGET = _parse_bytes(os.environ.get("DEMOLAND_MEMORY_BUDGET"))
+
 BASE_URL = "https://raw.githubusercontent.com/Urban-Analytics-Technology-Platform/demoland-engine"
 # originally: "https://github.com/Urban-Analytics-Technology-Platform/demoland-engine/raw"
 
+# The baseline indicators of the areas below are computed on their first use and
+# stored in the cache directory next to the artifacts, so only the first start of a
+# host computes them. An area can also ship them under the "baseline" key, as
+# written by the pipeline or by `python -m demoland_engine.write_baselines`, see
+# demoland_engine.baselines.
 files = {
     "tyne_and_wear": {
         "registry": {
@@ -167,80 +204,426 @@ PREDICTOR_RECORD_DTYPE_2 = np.dtype(
 )
 
 
-# pooch processor to fix pyodide bug
-def pyodide_convertor(fname, action, pup):
+def _is_pyodide():
+    """Check whether we are running in a pyodide environment"""
     try:
-        # Check to see if we are in a pyodide environment
-        import pyodide_js
-
-        model = joblib.load(fname)
-        for i, _ in enumerate(model._predictors):
-            model._predictors[i][0].nodes = model._predictors[i][0].nodes.astype(
-                PREDICTOR_RECORD_DTYPE_2, casting="same_kind"
-            )
-        fname_base = fname.split(".")[0]
-        new_fname = f"{fname_base}_pyodide.joblib"
-        joblib.dump(model, new_fname)
-        return new_fname
+        import pyodide_js  # noqa
+
+        return True
     except ImportError:
+        return False
+
+
+def _source_hash(fname, pup):
+    """Get the hash of a file fetched by pooch, preferably from the registry"""
+    if pup is not None:
+        known_hash = pup.registry.get(os.path.basename(fname))
+        if known_hash:
+            return known_hash.split(":")[-1]
+    return pooch.file_hash(fname)
+
+
+# pooch processor to fix pyodide bug
+def pyodide_convertor(fname, action, pup):
+    """Convert a model to be loadable within pyodide
+
+    The converted model is stored next to the original one, keyed by the hash of
+    the source file, so the conversion is done only once per source. The hash of
+    the converted file is stored alongside and validated when the file is reused.
+    Outside of pyodide, the original file is returned.
+    """
+    if not _is_pyodide():
         return fname
 
+    new_fname = f"{fname}_{_source_hash(fname, pup)}_pyodide.joblib"
+    hash_fname = f"{new_fname}.sha256"
+    if os.path.exists(new_fname) and os.path.exists(hash_fname):
+        with open(hash_fname) as f:
+            if pooch.file_hash(new_fname) == f.read().strip():
+                return new_fname
 
-FILEVAULT = dict(
-    case=study_area,
-    empty=pd.read_parquet(CACHE.fetch("empty")),
-    matrix=read_parquet(CACHE.fetch("matrix")),
-    median_form=pd.read_parquet(CACHE.fetch("median_form")),
-    iqr_form=pd.read_parquet(CACHE.fetch("iqr_form")),
-    median_function=pd.read_parquet(CACHE.fetch("median_function")),
-    iqr_function=pd.read_parquet(CACHE.fetch("iqr_function")),
-    oa_key=pd.read_parquet(CACHE.fetch("oa_key")),
-    oa_area=pd.read_parquet(CACHE.fetch("oa_area")),
-    default_data=pd.read_parquet(CACHE.fetch("default_data")),
-)
+    model = joblib.load(fname)
+    for i, _ in enumerate(model._predictors):
+        model._predictors[i][0].nodes = model._predictors[i][0].nodes.astype(
+            PREDICTOR_RECORD_DTYPE_2, casting="same_kind"
+        )
+    # write to a temporary file first so a partially written model is never reused
+    tmp_fname = f"{new_fname}.{os.getpid()}.tmp"
+    joblib.dump(model, tmp_fname)
+    os.replace(tmp_fname, new_fname)
+    with open(hash_fname, "w") as f:
+        f.write(pooch.file_hash(new_fname))
+    return new_fname
+
+
+def _read_joblib(fname):
+    with open(fname, "rb") as f:
+        return joblib.load(f)
+
+
+def _read_data(fname):
+    # compared against the thresholds of the models, so kept in double precision
+    return pd.read_parquet(fname)
+
+
+def _read_accessibility(fname):
+    accessibility = _read_joblib(fname)
+    if PRECISION != np.float64:
+        accessibility = accessibility.astype(PRECISION)
+    return accessibility
+
+
+def _load_baseline(cache):
+    from .baselines import load_baseline
+
+    return load_baseline(cache)
+
+
+# loaders of the artifacts stored in FILEVAULT, getting the pooch object of the area
+ARTIFACTS = {
+    "empty": lambda cache: pd.read_parquet(cache.fetch("empty")),
+    "matrix": lambda cache: read_parquet(cache.fetch("matrix")),
+    "median_form": lambda cache: pd.read_parquet(cache.fetch("median_form")),
+    "iqr_form": lambda cache: pd.read_parquet(cache.fetch("iqr_form")),
+    "median_function": lambda cache: pd.read_parquet(cache.fetch("median_function")),
+    "iqr_function": lambda cache: pd.read_parquet(cache.fetch("iqr_function")),
+    "oa_key": lambda cache: pd.read_parquet(cache.fetch("oa_key")),
+    "oa_area": lambda cache: pd.read_parquet(cache.fetch("oa_area")),
+    "default_data": lambda cache: _read_data(cache.fetch("default_data")),
+    "aq_model": lambda cache: _read_joblib(
+        cache.fetch("air_quality_model", processor=pyodide_convertor)
+    ),
+    "hp_model": lambda cache: _read_joblib(
+        cache.fetch("house_price_model", processor=pyodide_convertor)
+    ),
+    "accessibility": lambda cache: _read_accessibility(cache.fetch("accessibility")),
+    "baseline": lambda cache: _load_baseline(cache),
+}
+
+
+class FileVault(dict):
+    """Data of the current study area, each artifact loaded on its first access
+
+    Loading lazily keeps ``import demoland_engine`` cheap, as the heavy
+    dependencies (xarray, scikit-learn, scipy) are imported only once the
+    artifacts requiring them are used.
+    """
+
+    def __init__(self, study_area):
+        super().__init__(case=study_area)
+        self.cache = pooch.create(
+            path=files[study_area].get("path", pooch.os_cache("demoland_engine")),
+            base_url="",
+            registry=files[study_area]["registry"],
+            urls=files[study_area]["urls"],
+        )
+        # measurements of the loaded artifacts, see memory.area_memory
+        self._measured = None
+
+    def __missing__(self, key):
+        if key not in ARTIFACTS:
+            raise KeyError(key)
+        with _LOCK:
+            # another thread may have loaded the artifact in the meantime
+            if key not in self:
+                self[key] = ARTIFACTS[key](self.cache)
+                if self is FILEVAULT:
+                    _enforce_budget()
+            return self[key]
+
+    def load(self):
+        """Load all the artifacts of the study area"""
+        for key in ARTIFACTS:
+            self[key]
+
+
+def register_area(study_area, path):
+    """Register a study area stored in a local directory
+
+    The directory needs to contain one file per artifact named after its key in
+    the registry (e.g. ``empty`` or ``air_quality_model``), as written by
+    :func:`demoland_engine.synthetic.generate_area`.
+
+    Parameters
+    ----------
+    study_area : str
+        name of the study area
+    path : str
+        directory with the files
+    """
+    registry = {
+        fname: pooch.file_hash(os.path.join(path, fname))
+        for fname in os.listdir(path)
+        if not fname.startswith(".")
+    }
+    files[study_area] = {"registry": registry, "urls": {}, "path": path}
+
+
+FILEVAULT = FileVault(study_area)
+
+# vaults of the study areas kept in memory across change_area, see keep_resident
+RESIDENT = {}
+
+# study areas passed to keep_resident, never dropped to stay within the budget
+PINNED = set()
 
-with open(CACHE.fetch("air_quality_model", processor=pyodide_convertor), "rb") as f:
-    FILEVAULT["aq_model"] = joblib.load(f)
+# guards loading the artifacts and changing the loaded areas, so concurrent
+# computations load each artifact once and see consistent vaults
+_LOCK = threading.RLock()
 
-with open(CACHE.fetch("house_price_model", processor=pyodide_convertor), "rb") as f:
-    FILEVAULT["hp_model"] = joblib.load(f)
+# caches of data derived from the study areas, see register_cache
+_CACHES = {}
 
-with open(CACHE.fetch("accessibility"), "rb") as f:
-    FILEVAULT["accessibility"] = joblib.load(f)
+# (name of the cache, area) -> {key of the entry: (id of the entry, nbytes)}
+_CACHE_NBYTES = {}
+
+
+def register_cache(name, cache):
+    """Account a cache of data derived from the study areas
+
+    The entries of an area count towards the memory of the area (see
+    :func:`memory_report` and :func:`set_memory_budget`) and are dropped together
+    with the data of the area. Each entry is measured once, so the entries must
+    not be modified once cached.
+
+    Parameters
+    ----------
+    name : str
+        name of the cache in the memory report
+    cache : dict
+        cache mapping the names of study areas to dictionaries of their entries
+    """
+    _CACHES[name] = cache
+
+
+def _evict(study_area):
+    """Drop the data derived from a study area from the registered caches"""
+    for name, cache in _CACHES.items():
+        cache.pop(study_area, None)
+        _CACHE_NBYTES.pop((name, study_area), None)
+
+
+def _cache_memory(study_area):
+    """Memory of the entries of a study area in the registered caches"""
+    memory = {}
+    for name, cache in _CACHES.items():
+        # the entries may change in other threads
+        entries = dict(cache.get(study_area, {}))
+        measured = _CACHE_NBYTES.get((name, study_area), {})
+        sizes = {
+            key: measured[key]
+            if key in measured and measured[key][0] == id(entry)
+            else (id(entry), nbytes(entry))
+            for key, entry in entries.items()
+        }
+        _CACHE_NBYTES[(name, study_area)] = sizes
+        if sizes:
+            memory[name] = {
+                "entries": len(sizes),
+                "nbytes": sum(size for _, size in sizes.values()),
+            }
+    return memory
+
+
+def _area_memory(study_area, vault):
+    """Memory of the artifacts and cached data of a study area"""
+    artifacts = area_memory(vault)
+    caches = _cache_memory(study_area)
+    return {
+        "nbytes": sum(a["nbytes"] for a in artifacts.values())
+        + sum(c["nbytes"] for c in caches.values()),
+        "artifacts": artifacts,
+        "caches": caches,
+    }
 
 
 def change_area(study_area):
     """Load the data for another study area
 
+    The data are loaded lazily on their first access. Data of resident areas
+    (see :func:`keep_resident`) loaded so far are kept in memory and reused. If
+    a memory budget is set (see :func:`set_memory_budget`), all areas are kept
+    resident until the budget is exceeded.
+
     Parameters
     ----------
     study_area : str
         name of the study area
     """
-    # replace files within filevault with those representing a new area
-    FILEVAULT["case"] = study_area
-
-    CACHE = pooch.create(
-        path=pooch.os_cache("demoland_engine"),
-        base_url="",
-        registry=files[study_area]["registry"],
-        urls=files[study_area]["urls"],
-    )
-    FILEVAULT["empty"] = pd.read_parquet(CACHE.fetch("empty"))
-    FILEVAULT["matrix"] = read_parquet(CACHE.fetch("matrix"))
-    FILEVAULT["median_form"] = pd.read_parquet(CACHE.fetch("median_form"))
-    FILEVAULT["iqr_form"] = pd.read_parquet(CACHE.fetch("iqr_form"))
-    FILEVAULT["median_function"] = pd.read_parquet(CACHE.fetch("median_function"))
-    FILEVAULT["iqr_function"] = pd.read_parquet(CACHE.fetch("iqr_function"))
-    FILEVAULT["oa_key"] = pd.read_parquet(CACHE.fetch("oa_key"))
-    FILEVAULT["oa_area"] = pd.read_parquet(CACHE.fetch("oa_area"))
-    FILEVAULT["default_data"] = pd.read_parquet(CACHE.fetch("default_data"))
-
-    with open(CACHE.fetch("air_quality_model"), "rb") as f:
-        FILEVAULT["aq_model"] = joblib.load(f)
-
-    with open(CACHE.fetch("house_price_model"), "rb") as f:
-        FILEVAULT["hp_model"] = joblib.load(f)
-
-    with open(CACHE.fetch("accessibility"), "rb") as f:
-        FILEVAULT["accessibility"] = joblib.load(f)
+    with _LOCK:
+        current = FILEVAULT["case"]
+        if MEMORY_BUDGET is not None and current not in RESIDENT:
+            RESIDENT[current] = FileVault(current)
+        if current in RESIDENT:
+            # keep the artifacts loaded since the area became current
+            RESIDENT[current].update(FILEVAULT)
+        vault = RESIDENT.pop(study_area, None)
+        if vault is None:
+            vault = FileVault(study_area)
+        else:
+            # the most recently used areas are the last ones
+            RESIDENT[study_area] = vault
+        # replace files within filevault with those representing a new area
+        FILEVAULT.clear()
+        FILEVAULT.update(vault)
+        FILEVAULT.cache = vault.cache
+        if current not in RESIDENT:
+            _evict(current)
+        _enforce_budget()
+
+
+def use_area(study_area):
+    """Make ``study_area`` the current study area unless it is already
+
+    Unlike checking ``FILEVAULT["case"]`` before calling :func:`change_area`, the
+    check and the change are atomic, so concurrent callers change the area once.
+
+    Parameters
+    ----------
+    study_area : str
+        name of the study area
+    """
+    with _LOCK:
+        if FILEVAULT["case"] != study_area:
+            change_area(study_area)
+
+
+# memory of the areas measured when they were current, used to reserve the
+# memory for an area being loaded again
+_AREA_NBYTES = {}
+
+
+def _enforce_budget():
+    """Drop the least recently used resident areas exceeding the memory budget"""
+    if MEMORY_BUDGET is None:
+        return
+    with _LOCK:
+        current = FILEVAULT["case"]
+        loaded = _area_memory(current, FILEVAULT)["nbytes"]
+        _AREA_NBYTES[current] = max(loaded, _AREA_NBYTES.get(current, 0))
+        total = _AREA_NBYTES[current]
+        sizes = {}
+        for area, vault in RESIDENT.items():
+            if area != current:
+                size = _area_memory(area, vault)["nbytes"]
+                total += size
+                if area not in PINNED:
+                    sizes[area] = size
+        for area, size in sizes.items():
+            if total <= MEMORY_BUDGET:
+                break
+            del RESIDENT[area]
+            _evict(area)
+            total -= size
+
+
+def set_memory_budget(budget):
+    """Set the memory the loaded study areas may take
+
+    Once set, data of study areas are kept in memory after switching to another
+    area. When the data of the current area, including the memory it took when
+    it was loaded previously, and of the resident areas exceed the budget, the
+    least recently used areas are dropped. The data of the current area and of
+    the areas passed to :func:`keep_resident` are never dropped. The budget can also be set using the ``DEMOLAND_MEMORY_BUDGET``
+    environment variable. See :func:`memory_report` for the memory of the areas.
+
+    Parameters
+    ----------
+    budget : int | str | None
+        Number of bytes, either as an int or a string with a K, M or G suffix,
+        e.g. ``"2G"``. None disables the budget.
+    """
+    global MEMORY_BUDGET
+    MEMORY_BUDGET = _parse_bytes(budget)
+    _enforce_budget()
+
+
+def memory_report():
+    """Memory of the loaded study areas
+
+    Returns
+    -------
+    dict
+        dictionary with the ``budget`` in bytes, the ``total`` and the memory of
+        each area under ``areas``, mapping the area to its ``nbytes``, the
+        ``artifacts`` as returned by :func:`demoland_engine.memory.area_memory`
+        and the ``caches``, mapping the name of each cache registered using
+        :func:`register_cache` to the number of ``entries`` of the area and their
+        ``nbytes``. The current area is the last one.
+    """
+    with _LOCK:
+        vaults = dict(RESIDENT)
+        vaults.pop(FILEVAULT["case"], None)
+        vaults[FILEVAULT["case"]] = FILEVAULT
+        areas = {}
+        for area, vault in vaults.items():
+            areas[area] = _area_memory(area, vault)
+        return {
+            "budget": MEMORY_BUDGET,
+            "total": sum(a["nbytes"] for a in areas.values()),
+            "areas": areas,
+        }
+
+
+def keep_resident(study_areas, load=True):
+    """Keep the data of study areas in memory across :func:`change_area` calls
+
+    Useful in long-running processes serving multiple areas, where switching
+    between them would otherwise load the data from disk each time. The areas are
+    never dropped to stay within the memory budget (see :func:`set_memory_budget`).
+
+    Parameters
+    ----------
+    study_areas : list of str
+        names of the study areas
+    load : bool, default True
+        Load all the artifacts of the areas now. The first of the areas is the
+        current one afterwards. Otherwise, the artifacts are loaded on their
+        first access and the current area is not changed.
+    """
+    with _LOCK:
+        for area in study_areas:
+            PINNED.add(area)
+            if area not in RESIDENT:
+                RESIDENT[area] = FileVault(area)
+        if load:
+            for area in study_areas:
+                change_area(area)
+                FILEVAULT.load()
+            if study_areas:
+                change_area(study_areas[0])
+
+
+def set_precision(precision):
+    """Set the floating point precision of the engine
+
+    With ``"float32"``, the job and greenspace vectors of the accessibility and
+    the accessibility computed from them are kept in single precision, halving
+    their memory. The explanatory variables and their spatial lags are compared
+    against the thresholds of the models, so they are kept in double precision
+    and the predictions of the models are the same in both precisions. The
+    baseline indicators are computed separately for each precision. The precision
+    can also be set using the ``DEMOLAND_PRECISION`` environment variable.
+
+    The data loaded so far, including those of resident areas, are dropped and
+    loaded again in the new precision on their first access.
+
+    Parameters
+    ----------
+    precision : {"float64", "float32"}
+        floating point type
+    """
+    global PRECISION
+    with _LOCK:
+        PRECISION = _precision(precision)
+        for area in RESIDENT:
+            RESIDENT[area] = FileVault(area)
+        for cache in _CACHES.values():
+            cache.clear()
+        _CACHE_NBYTES.clear()
+        vault = RESIDENT.get(FILEVAULT["case"])
+        if vault is None:
+            vault = FileVault(FILEVAULT["case"])
+        FILEVAULT.clear()
+        FILEVAULT.update(vault)
+        FILEVAULT.cache = vault.cache
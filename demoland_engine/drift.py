@@ -0,0 +1,100 @@
+"""Drift of the indicators computed in single precision against double precision
+
+Usage::
+
+    python -m demoland_engine.drift [AREA ...] [--seed SEED] [--threshold T]
+
+The indicators of the empty scenario, including the accessibility of all the
+modes, are computed in both precisions (see
+:func:`demoland_engine.data.set_precision`) and compared per OA.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from . import data
+
+
+def precision_drift(area=None, df=None, random_seed=42, threshold=1e-3):
+    """Drift of the indicators computed in float32 against float64
+
+    Parameters
+    ----------
+    area : str, optional
+        study area, defaults to the current one
+    df : DataFrame, optional
+        scenario in the format of :func:`demoland_engine.get_indicators`,
+        defaults to the empty scenario of the area
+    random_seed : int, default 42
+        random seed used when sampling the explanatory variables
+    threshold : float, default 1e-3
+        relative drift counted in the ``above_threshold`` column
+
+    Returns
+    -------
+    DataFrame
+        DataFrame indexed by indicator with the maximum absolute drift
+        (``max_abs``), the mean, 99th percentile and maximum relative drift
+        (``mean_rel``, ``p99_rel``, ``max_rel``) and the share of OAs with the
+        relative drift above the ``threshold``
+    """
+    from .predictors import get_indicators
+
+    current = data.FILEVAULT["case"]
+    if area is None:
+        area = current
+    precision = data.PRECISION
+    results = {}
+    try:
+        for name in data.PRECISIONS:
+            data.set_precision(name)
+            data.change_area(area)
+            scenario = data.FILEVAULT["empty"] if df is None else df
+            results[name] = get_indicators(
+                scenario, random_seed=random_seed, modes="all"
+            )
+    finally:
+        data.set_precision(precision)
+        data.change_area(current)
+
+    expected = results["float64"].to_numpy()
+    actual = results["float32"].to_numpy()
+    absolute = np.abs(actual - expected)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = np.where(absolute == 0, 0, absolute / np.abs(expected))
+    return pd.DataFrame(
+        {
+            "max_abs": absolute.max(axis=0),
+            "mean_rel": relative.mean(axis=0),
+            "p99_rel": np.quantile(relative, 0.99, axis=0),
+            "max_rel": relative.max(axis=0),
+            "above_threshold": (relative > threshold).mean(axis=0),
+        },
+        index=results["float64"].columns,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m demoland_engine.drift",
+        description="Report the drift of the indicators computed in float32.",
+    )
+    parser.add_argument(
+        "areas", nargs="*", help="study areas, the default one if empty"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument(
+        "--threshold", type=float, default=1e-3, help="relative drift to count"
+    )
+    args = parser.parse_args(argv)
+
+    for area in args.areas or [data.FILEVAULT["case"]]:
+        drift = precision_drift(area, random_seed=args.seed, threshold=args.threshold)
+        print(f"{area}:")
+        print(drift.to_string(float_format="{:.3g}".format))
+
+
+if __name__ == "__main__":
+    main()
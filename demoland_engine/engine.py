@@ -2,31 +2,46 @@ import pickle
 import joblib
 import pandas as pd
 
+from . import threads, timing
 from .sampling import get_data, get_signature_values
 from .data import CACHE, FILEVAULT, pyodide_convertor
+from .predictors import ACCESSIBILITY, _selection
 
 
 class Engine:
-    def __init__(self, initial_state, random_seed=None) -> None:
+    def __init__(self, initial_state, random_seed=None, indicators=None) -> None:
         """Initialise the class and get the baseline indicators
 
         Parameters
         ----------
         initial_state : pandas.DataFrame
             DataFrame with specification of the initial state.
+        indicators : list of str, optional
+            Indicators to compute, see :func:`demoland_engine.get_indicators`.
+            Defaults to all. Predictors of the other indicators are not loaded.
         """
-        with open(
-            CACHE.fetch("air_quality_predictor", processor=pyodide_convertor), "rb"
-        ) as f:
-            self.air_quality_predictor = pickle.load(f)
-
-        with open(
-            CACHE.fetch("house_price_predictor", processor=pyodide_convertor), "rb"
-        ) as f:
-            self.house_price_predictor = pickle.load(f)
-
-        with open(CACHE.fetch("accessibility"), "rb") as f:
-            self.accessibility = joblib.load(f)
+        self.selected_indicators = _selection(indicators)
+        self.air_quality_predictor = None
+        self.house_price_predictor = None
+        self.accessibility = None
+
+        if "air_quality" in self.selected_indicators:
+            with open(
+                CACHE.fetch("air_quality_predictor", processor=pyodide_convertor),
+                "rb",
+            ) as f:
+                self.air_quality_predictor = pickle.load(f)
+
+        if "house_price" in self.selected_indicators:
+            with open(
+                CACHE.fetch("house_price_predictor", processor=pyodide_convertor),
+                "rb",
+            ) as f:
+                self.house_price_predictor = pickle.load(f)
+
+        if any(name in self.selected_indicators for name in ACCESSIBILITY):
+            with open(CACHE.fetch("accessibility"), "rb") as f:
+                self.accessibility = joblib.load(f)
 
         self.lsoa_oa = pd.read_parquet(CACHE.fetch("oa_lsoa"))
         self.lsoa_input = pd.read_parquet(CACHE.fetch("empty_lsoa"))
@@ -76,27 +91,35 @@ class Engine:
         self.predict()
 
     def predict(self):
-        aq = self.air_quality_predictor.predict(
-            self.vars.rename(columns={"population_estimate": "population"})
-        )
-        hp = self.house_price_predictor.predict(
-            self.vars.rename(columns={"population_estimate": "population"})
-        )
-        ja = self.accessibility.job_accessibility(self.jobs, "walk")
-        gs = self.accessibility.greenspace_accessibility(self.gsp, "walk")
-        ja = ja.to_pandas()[self.variable_state.index].values
-        gs = gs.to_pandas()[self.variable_state.index].values
+        with threads.limit():
+            self._predict()
+
+    def _predict(self):
+        selected = self.selected_indicators
+        values = {}
+        if "air_quality" in selected:
+            with timing.stage("predict_air_quality"):
+                values["air_quality"] = self.air_quality_predictor.predict(
+                    self.vars.rename(columns={"population_estimate": "population"})
+                )
+        if "house_price" in selected:
+            with timing.stage("predict_house_price"):
+                values["house_price"] = self.house_price_predictor.predict(
+                    self.vars.rename(columns={"population_estimate": "population"})
+                )
+        if "job_accessibility" in selected:
+            with timing.stage("job_accessibility"):
+                ja = self.accessibility.job_accessibility(self.jobs, "walk")
+                values["job_accessibility"] = ja[self.variable_state.index].values
+        if "greenspace_accessibility" in selected:
+            with timing.stage("greenspace_accessibility"):
+                gs = self.accessibility.greenspace_accessibility(self.gsp, "walk")
+                values["greenspace_accessibility"] = gs[
+                    self.variable_state.index
+                ].values
 
         self.indicators = (
-            pd.DataFrame(
-                {
-                    "air_quality": aq,
-                    "house_price": hp,
-                    "job_accessibility": ja,
-                    "greenspace_accessibility": gs,
-                },
-                index=self.variable_state.index,
-            )
+            pd.DataFrame(values, index=self.variable_state.index)
             .assign(lsoa=self.lsoa_oa.lsoa11cd)
             .groupby("lsoa")
             .mean()
@@ -37,7 +37,6 @@ POSSIBILITY OF SUCH DAMAGE.
 
 from functools import cached_property
 import pandas as pd
-from scipy import sparse
 
 ALLOWED_TRANSFORMATIONS = ("O", "B", "R", "D", "V", "C")
 
@@ -135,6 +134,8 @@ class Graph:
         scipy.sparse.COO
             sparse representation of the adjacency
         """
+        from scipy import sparse
+
         # pivot to COO sparse matrix and cast to array
         return sparse.coo_array(
             self._adjacency.astype("Sparse[float]").sparse.to_coo(sort_labels=True)[0]
@@ -1,5 +1,160 @@
+import copy
+import warnings
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
-import xarray as xr
+
+from . import batching, threads
+
+
+@lru_cache(maxsize=32)
+def _feature_index(feature_names, columns):
+    """Positions of ``feature_names`` within ``columns``"""
+    index = pd.Index(columns).get_indexer(feature_names)
+    if (index == -1).any():
+        missing = [name for name, i in zip(feature_names, index) if i == -1]
+        raise ValueError(f"Features {missing} are not available.")
+    return index
+
+
+@lru_cache(maxsize=32)
+def _feature_layout(feature_names, columns):
+    """Map assembled features to columns of the explanatory variables
+
+    Returns positions of plain features and of lagged features within
+    ``feature_names`` and positions of their source columns within ``columns``.
+    """
+    columns = pd.Index(columns)
+    plain = columns.get_indexer(feature_names)
+    lagged = columns.get_indexer(
+        [name[:-4] if name.endswith("_lag") else None for name in feature_names]
+    )
+    lagged[plain != -1] = -1
+    missing = [
+        name for name, i, j in zip(feature_names, plain, lagged) if i == -1 and j == -1
+    ]
+    if missing:
+        raise ValueError(f"Features {missing} are not available.")
+    (positions,) = np.nonzero(plain != -1)
+    (lag_positions,) = np.nonzero(lagged != -1)
+    return positions, plain[positions], lag_positions, lagged[lag_positions]
+
+
+def _sparse(W, layout="csr", dtype=np.float64):
+    """CSR or CSC array of the weights, cached on the graph"""
+    from scipy import sparse
+
+    dtype = np.dtype(dtype)
+    attr = f"_{layout}" if dtype == np.float64 else f"_{layout}_{dtype.name}"
+    if attr not in W.__dict__:
+        matrix = sparse.csr_array(W.sparse, dtype=dtype)
+        W.__dict__[attr] = matrix if layout == "csr" else matrix.tocsc()
+    return W.__dict__[attr]
+
+
+class Features:
+    """Explanatory variables and their spatial lags assembled once per scenario
+
+    The array is shared by all indicator models. Each model selects its own
+    columns using a precomputed integer index. All the lags are computed as a
+    single sparse-dense product and written directly to a preallocated array.
+
+    Parameters
+    ----------
+    W : Graph
+        spatial weights used to compute the lag
+    X : DataFrame
+        explanatory variables
+    feature_names : array-like, optional
+        Order of the columns of the assembled array. Names ending with
+        ``"_lag"`` denote the spatial lag of the corresponding column of ``X``.
+        By default, all columns of ``X`` followed by lags of all columns apart
+        from ``"lat"`` and ``"lon"``.
+    rows : array-like, optional
+        Positions of the rows to assemble, all rows by default. Only the rows
+        and their neighbors are read from ``X`` and converted to ``dtype``.
+    patch : tuple, optional
+        Tuple of positions and a DataFrame of values replacing the rows of ``X``
+        at the positions, without copying ``X``. The DataFrame can contain a
+        subset of the columns of ``X``.
+    dtype : numpy.dtype, default numpy.float64
+        floating point type of the assembled array, used also to compute the lags
+    """
+
+    def __init__(
+        self, W, X, feature_names=None, rows=None, patch=None, dtype=np.float64
+    ):
+        if feature_names is None:
+            if "lat" in X.columns:
+                col_for_lag = X.columns.drop(["lat", "lon"])
+            else:
+                col_for_lag = X.columns.copy()
+            feature_names = list(X.columns) + [f"{col}_lag" for col in col_for_lag]
+
+        self.columns = tuple(feature_names)
+
+        positions, sources, lag_positions, lag_sources = _feature_layout(
+            self.columns, tuple(X.columns)
+        )
+        if rows is None:
+            values = X.to_numpy(dtype=dtype)
+            self.index = X.index
+            if patch is not None:
+                values = values.copy()
+                self._patch(values, X.columns, np.arange(len(values)), patch)
+            self.values = np.empty((X.shape[0], len(self.columns)), dtype=dtype)
+            self.values[:, positions] = values[:, sources]
+            if len(lag_positions):
+                weights = W.sparse if dtype == np.float64 else _sparse(W, dtype=dtype)
+                self.values[:, lag_positions] = weights @ values[:, lag_sources]
+        else:
+            from scipy import sparse
+
+            self.index = X.index[rows]
+            weights = _sparse(W, dtype=dtype)[rows]
+            # rows and their neighbors, lags are computed on their values only
+            needed = np.union1d(rows, weights.indices)
+            values = X.take(needed).to_numpy(dtype=dtype)
+            if patch is not None:
+                self._patch(values, X.columns, needed, patch)
+            self.values = np.empty((len(rows), len(self.columns)), dtype=dtype)
+            self.values[:, positions] = values[
+                np.ix_(np.searchsorted(needed, rows), sources)
+            ]
+            if len(lag_positions):
+                weights = sparse.csr_array(
+                    (
+                        weights.data,
+                        np.searchsorted(needed, weights.indices),
+                        weights.indptr,
+                    ),
+                    shape=(len(rows), len(needed)),
+                )
+                self.values[:, lag_positions] = weights @ values[:, lag_sources]
+
+    @staticmethod
+    def _patch(values, columns, positions, patch):
+        """Replace values of the patched rows present in ``positions``
+
+        Columns of the patch not present in ``columns`` are ignored.
+        """
+        patch_positions, patch_values = patch
+        local = np.searchsorted(positions, patch_positions)
+        local = np.minimum(local, len(positions) - 1)
+        present = positions[local] == patch_positions
+        target = columns.get_indexer(patch_values.columns)
+        known = target != -1
+        values[np.ix_(local[present], target[known])] = patch_values.to_numpy(
+            dtype=float
+        )[np.ix_(present, known)]
+
+    def take(self, feature_names):
+        """Get the array of selected features in the given order"""
+        index = _feature_index(tuple(feature_names), self.columns)
+        if np.array_equal(index, np.arange(len(self.columns))):
+            return self.values
+        return self.values[:, index]
 
 
 class Model:
@@ -10,23 +165,489 @@ class Model:
         self.model = model
 
     def predict(self, X):
-        data = X.copy()
-        if "lat" in X.columns:
-            col_for_lag = X.columns.drop(["lat", "lon"])
+        return self.predict_features(
+            Features(self.W, X, feature_names=self.model.feature_names_in_)
+        )
+
+    def predict_features(self, features):
+        """Predict using features already assembled by :class:`Features`
+
+        The rows are batched with concurrent predictions of the same model if
+        batching is enabled, see :mod:`demoland_engine.batching`.
+        """
+        with warnings.catch_warnings():
+            # features are selected by position matching feature_names_in_
+            warnings.filterwarnings("ignore", message="X does not have valid feature")
+            X = features.take(self.model.feature_names_in_)
+            batcher = batching.BATCHER
+            if batcher is not None:
+                return batcher.predict(self.model, X)
+            with threads.limit():
+                return self.model.predict(X)
+
+
+def _cutoffs(indptr, minutes, max_minutes):
+    """End of the run of travel times within ``max_minutes`` in each row
+
+    Travel times are sorted within each row, so the end is found by a binary search
+    done for all rows at once.
+    """
+    lo = indptr[:-1].astype(np.int64)
+    hi = indptr[1:].astype(np.int64)
+    (active,) = np.nonzero(lo < hi)
+    while len(active):
+        mid = (lo[active] + hi[active]) // 2
+        within = minutes[mid] <= max_minutes
+        lo[active[within]] = mid[within] + 1
+        hi[active[~within]] = mid[~within]
+        active = active[lo[active] < hi[active]]
+    return lo
+
+
+def _longest(travel_times, threshold):
+    """Longest stored travel time in minutes, at least the threshold"""
+    return max(
+        [threshold, *(int(m.data.max()) for m in travel_times.values() if m.nnz)]
+    )
+
+
+class Accessibility:
+    """Accessibility of jobs and greenspace within a travel time
+
+    Travel times between origins and destinations are stored per mode as a sparse
+    ``uint8`` matrix in minutes with rows representing origins (``from_id``) and
+    columns destinations (``to_id``), so the memory grows with the number of
+    reachable pairs rather than with the product of the number of origins and
+    destinations. Entries within each row are sorted by the travel time, so the
+    destinations reachable within ``max_minutes`` form a prefix of each row which
+    is found without scanning the whole matrix.
+
+    Parameters
+    ----------
+    travel_times : dict
+        Mapping of mode to a scipy.sparse CSR array of shape (n_origins,
+        n_destinations) with travel times in minutes. Only stored entries are
+        reachable, including those with zero minutes. Entries are sorted by the
+        travel time within each row.
+    from_id : array-like
+        codes of origins
+    to_id : array-like
+        codes of destinations
+    wpz_population : array-like
+        number of jobs in each destination
+    green_area : array-like, optional
+        area of greenspace in each destination
+    green_accessibility : DataFrame, optional
+        Precomputed baseline greenspace accessibility within ``threshold`` indexed
+        by ``from_id`` with a column per mode, added to the accessibility of
+        ``green_area``. If given, only the ``threshold`` can be used.
+    threshold : int, default 15
+        default maximum travel time in minutes
+    max_minutes : int, optional
+        Horizon in minutes up to which the travel times were computed. Longer
+        travel times cannot be used. Defaults to the longest stored travel time,
+        at least the ``threshold``.
+    """
+
+    def __init__(
+        self,
+        travel_times,
+        from_id,
+        to_id,
+        wpz_population,
+        green_area=None,
+        green_accessibility=None,
+        threshold=15,
+        max_minutes=None,
+    ):
+        from scipy import sparse
+
+        self.from_id = pd.Index(from_id, name="from_id")
+        self.to_id = pd.Index(to_id, name="to_id")
+        self.travel_times = {
+            mode: sparse.csr_array(matrix, dtype=np.uint8)
+            for mode, matrix in travel_times.items()
+        }
+        self.wpz_population = np.asarray(wpz_population, dtype=float)
+        if green_area is None:
+            self.green_area = np.zeros(len(self.to_id))
         else:
-            col_for_lag = X.columns.copy()
-        for col in col_for_lag:
-            data[f"{col}_lag"] = self.W.lag(
-                data[col]
+            self.green_area = np.asarray(green_area, dtype=float)
+        if green_accessibility is not None:
+            green_accessibility = green_accessibility.reindex(
+                index=self.from_id, columns=list(self.travel_times), fill_value=0
             )
-        return self.model.predict(data[self.model.feature_names_in_])
+        self.green_accessibility = green_accessibility
+        self.threshold = threshold
+        if max_minutes is None:
+            max_minutes = _longest(self.travel_times, threshold)
+        if threshold > max_minutes:
+            raise ValueError(
+                f"'threshold' needs to be within the {max_minutes} minutes horizon. "
+                f"'threshold={threshold}' was given."
+            )
+        self.max_minutes = max_minutes
+        self._indexer = (None, None)
+        self._reachable = {}
 
+    @classmethod
+    def from_dataset(cls, baseline):
+        """Create Accessibility from a dense xarray.Dataset
 
-class Accessibility:
-    def __init__(self, baseline):
-        self.baseline = baseline
+        The dataset needs to contain a boolean ``ttm_15`` variable with
+        (from_id, to_id, mode) dimensions, ``wpz_population`` along to_id and
+        ``green_accessibility`` along (from_id, mode). This is the format used by
+        the older releases and is supported for backward compatibility. It does not
+        contain travel times, so only the 15 minute threshold can be used.
+
+        Parameters
+        ----------
+        baseline : xarray.Dataset
+            dense accessibility baseline
 
-    def job_accessibility(self, oa: pd.Series, mode: str):
+        Returns
+        -------
+        Accessibility
+        """
+        from scipy import sparse
+
+        ttm_15 = baseline["ttm_15"].transpose("from_id", "to_id", "mode")
+        modes = baseline["mode"].values.tolist()
+        travel_times = {}
+        for i, mode in enumerate(modes):
+            reachable = sparse.csr_array(ttm_15.values[:, :, i])
+            travel_times[mode] = sparse.csr_array(
+                (
+                    np.full(reachable.nnz, 15, dtype=np.uint8),
+                    reachable.indices,
+                    reachable.indptr,
+                ),
+                shape=reachable.shape,
+            )
+        return cls(
+            travel_times,
+            from_id=baseline["from_id"].values,
+            to_id=baseline["to_id"].values,
+            wpz_population=baseline["wpz_population"].fillna(0).values,
+            green_accessibility=baseline["green_accessibility"]
+            .transpose("from_id", "mode")
+            .to_pandas()
+            .fillna(0),
+            threshold=15,
+            max_minutes=15,
+        )
+
+    @classmethod
+    def from_travel_times(
+        cls, ttm, wpz_population, green_area=None, threshold=15, max_minutes=None
+    ):
+        """Create Accessibility from a long-format travel time matrix
+
+        Travel times are rounded up to whole minutes. Those above 255 minutes are
+        treated as unreachable.
+
+        Parameters
+        ----------
+        ttm : DataFrame
+            travel times in minutes indexed by a (from_id, to_id) MultiIndex with
+            a column per mode. Missing values denote unreachable destinations.
+        wpz_population : Series
+            number of jobs indexed by to_id
+        green_area : Series, optional
+            area of greenspace indexed by to_id
+        threshold : int, default 15
+            default maximum travel time in minutes
+        max_minutes : int, optional
+            horizon in minutes up to which the travel times were computed,
+            defaults to the longest travel time in ``ttm``
+
+        Returns
+        -------
+        Accessibility
+        """
+        from scipy import sparse
+
+        from_codes, from_id = pd.factorize(ttm.index.get_level_values(0))
+        to_codes, to_id = pd.factorize(ttm.index.get_level_values(1))
+        to_id = to_id.append(wpz_population.index.difference(to_id))
+        if green_area is not None:
+            to_id = to_id.append(green_area.index.difference(to_id))
+            green_area = green_area.reindex(to_id, fill_value=0).fillna(0)
+
+        travel_times = {}
+        for mode in ttm.columns:
+            minutes = np.ceil(ttm[mode].to_numpy(dtype=float))
+            reachable = minutes <= np.iinfo(np.uint8).max
+            rows = from_codes[reachable]
+            minutes = minutes[reachable].astype(np.uint8)
+            cols = to_codes[reachable]
+            order = np.lexsort((cols, minutes, rows))
+            indptr = np.zeros(len(from_id) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=len(from_id)), out=indptr[1:])
+            travel_times[mode] = sparse.csr_array(
+                (minutes[order], cols[order], indptr),
+                shape=(len(from_id), len(to_id)),
+            )
+        return cls(
+            travel_times,
+            from_id=from_id,
+            to_id=to_id,
+            wpz_population=wpz_population.reindex(to_id, fill_value=0).fillna(0),
+            green_area=green_area,
+            threshold=threshold,
+            max_minutes=max_minutes,
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_indexer"] = (None, None)
+        state["_reachable"] = {}
+        # store the matrices as raw arrays with the smallest index dtype
+        index_dtype = np.min_scalar_type(len(self.to_id))
+        state["travel_times"] = {
+            mode: (matrix.indptr, matrix.indices.astype(index_dtype), matrix.data)
+            for mode, matrix in self.travel_times.items()
+        }
+        return state
+
+    def __setstate__(self, state):
+        from scipy import sparse
+
+        if "baseline" in state:
+            # pickled by an older release storing the dense xarray.Dataset
+            state = self.from_dataset(state["baseline"]).__dict__
+        else:
+            shape = (len(state["from_id"]), len(state["to_id"]))
+            state["travel_times"] = {
+                mode: sparse.csr_array(
+                    (minutes, idx.astype(np.int32), indptr), shape=shape
+                )
+                for mode, (indptr, idx, minutes) in state["travel_times"].items()
+            }
+            if "max_minutes" not in state:
+                # pickled before the horizon was stored
+                state["max_minutes"] = _longest(
+                    state["travel_times"], state["threshold"]
+                )
+        self.__dict__.update(state)
+
+    def astype(self, dtype):
+        """Accessibility with the job and greenspace vectors cast to ``dtype``
+
+        The travel times are shared with the original object.
+
+        Parameters
+        ----------
+        dtype : numpy.dtype
+            floating point type
+
+        Returns
+        -------
+        Accessibility
+        """
+        new = copy.copy(self)
+        new.wpz_population = self.wpz_population.astype(dtype)
+        new.green_area = self.green_area.astype(dtype)
+        if self.green_accessibility is not None:
+            new.green_accessibility = self.green_accessibility.astype(dtype)
+        new._indexer = (None, None)
+        new._reachable = {}
+        return new
+
+    @property
+    def modes(self):
+        """Modes of transport with known travel times"""
+        return list(self.travel_times)
+
+    def check_modes(self, modes):
+        """Raise ValueError if any of the modes has no travel times
+
+        Parameters
+        ----------
+        modes : str | list of str
+            modes of transport
+        """
+        if isinstance(modes, str):
+            modes = [modes]
+        unknown = [mode for mode in modes if mode not in self.travel_times]
+        if unknown:
+            raise ValueError(
+                f"Modes {unknown} are not available. Available modes are "
+                f"{self.modes}."
+            )
+
+    def reachable(self, mode, max_minutes=None):
+        """Destinations reachable from each origin within ``max_minutes``
+
+        The matrix is built from the prefixes of the rows of the travel time
+        matrix and cached. If a list of modes is given, matrices of individual
+        modes are stacked vertically.
+
+        Parameters
+        ----------
+        mode : str | list of str
+            mode of transport
+        max_minutes : int, optional
+            maximum travel time in minutes, defaults to the ``threshold``
+
+        Returns
+        -------
+        scipy.sparse.csr_array
+            boolean array of shape (n_origins * n_modes, n_destinations)
+        """
+        from scipy import sparse
+
+        self.check_modes(mode)
+        if max_minutes is None:
+            max_minutes = self.threshold
+        if max_minutes > self.max_minutes:
+            raise ValueError(
+                f"Travel times are computed within {self.max_minutes} minutes. "
+                f"'max_minutes={max_minutes}' was given."
+            )
+        if self.green_accessibility is not None and max_minutes != self.threshold:
+            raise ValueError(
+                f"Accessibility is precomputed within {self.threshold} minutes. "
+                f"'max_minutes={max_minutes}' was given."
+            )
+        # concurrent calls may evict entries at any time, so each entry is looked
+        # up once
+        key = (mode if isinstance(mode, str) else tuple(mode), max_minutes)
+        matrix = self._reachable.get(key)
+        if matrix is None:
+            if isinstance(mode, str):
+                matrix = self._filter(mode, max_minutes)
+            else:
+                matrices = [self._reachable.get((m, max_minutes)) for m in mode]
+                matrix = sparse.vstack(
+                    [
+                        self._filter(m, max_minutes) if cached is None else cached
+                        for m, cached in zip(mode, matrices)
+                    ],
+                    format="csr",
+                )
+            if len(self._reachable) >= 8:
+                for oldest in list(self._reachable)[:1]:
+                    self._reachable.pop(oldest, None)
+            self._reachable[key] = matrix
+        return matrix
+
+    def _filter(self, mode, max_minutes):
+        """Boolean matrix of the prefixes of rows within ``max_minutes``"""
+        from scipy import sparse
+
+        times = self.travel_times[mode]
+        start = times.indptr[:-1]
+        counts = _cutoffs(times.indptr, times.data, max_minutes) - start
+        indptr = np.zeros(len(start) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        positions = np.arange(indptr[-1]) + np.repeat(start - indptr[:-1], counts)
+        return sparse.csr_array(
+            (np.ones(len(positions), dtype=bool), times.indices[positions], indptr),
+            shape=times.shape,
+        )
+
+    def reaching(self, destinations, modes=None, max_minutes=None):
+        """Origins reaching any of the destinations by any of the modes
+
+        Parameters
+        ----------
+        destinations : array-like
+            positions of destinations
+        modes : list of str, optional
+            modes of transport, defaults to all the modes
+        max_minutes : int, optional
+            maximum travel time in minutes, defaults to the ``threshold``
+
+        Returns
+        -------
+        numpy.ndarray
+            positions of origins
+        """
+        if modes is None:
+            modes = self.modes
+        modes = list(modes)
+        mask = np.zeros(len(self.to_id))
+        mask[destinations] = 1
+        reached = self.reachable(modes, max_minutes) @ mask
+        (origins,) = np.nonzero(reached.reshape(len(modes), -1).any(axis=0))
+        return origins
+
+    def accessibility(
+        self, jobs, greenspace, modes=None, max_minutes=None, origins=None
+    ):
+        """Job and greenspace accessibility of several modes in a single pass
+
+        Reachability of all the modes is stacked into a single sparse array and
+        multiplied with both the job and the greenspace vectors at once, so the
+        deltas are aligned only once.
+
+        Parameters
+        ----------
+        jobs : pd.Series | None
+            difference in a number of jobs compared to the baseline indexed by
+            to_id, see :meth:`job_accessibility`. The job accessibility is not
+            computed if None.
+        greenspace : pd.Series | None
+            additional square meters of parks indexed by to_id, see
+            :meth:`greenspace_accessibility`. The greenspace accessibility is not
+            computed if None.
+        modes : list of str, optional
+            modes of transport, defaults to all the modes
+        max_minutes : int, optional
+            maximum travel time in minutes, defaults to the ``threshold``
+        origins : array-like, optional
+            positions of origins to compute the accessibility for, defaults to all
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame indexed by from_id with ``job_accessibility_{mode}`` and
+            ``greenspace_accessibility_{mode}`` columns of the computed kinds
+        """
+        if modes is None:
+            modes = self.modes
+        modes = list(modes)
+        kinds = {}
+        if jobs is not None:
+            kinds["job"] = self.wpz_population + self._align(jobs)
+        if greenspace is not None:
+            kinds["greenspace"] = self.green_area + self._align(greenspace)
+        if not kinds:
+            raise ValueError("'jobs' or 'greenspace' needs to be given.")
+        combined = np.column_stack(list(kinds.values()))
+        reachable = self.reachable(modes, max_minutes)
+        if origins is None:
+            origins = slice(None)
+            from_id = self.from_id
+        else:
+            origins = np.asarray(origins)
+            from_id = self.from_id[origins]
+            reachable = reachable[
+                (np.arange(len(modes))[:, None] * len(self.from_id) + origins).ravel()
+            ]
+        result = reachable @ combined
+        result = result.reshape(len(modes), len(from_id), len(kinds))
+        columns = {}
+        for k, kind in enumerate(kinds):
+            if kind == "greenspace" and self.green_accessibility is not None:
+                result[:, :, k] += self.green_accessibility[modes].to_numpy()[origins].T
+            for i, mode in enumerate(modes):
+                columns[f"{kind}_accessibility_{mode}"] = result[i, :, k]
+        return pd.DataFrame(columns, index=from_id)
+
+    def _align(self, oa):
+        """Align values indexed by to_id to the destinations, filling zeros"""
+        index, indexer = self._indexer
+        if index is not oa.index:
+            indexer = self.to_id.get_indexer(oa.index)
+            self._indexer = (oa.index, indexer)
+        aligned = np.zeros(len(self.to_id), dtype=self.wpz_population.dtype)
+        known = indexer != -1
+        aligned[indexer[known]] = np.nan_to_num(oa.to_numpy(dtype=float)[known])
+        return aligned
+
+    def job_accessibility(self, oa: pd.Series, mode: str, max_minutes=None):
         """
         oa : pd.Series
             A series denoteing the difference in a number of jobs compared to the
@@ -48,13 +669,22 @@ class Accessibility:
                 E00175605    51
                 Name: oa, Length: 3795, dtype: int64
 
+        mode : str
+            mode of transport
+        max_minutes : int, optional
+            maximum travel time in minutes, defaults to the ``threshold``
+
+        Returns
+        -------
+        pd.Series
+            number of jobs accessible from each origin, indexed by from_id
         """
-        merged = xr.merge([self.baseline, xr.DataArray.from_series(oa)])
-        merged["combined"] = merged.wpz_population + merged.oa.fillna(0)
-        single_mode = merged.sel(mode=mode)
-        return single_mode["combined"].where(single_mode["ttm_15"]).sum(dim=["to_id"])
+        combined = self.wpz_population + self._align(oa)
+        return pd.Series(
+            self.reachable(mode, max_minutes) @ combined, index=self.from_id
+        )
 
-    def greenspace_accessibility(self, oa: pd.Series, mode: str):
+    def greenspace_accessibility(self, oa: pd.Series, mode: str, max_minutes=None):
         """
         oa : pd.Series
             A series denoteing the additional square meters of parks in an OA.
@@ -76,10 +706,18 @@ class Accessibility:
                 E00175605    1327
                 Name: oa, Length: 3795, dtype: int64
 
+        mode : str
+            mode of transport
+        max_minutes : int, optional
+            maximum travel time in minutes, defaults to the ``threshold``
+
+        Returns
+        -------
+        pd.Series
+            area of greenspace accessible from each origin, indexed by from_id
         """
-        merged = xr.merge([self.baseline, xr.DataArray.from_series(oa)])
-        single_mode = merged.sel(mode=mode)
-        additional_acc = (
-            single_mode["oa"].where(single_mode["ttm_15"]).sum(dim=["to_id"])
-        )
-        return additional_acc + merged.sel(mode=mode)["green_accessibility"]
+        combined = self.green_area + self._align(oa)
+        accessibility = self.reachable(mode, max_minutes) @ combined
+        if self.green_accessibility is not None:
+            accessibility += self.green_accessibility[mode].to_numpy()
+        return pd.Series(accessibility, index=self.from_id)
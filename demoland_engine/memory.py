@@ -0,0 +1,131 @@
+"""Memory accounting of the loaded study areas
+
+The memory of each artifact is estimated by :func:`nbytes`, which counts the
+buffers of numpy arrays, pandas objects, scipy sparse matrices and xarray
+datasets and traverses other objects (e.g. the trees of a model holding their
+node arrays) through their attributes and items.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+def _array_nbytes(array, seen):
+    # views share the buffer of the array they are derived from
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+        if id(array) in seen:
+            return 0
+        seen.add(id(array))
+    return array.nbytes
+
+
+def nbytes(obj, seen=None):
+    """Approximate number of bytes held by an object and the objects it references
+
+    Parameters
+    ----------
+    obj : object
+        object to measure
+    seen : set, optional
+        ids of objects already counted, which are skipped. Pass the same set to
+        measure several objects sharing data.
+
+    Returns
+    -------
+    int
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return _array_nbytes(obj, seen)
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if "scipy.sparse" in sys.modules and sys.modules["scipy.sparse"].issparse(obj):
+        return sum(
+            nbytes(getattr(obj, attr), seen)
+            for attr in ("data", "indices", "indptr", "row", "col", "offsets")
+            if hasattr(obj, attr)
+        )
+    if "xarray" in sys.modules and isinstance(obj, sys.modules["xarray"].Dataset):
+        return int(obj.nbytes)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(nbytes(k, seen) + nbytes(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(nbytes(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += nbytes(obj.__dict__, seen)
+    return size
+
+
+def _state(obj):
+    """Identity of an object and of the data cached on it
+
+    Changes when the object gains attributes or when the dictionaries among its
+    attributes gain, lose or replace entries, e.g. the reachability matrices
+    cached on the accessibility. Arrays and pandas objects are measured from
+    their buffers only.
+    """
+    if isinstance(obj, (np.ndarray, pd.DataFrame, pd.Series, pd.Index)):
+        return id(obj)
+    # copied first as the caches may change in other threads
+    attributes = dict(getattr(obj, "__dict__", {}))
+    return id(obj), tuple(
+        (name, tuple(map(id, value.copy().values())))
+        if isinstance(value, dict)
+        else (name, None)
+        for name, value in attributes.items()
+    )
+
+
+def area_memory(vault):
+    """Memory of the loaded artifacts of an area
+
+    Artifacts are measured once. The measurements are stored on the vault and
+    reused as long as the measured artifacts are still loaded and the data cached
+    on them did not change since, e.g. the sparse weights cached on the graph or
+    the reachability matrices cached on the accessibility, so only newly loaded
+    artifacts are measured.
+
+    Parameters
+    ----------
+    vault : FileVault
+        data of the area
+
+    Returns
+    -------
+    dict
+        mapping of artifact name to a dictionary with its ``type`` and
+        ``nbytes``. Data shared by several artifacts are counted only once.
+    """
+    state = {
+        key: _state(artifact)
+        for key, artifact in vault.items()
+        if key != "case"
+    }
+    measured = getattr(vault, "_measured", None)
+    if measured is not None and all(
+        state.get(key) == entry for key, entry in measured[0].items()
+    ):
+        _, seen, memory = measured
+    else:
+        seen, memory = set(), {}
+    for key, artifact in vault.items():
+        if key != "case" and key not in memory:
+            memory[key] = {
+                "type": type(artifact).__name__,
+                "nbytes": nbytes(artifact, seen),
+            }
+    if hasattr(vault, "_measured"):
+        vault._measured = (state, seen, memory)
+    return {key: dict(memory[key]) for key in state}
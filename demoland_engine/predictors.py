@@ -1,11 +1,43 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 
-from .sampling import get_data
+from . import threads, timing
+from .sampling import get_data, sample_changes
 from .data import CACHE, FILEVAULT
-from .indicators import Model
+from .indicators import Features, Model, _sparse
+
+# indicators predicted by a model, mapped to the FILEVAULT key of the model
+INDICATOR_MODELS = {
+    "air_quality": "aq_model",
+    "house_price": "hp_model",
+}
+
+# accessibility indicators of the default mode
+ACCESSIBILITY = ("job_accessibility", "greenspace_accessibility")
+
+# all the indicators in the order of the columns returned by get_indicators
+INDICATORS = (*INDICATOR_MODELS, *ACCESSIBILITY)
+
+# default number of rows per chunk, all rows are computed at once if not set
+CHUNK_SIZE = int(os.environ.get("DEMOLAND_CHUNK_SIZE", 0)) or None
+# default number of threads computing the chunks
+N_WORKERS = int(os.environ.get("DEMOLAND_WORKERS", 1))
 
 
-def get_indicators(df, mode="walk", random_seed=None):
+def get_indicators(
+    df,
+    mode="walk",
+    random_seed=None,
+    modes=None,
+    baseline=None,
+    indicators=None,
+    chunk_size=None,
+    n_workers=None,
+):
     """Get indicators for all OAs based on 4 variables
 
     Parameters
@@ -56,6 +88,34 @@ def get_indicators(df, mode="walk", random_seed=None):
                 jobs (1).
     mode : str, default "walk"
         Accessibility mode. One of {"transit", "car", "bike", "walk"}
+    random_seed : int, optional
+        random seed used when sampling the explanatory variables
+    modes : list of str | "all", optional
+        Additional accessibility modes returned as ``job_accessibility_{mode}``
+        and ``greenspace_accessibility_{mode}`` columns. ``"all"`` denotes all
+        the modes of the area. All the modes are computed in a single pass reusing
+        the sampled job and greenspace deltas.
+    baseline : DataFrame, optional
+        Indicators of the empty scenario as returned by
+        :func:`demoland_engine.get_baseline`. If given, the models predict only
+        OAs whose explanatory variables or their lags change and the rest is
+        taken from the baseline. An empty scenario is returned directly.
+    indicators : list of str, optional
+        Indicators to compute, a subset of {"air_quality", "house_price",
+        "job_accessibility", "greenspace_accessibility"}. Defaults to all. Only
+        the models and accessibility passes of the selected indicators are run
+        and the features of the models are not assembled if only accessibility
+        is selected. Additional ``modes`` apply to the selected accessibility
+        indicators.
+    chunk_size : int, optional
+        Number of OAs per chunk. If given, the features, predictions and
+        accessibility are computed by chunks of rows and concatenated, so the
+        memory taken by the features is bounded by the chunk size rather than
+        the size of the area. Defaults to the ``DEMOLAND_CHUNK_SIZE``
+        environment variable, all rows at once if not set.
+    n_workers : int, optional
+        Number of threads computing the chunks. Defaults to the
+        ``DEMOLAND_WORKERS`` environment variable or 1.
 
 
     Returns
@@ -64,33 +124,354 @@ def get_indicators(df, mode="walk", random_seed=None):
         DataFrame containing the resulting indicators
     """
     matrix = FILEVAULT["matrix"]
-    aq_model = FILEVAULT["aq_model"]
-    hp_model = FILEVAULT["hp_model"]
     accessibility = FILEVAULT["accessibility"]
 
-    air_quality_predictor = Model(matrix, aq_model)
-    house_price_predictor = Model(matrix, hp_model)
-
-    vars, jobs, gsp = get_data(df, random_seed=random_seed)
-    aq = air_quality_predictor.predict(vars)
-    hp = house_price_predictor.predict(vars)
-    ja = accessibility.job_accessibility(jobs, mode)
-    gs = accessibility.greenspace_accessibility(gsp, mode)
-    ja = ja.to_pandas()[df.index].values
-    gs = gs.to_pandas()[df.index].values
-
-    return pd.DataFrame(
-        {
-            "air_quality": aq,
-            "house_price": hp,
-            "job_accessibility": ja,
-            "greenspace_accessibility": gs,
-        },
-        index=df.index,
+    indicators = _selection(indicators)
+    modes, acc_modes = _modes(accessibility, mode, modes)
+
+    if baseline is not None:
+        result = _from_baseline(baseline.loc[df.index], mode, modes, indicators)
+        updated = update_indicators(
+            df,
+            baseline,
+            mode=mode,
+            random_seed=random_seed,
+            modes=modes,
+            indicators=indicators,
+            chunk_size=chunk_size,
+            n_workers=n_workers,
+        )
+        # affected OAs outside of df are not returned
+        positions = result.index.get_indexer(updated.index)
+        kept = positions != -1
+        result.iloc[positions[kept]] = updated.to_numpy()[kept]
+        return result
+
+    with timing.stage("sampling"):
+        vars, jobs, gsp = get_data(df, random_seed=random_seed)
+
+    chunk_size, n_workers = _chunking(chunk_size, n_workers)
+    values = {}
+    models = _models(matrix, indicators)
+    if models:
+        values.update(
+            _predict(models, matrix, vars, chunk_size=chunk_size, n_workers=n_workers)
+        )
+
+    if any(name in indicators for name in ACCESSIBILITY):
+        acc = _accessibility(
+            accessibility,
+            jobs,
+            gsp,
+            acc_modes,
+            indicators,
+            chunk_size=chunk_size,
+            n_workers=n_workers,
+        )
+        _add_accessibility(values, acc.loc[df.index], mode, modes, indicators)
+
+    return pd.DataFrame(values, index=df.index)
+
+
+def update_indicators(
+    changes,
+    baseline,
+    mode="walk",
+    random_seed=None,
+    modes=None,
+    indicators=None,
+    chunk_size=None,
+    n_workers=None,
+):
+    """Get indicators of OAs affected by a change relative to the baseline
+
+    Only the changed OAs are sampled. The models predict the changed OAs and
+    those having them as neighbors and the accessibility is computed for origins
+    reaching any changed OA. Unchanged OAs are never materialized.
+
+    Parameters
+    ----------
+    changes : DataFrame
+        DataFrame reflecting the intended change of the changed OAs only, in the
+        format of :func:`get_indicators`. Rows with all values missing are
+        ignored.
+    baseline : DataFrame
+        indicators of the empty scenario as returned by
+        :func:`demoland_engine.get_baseline`
+    mode : str, default "walk"
+        Accessibility mode. One of {"transit", "car", "bike", "walk"}
+    random_seed : int, optional
+        random seed used when sampling the explanatory variables
+    modes : list of str | "all", optional
+        additional accessibility modes, see :func:`get_indicators`
+    indicators : list of str, optional
+        indicators to compute, see :func:`get_indicators`
+    chunk_size : int, optional
+        number of affected OAs per chunk, see :func:`get_indicators`
+    n_workers : int, optional
+        number of threads computing the chunks, see :func:`get_indicators`
+
+    Returns
+    -------
+    DataFrame
+        DataFrame containing the resulting indicators of the affected OAs indexed
+        by OA code. Indicators of the other OAs equal the baseline.
+    """
+    matrix = FILEVAULT["matrix"]
+    accessibility = FILEVAULT["accessibility"]
+    default_data = FILEVAULT["default_data"]
+
+    indicators = _selection(indicators)
+    modes, acc_modes = _modes(accessibility, mode, modes)
+
+    changes = changes[changes.notna().any(axis=1)]
+    if changes.empty:
+        return _from_baseline(baseline.iloc[:0], mode, modes, indicators)
+
+    with timing.stage("sampling"):
+        exvars, jobs, gsp = sample_changes(changes, random_seed=random_seed)
+
+    chunk_size, n_workers = _chunking(chunk_size, n_workers)
+    models = _models(matrix, indicators)
+    with_accessibility = any(name in indicators for name in ACCESSIBILITY)
+    changed = default_data.index.get_indexer(changes.index)
+    rows = changed
+    if models:
+        # changed OAs and those having them as neighbors
+        rows = np.union1d(changed, _sparse(matrix, "csc")[:, changed].indices)
+    origins = np.array([], dtype=int)
+    if with_accessibility:
+        # origins reaching changed OAs, OAs not being destinations are reached by
+        # none of them
+        destinations = accessibility.to_id.get_indexer(changes.index)
+        origins = accessibility.reaching(
+            destinations[destinations != -1], modes=acc_modes
+        )
+
+    index = default_data.index[rows].union(
+        accessibility.from_id[origins], sort=False
+    )
+    result = _from_baseline(baseline.loc[index], mode, modes, indicators)
+
+    if models:
+        predictions = _predict(
+            models,
+            matrix,
+            default_data,
+            rows=rows,
+            patch=(changed, exvars),
+            chunk_size=chunk_size,
+            n_workers=n_workers,
+        )
+        positions = result.index.get_indexer(default_data.index[rows])
+        for name, predicted in predictions.items():
+            result.iloc[positions, result.columns.get_loc(name)] = predicted
+
+    if with_accessibility:
+        acc = _accessibility(
+            accessibility,
+            jobs,
+            gsp,
+            acc_modes,
+            indicators,
+            origins=origins,
+            chunk_size=chunk_size,
+            n_workers=n_workers,
+        )
+        values = {}
+        _add_accessibility(values, acc, mode, modes, indicators)
+        result.iloc[
+            result.index.get_indexer(acc.index),
+            result.columns.get_indexer(list(values)),
+        ] = np.column_stack(list(values.values()))
+
+    return result
+
+
+def _modes(accessibility, mode, modes):
+    """Validated additional modes and all the modes including the default one"""
+    if modes is None:
+        modes = []
+    elif modes == "all":
+        modes = accessibility.modes
+    elif isinstance(modes, str):
+        modes = [modes]
+    acc_modes = list(dict.fromkeys([mode, *modes]))
+    accessibility.check_modes(acc_modes)
+    return modes, acc_modes
+
+
+def _selection(indicators):
+    """Validated selection of indicators in the order of INDICATORS"""
+    if indicators is None:
+        return list(INDICATORS)
+    if isinstance(indicators, str):
+        indicators = [indicators]
+    unknown = [name for name in indicators if name not in INDICATORS]
+    if unknown or not indicators:
+        raise ValueError(
+            f"'indicators' needs to be a non-empty subset of {INDICATORS}. "
+            f"{list(indicators)} was given."
+        )
+    return [name for name in INDICATORS if name in indicators]
+
+
+def _models(matrix, indicators):
+    """Models of the selected indicators"""
+    return {
+        name: Model(matrix, FILEVAULT[key])
+        for name, key in INDICATOR_MODELS.items()
+        if name in indicators
+    }
+
+
+def _chunking(chunk_size, n_workers):
+    """Validated chunk size and number of workers, module defaults if None"""
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+    if n_workers is None:
+        n_workers = N_WORKERS
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError(f"'chunk_size' needs to be at least 1. {chunk_size} given.")
+    if n_workers < 1:
+        raise ValueError(f"'n_workers' needs to be at least 1. {n_workers} given.")
+    return chunk_size, n_workers
+
+
+def _chunks(positions, chunk_size):
+    """Split positions into chunks of at most ``chunk_size``"""
+    return [
+        positions[start : start + chunk_size]
+        for start in range(0, len(positions), chunk_size)
+    ]
+
+
+def _map(func, chunks, n_workers):
+    """Apply ``func`` to each chunk, in a pool of threads if ``n_workers > 1``"""
+    if n_workers == 1 or len(chunks) == 1:
+        return [func(chunk) for chunk in chunks]
+    workers = min(n_workers, len(chunks))
+
+    def run(chunk):
+        # the workers share the threads of the native pools
+        with threads.limit(workers):
+            return func(chunk)
+
+    # each chunk runs in a copy of the caller's context to keep its timing records
+    contexts = [contextvars.copy_context() for _ in chunks]
+    with ThreadPoolExecutor(workers) as executor:
+        return list(
+            executor.map(
+                lambda context, chunk: context.run(run, chunk), contexts, chunks
+            )
+        )
+
+
+def _predict_rows(models, W, X, feature_names, rows=None, patch=None):
+    """Predictions of all the models for the rows, sharing the features
+
+    The features are compared against the thresholds of the trees, so they and
+    their lags are assembled in double precision whatever the precision of the
+    engine.
+    """
+    with timing.stage("lag"):
+        features = Features(
+            W, X, feature_names=feature_names, rows=rows, patch=patch
+        )
+    predictions = {}
+    for name, model in models.items():
+        with timing.stage(f"predict_{name}"):
+            predictions[name] = model.predict_features(features)
+    return predictions
+
+
+def _predict(models, W, X, rows=None, patch=None, chunk_size=None, n_workers=1):
+    """Predictions of all the models for the rows, all rows by default
+
+    With ``chunk_size``, the features are assembled and predicted by chunks of
+    rows, reading and converting only the rows of a chunk and their neighbors.
+    """
+    # features and their lags are shared by all the models
+    feature_names = _feature_names(models)
+    n_rows = len(X) if rows is None else len(rows)
+    if chunk_size is None or n_rows <= chunk_size:
+        return _predict_rows(models, W, X, feature_names, rows=rows, patch=patch)
+
+    if rows is None:
+        rows = np.arange(len(X))
+    # built once before the chunks share it
+    _sparse(W)
+    parts = _map(
+        lambda chunk: _predict_rows(models, W, X, feature_names, chunk, patch),
+        _chunks(rows, chunk_size),
+        n_workers,
     )
+    return {name: np.concatenate([part[name] for part in parts]) for name in models}
+
+
+def _accessibility(
+    accessibility,
+    jobs,
+    gsp,
+    modes,
+    indicators,
+    origins=None,
+    chunk_size=None,
+    n_workers=1,
+):
+    """Accessibility of the selected kinds only, by chunks of origins if given"""
+
+    def compute(origins):
+        with timing.stage("accessibility"), threads.limit():
+            return accessibility.accessibility(
+                jobs if "job_accessibility" in indicators else None,
+                gsp if "greenspace_accessibility" in indicators else None,
+                modes=modes,
+                origins=origins,
+            )
+
+    n_origins = len(accessibility.from_id) if origins is None else len(origins)
+    if chunk_size is None or n_origins <= chunk_size:
+        return compute(origins)
+
+    if origins is None:
+        origins = np.arange(n_origins)
+    # built once before the chunks share it
+    accessibility.reachable(modes)
+    return pd.concat(_map(compute, _chunks(origins, chunk_size), n_workers))
 
 
-def get_indicators_lsoa(df):
+def _feature_names(models):
+    """Union of the features of all the models"""
+    return list(
+        dict.fromkeys(
+            name for model in models.values() for name in model.model.feature_names_in_
+        )
+    )
+
+
+def _from_baseline(baseline, mode, modes, indicators=INDICATORS):
+    """Indicators in the format of :func:`get_indicators` taken from the baseline"""
+    values = {
+        name: baseline[name].to_numpy()
+        for name in INDICATOR_MODELS
+        if name in indicators
+    }
+    _add_accessibility(values, baseline, mode, modes, indicators)
+    return pd.DataFrame(values, index=baseline.index)
+
+
+def _add_accessibility(values, acc, mode, modes, indicators=INDICATORS):
+    """Add selected accessibility columns of the default and additional modes"""
+    selected = [name for name in ACCESSIBILITY if name in indicators]
+    for name in selected:
+        values[name] = acc[f"{name}_{mode}"].to_numpy()
+    for name in selected:
+        for m in modes:
+            values[f"{name}_{m}"] = acc[f"{name}_{m}"].to_numpy()
+
+
+def get_indicators_lsoa(df, indicators=None):
     """Get indicators for all LSOAs based on 4 variables
 
     Parameters
@@ -139,6 +520,8 @@ def get_indicators_lsoa(df):
                 Float in a range 0...1 reflecting the balance of job types in the
                 area between entirely blue collar jobs (0) and entirely white collar
                 jobs (1).
+    indicators : list of str, optional
+        Indicators to compute, see :func:`get_indicators`. Defaults to all.
 
 
     Returns
@@ -154,4 +537,9 @@ def get_indicators_lsoa(df):
         .merge(df, left_on="lsoa", right_index=True, how="left")
         .drop(columns="lsoa")
     )
-    return get_indicators(merged).assign(lsoa=lsoa_oa.lsoa11cd).groupby("lsoa").mean()
+    return (
+        get_indicators(merged, indicators=indicators)
+        .assign(lsoa=lsoa_oa.lsoa11cd)
+        .groupby("lsoa")
+        .mean()
+    )
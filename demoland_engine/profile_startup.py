@@ -0,0 +1,112 @@
+"""Report the time needed to import demoland_engine and load the data of an area
+
+Usage::
+
+    python -m demoland_engine.profile_startup [--area AREA] [--top N]
+
+The import is timed in a fresh interpreter using ``python -X importtime``, the
+artifacts are then loaded one by one in the current process. Note that the first
+artifact requiring a heavy dependency (e.g. xarray or scikit-learn) includes the
+time of its import. Entries derived from the other artifacts, such as the baseline
+indicators, are not loaded.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# entries of the vault computed from the other artifacts rather than loaded
+DERIVED = ("baseline",)
+
+
+def import_times(area=None):
+    """Time the import of demoland_engine in a fresh interpreter
+
+    Parameters
+    ----------
+    area : str, optional
+        study area set as the ``DEMOLAND`` environment variable
+
+    Returns
+    -------
+    list of tuple
+        tuples of (module, self time, cumulative time) in seconds, sorted by the
+        cumulative time
+    """
+    env = os.environ.copy()
+    if area is not None:
+        env["DEMOLAND"] = area
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import demoland_engine"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        times.append((module.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return sorted(times, key=lambda t: t[2], reverse=True)
+
+
+def load_times(area=None):
+    """Time the loading of each artifact of a study area
+
+    Parameters
+    ----------
+    area : str, optional
+        study area to load, defaults to the one set on import
+
+    Returns
+    -------
+    dict
+        mapping of artifact name to the time of its loading in seconds, apart
+        from the entries in ``DERIVED``
+    """
+    from . import data
+
+    # a fresh vault, as the vault of a resident area holds the artifacts loaded
+    vault = data.FileVault(area or data.FILEVAULT["case"])
+
+    times = {}
+    for key in data.ARTIFACTS:
+        if key in DERIVED:
+            continue
+        start = time.perf_counter()
+        vault[key]
+        times[key] = time.perf_counter() - start
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m demoland_engine.profile_startup",
+        description="Report the import and artifact load time of demoland_engine.",
+    )
+    parser.add_argument("--area", help="study area to profile")
+    parser.add_argument(
+        "--top", type=int, default=20, help="number of modules to report"
+    )
+    args = parser.parse_args(argv)
+
+    imports = import_times(args.area)
+    print("Import time (cumulative, self) [s]")
+    for module, self_time, cumulative in imports[: args.top]:
+        print(f"  {cumulative:8.3f} {self_time:8.3f}  {module}")
+
+    loads = load_times(args.area)
+    print("Artifact load time [s]")
+    for key, duration in loads.items():
+        print(f"  {duration:8.3f}  {key}")
+
+    total_import = max((t[2] for t in imports), default=0)
+    print(f"Total: import {total_import:.3f} s, load {sum(loads.values()):.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Profiling of a single scenario computation"""
+
+import cProfile
+import io
+import pstats
+import threading
+
+from . import timing
+
+SORT_KEYS = ("cumulative", "tottime", "ncalls")
+
+# only a single profiler can be active at a time
+_LOCK = threading.Lock()
+
+
+def profile_scenario(scenario, model_identifier, sort="cumulative", limit=50):
+    """Profile a single ``scenario_calc`` run
+
+    The computation is run under :mod:`cProfile` and the peak memory allocated
+    within each stage of the engine is tracked using :mod:`tracemalloc`. Both
+    considerably slow down the computation, so the reported durations are useful
+    only relative to each other.
+
+    The traced memory includes the allocations of all the threads of the process,
+    so the peaks are accurate only if no other computation runs at the same time.
+    On Python 3.8, which lacks ``tracemalloc.reset_peak``, the peak of a stage is
+    only known if it exceeds the peaks of the stages before, otherwise the memory
+    at its end is reported.
+
+    Parameters
+    ----------
+    scenario : dict[str, dict[str, float]]
+        scenario as accepted by :func:`demoland_engine.api.scenario_calc`
+    model_identifier : str
+        name of the study area
+    sort : str, default "cumulative"
+        One of {"cumulative", "tottime", "ncalls"} used to sort the stats table
+    limit : int, default 50
+        number of rows of the stats table
+
+    Raises
+    ------
+    RuntimeError
+        if another scenario is being profiled at the same time
+
+    Returns
+    -------
+    dict
+        dictionary with the cProfile stats table under ``"stats"`` and a list of
+        stages with their duration in seconds and peak memory in bytes under
+        ``"stages"``
+    """
+    from .api import scenario_calc
+
+    if sort not in SORT_KEYS:
+        raise ValueError(f"'sort' needs to be one of {SORT_KEYS}. '{sort}' was given.")
+    if not _LOCK.acquire(blocking=False):
+        raise RuntimeError("Another scenario is being profiled.")
+
+    profiler = cProfile.Profile()
+    try:
+        with timing.collect(memory=True) as records:
+            profiler.enable()
+            try:
+                scenario_calc(scenario, model_identifier)
+            finally:
+                profiler.disable()
+    finally:
+        _LOCK.release()
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+
+    return {
+        "stats": stream.getvalue(),
+        "stages": [
+            {"stage": name, "duration": duration, "peak_memory": peak_memory}
+            for name, duration, peak_memory in records
+        ],
+    }
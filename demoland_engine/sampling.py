@@ -1,7 +1,9 @@
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 
-from .data import FILEVAULT
+from .data import FILEVAULT, register_cache
 
 
 SIGS = {
@@ -23,6 +25,95 @@ SIGS = {
     15: "Hyper concentrated urbanity",
 }
 
+JOBS = [
+    "A, B, D, E. Agriculture, energy and water",
+    "C. Manufacturing",
+    "F. Construction",
+    "G, I. Distribution, hotels and restaurants",
+    "H, J. Transport and communication",
+    "K, L, M, N. Financial, real estate, professional and administrative activities",  # noqa
+    "O,P,Q. Public administration, education and health",
+    "R, S, T, U. Other",
+]
+AREA_WEIGHTED = ["population", *JOBS]
+BLUE_COLLAR = [
+    "A, B, D, E. Agriculture, energy and water",
+    "C. Manufacturing",
+    "F. Construction",
+    "H, J. Transport and communication",
+]
+WHITE_COLLAR = [
+    "K, L, M, N. Financial, real estate, professional and administrative activities",  # noqa
+    "O,P,Q. Public administration, education and health",
+]
+GREENSPACE = "Land cover [Green urban areas]"
+
+# bounds of the adjustments of the scenario
+BOUNDS = {"use": (-1, 1), "greenspace": (0, 1), "job_types": (0, 1)}
+
+# explanatory variables returned for changed OAs
+EXVARS = [
+    "population",
+    "A, B, D, E. Agriculture, energy and water",
+    "C. Manufacturing",
+    "F. Construction",
+    "G, I. Distribution, hotels and restaurants",
+    "H, J. Transport and communication",
+    "K, L, M, N. Financial, real estate, professional and administrative activities",  # noqa
+    "O,P,Q. Public administration, education and health",
+    "R, S, T, U. Other",
+    "Land cover [Discontinuous urban fabric]",
+    "Land cover [Continuous urban fabric]",
+    "Land cover [Non-irrigated arable land]",
+    "Land cover [Industrial or commercial units]",
+    "Land cover [Green urban areas]",
+    "Land cover [Pastures]",
+    "Land cover [Sport and leisure facilities]",
+    "sdbAre",
+    "sdbCoA",
+    "ssbCCo",
+    "ssbCor",
+    "ssbSqu",
+    "ssbERI",
+    "ssbCCM",
+    "ssbCCD",
+    "stbOri",
+    "sdcAre",
+    "sscCCo",
+    "sscERI",
+    "sicCAR",
+    "stbCeA",
+    "mtbAli",
+    "mtbNDi",
+    "mtcWNe",
+    "ltbIBD",
+    "sdsSPW",
+    "sdsSWD",
+    "sdsSPO",
+    "sdsLen",
+    "sssLin",
+    "ldsMSL",
+    "mtdDeg",
+    "linP3W",
+    "linP4W",
+    "linPDE",
+    "lcnClo",
+    "ldsCDL",
+    "xcnSCl",
+    "linWID",
+    "stbSAl",
+    "sdsAre",
+    "sisBpM",
+    "misCel",
+    "ltcRea",
+    "ldeAre",
+    "lseCCo",
+    "lseERI",
+    "lteOri",
+    "lteWNB",
+    "lieWCe",
+]
+
 
 def _form(signature_type, variable, random_seed):
     """Get values for form variables
@@ -58,54 +149,123 @@ def _function(signature_type, variable, random_seed):
     )
 
 
-def _populations(defaults, index):
+# registry keys of the artifacts the values sampled for a signature type depend on
+SAMPLING_SOURCES = (
+    "median_form",
+    "iqr_form",
+    "median_function",
+    "iqr_function",
+    "oa_area",
+)
+
+
+# number of sampled OAs kept per area
+MAX_SAMPLES = 4096
+
+# area -> {(sources, OA code, signature type, seed): sampled values}, the least
+# recently used first
+_SAMPLES = {}
+register_cache("samples", _SAMPLES)
+
+
+def _cached_sample(sources, oa_code, signature_type, random_seed):
+    """Sampled values of :func:`_sample`, cached per area
+
+    Values are deterministic given the seed, so they are cached. ``sources`` are
+    hashes of the artifacts of the area the values are derived from, keying the
+    cache. The cached Series must not be modified.
+    """
+    samples = _SAMPLES.setdefault(FILEVAULT["case"], {})
+    key = (sources, oa_code, signature_type, random_seed)
+    values = samples.pop(key, None)
+    if values is None:
+        values = _sample(*key)
+        excess = len(samples) - MAX_SAMPLES + 1
+        if excess > 0:
+            for oldest in list(samples)[:excess]:
+                samples.pop(oldest, None)
+    samples[key] = values
+    return values
+
+
+def _sample(sources, oa_code, signature_type, random_seed):
+    """Sample form and area weighted function values of a signature type"""
+    median_form = FILEVAULT["median_form"]
+    median_function = FILEVAULT["median_function"]
+    oa_area = FILEVAULT["oa_area"].area
+
+    form = pd.Series(
+        [_form(signature_type, var, random_seed) for var in median_form.columns],
+        index=median_form.columns,
+        name=oa_code,
+    ).abs()
+
+    defaults = pd.Series(
+        [
+            _function(signature_type, var, random_seed)
+            for var in median_function.columns
+        ],
+        index=median_function.columns,
+        name=oa_code,
+    ).abs()
+
+    defaults[AREA_WEIGHTED] = defaults[AREA_WEIGHTED] * oa_area[oa_code]
+    return form, defaults
+
+
+def _row_sum(values):
+    """Sum of each row skipping NaN, matching ``Series.sum`` of the row"""
+    # summing along contiguous rows keeps the pairwise summation of pandas
+    return np.nansum(np.ascontiguousarray(values), axis=1)
+
+
+def _populations(defaults, index, layout):
     """Balance residential and workplace population
 
     Workplace population and residential population are treated 1:1 and
     are re-allocated based on the index. The proportion of workplace categories
     is not changed.
+
+    Adjusts rows of the (OA x function variable) array ``defaults`` in place.
+    Rows with a missing index are not changed.
     """
-    if not -1 <= index <= 1:
-        raise ValueError(f"use index must be in a range -1...1. {index} given.")
-    jobs = [
-        "A, B, D, E. Agriculture, energy and water",
-        "C. Manufacturing",
-        "F. Construction",
-        "G, I. Distribution, hotels and restaurants",
-        "H, J. Transport and communication",
-        "K, L, M, N. Financial, real estate, professional and administrative activities",  # noqa
-        "O,P,Q. Public administration, education and health",
-        "R, S, T, U. Other",
-    ]
-    n_jobs = defaults[jobs].sum()
-    if index < 0:
-        difference = index * n_jobs
-    else:
-        difference = index * defaults.population
+    rows = ~np.isnan(index)
+    block = defaults[rows]
+    index = index[rows]
+    jobs = layout["jobs"]
+    population = layout["population"]
+
+    n_jobs = _row_sum(block[:, jobs])
+    difference = np.where(index < 0, index * n_jobs, index * block[:, population])
     new_n_jobs = n_jobs + difference
-    defaults.population = defaults.population - difference
-    multiplier = new_n_jobs / n_jobs
-    defaults[jobs] = defaults[jobs] * multiplier
-    return defaults
+    block[:, population] = block[:, population] - difference
+    with np.errstate(divide="ignore", invalid="ignore"):
+        multiplier = new_n_jobs / n_jobs
+    block[:, jobs] = block[:, jobs] * multiplier[:, None]
+    defaults[rows] = block
 
 
-def _greenspace(defaults, index):
+def _greenspace(defaults, index, layout):
     """Allocate greenspace to OA
 
     Allocate publicly accessible formal greenspace to OA. Defines a portion
     of OA that is covered by gren urban areas. Realistic values are be fairly
     low. The value affects populations and other land cover classes.
+
+    Adjusts rows of the (OA x function variable) array ``defaults`` in place and
+    returns the newly allocated portion of each OA. Rows with a missing index are
+    not changed.
     """
-    if not 0 <= index <= 1:
-        raise ValueError(f"greenspace index must be in a range 0...1. {index} given.")
-    greenspace_orig = defaults["Land cover [Green urban areas]"]
-    newly_allocated_gs = index - greenspace_orig
-    defaults = defaults * (1 - newly_allocated_gs)
-    defaults["Land cover [Green urban areas]"] = index
-    return defaults, newly_allocated_gs
+    rows = ~np.isnan(index)
+    greenspace = layout["greenspace"]
+    newly_allocated_gs = np.zeros(len(index))
+    newly_allocated_gs[rows] = index[rows] - defaults[rows, greenspace]
+    defaults[rows] = defaults[rows] * (1 - newly_allocated_gs[rows])[:, None]
+    defaults[rows, greenspace] = index[rows]
+    return newly_allocated_gs
 
 
-def _job_types(defaults, index):
+def _job_types(defaults, index, layout):
     """Balance job types
 
     Balance job types between manual and white collar workplace categories.
@@ -114,33 +274,64 @@ def _job_types(defaults, index):
 
     The service category is not affected under an assumption that both white
     and blue collar workers need the same amount of services to provide food etc.
+
+    Adjusts rows of the (OA x function variable) array ``defaults`` in place.
+    Rows with a missing index are not changed.
     """
-    if not 0 <= index <= 1:
-        raise ValueError(f"job_types index must be in a range 0...1. {index} given.")
-    blue = [
-        "A, B, D, E. Agriculture, energy and water",
-        "C. Manufacturing",
-        "F. Construction",
-        "H, J. Transport and communication",
-    ]
-    white = [
-        "K, L, M, N. Financial, real estate, professional and administrative activities",  # noqa
-        "O,P,Q. Public administration, education and health",
-    ]
-    blue_collar = defaults[blue].sum()
-    white_collar = defaults[white].sum()
+    rows = ~np.isnan(index)
+    block = defaults[rows]
+    index = index[rows]
+    blue = layout["blue"]
+    white = layout["white"]
+
+    blue_collar = _row_sum(block[:, blue])
+    white_collar = _row_sum(block[:, white])
     total = blue_collar + white_collar
 
     new_blue = total * (1 - index)
     new_white = total * index
 
-    blue_diff = new_blue / blue_collar
-    white_diff = new_white / white_collar
+    with np.errstate(divide="ignore", invalid="ignore"):
+        blue_diff = new_blue / blue_collar
+        white_diff = new_white / white_collar
+
+    block[:, blue] = block[:, blue] * blue_diff[:, None]
+    block[:, white] = block[:, white] * white_diff[:, None]
+    defaults[rows] = block
 
-    defaults[blue] = defaults[blue] * blue_diff
-    defaults[white] = defaults[white] * white_diff
 
-    return defaults
+@lru_cache(maxsize=8)
+def _function_layout(columns):
+    """Positions of the variables adjusted by a scenario within ``columns``"""
+    columns = pd.Index(columns)
+    return {
+        "population": columns.get_loc("population"),
+        "jobs": columns.get_indexer(JOBS),
+        "blue": columns.get_indexer(BLUE_COLLAR),
+        "white": columns.get_indexer(WHITE_COLLAR),
+        "greenspace": columns.get_loc(GREENSPACE),
+    }
+
+
+def _validate(df):
+    """Check the bounds of the adjustments of all OAs at once
+
+    Raises a single ValueError listing every OA out of the bounds.
+    """
+    errors = []
+    for name, (low, high) in BOUNDS.items():
+        if name not in df.columns:
+            continue
+        values = df[name].to_numpy(dtype=float)
+        invalid = (values < low) | (values > high)
+        if invalid.any():
+            given = ", ".join(
+                f"{value} given for {code}"
+                for code, value in zip(df.index[invalid], values[invalid])
+            )
+            errors.append(f"{name} index must be in a range {low}...{high}. {given}.")
+    if errors:
+        raise ValueError("\n".join(errors))
 
 
 def get_signature_values(
@@ -212,141 +403,113 @@ def get_signature_values(
     -------
     Series
     """
+    df = pd.DataFrame(
+        {
+            "signature_type": [signature_type],
+            "use": [use],
+            "greenspace": [greenspace],
+            "job_types": [job_types],
+        },
+        index=[oa_code],
+    )
+    exvars, jobs_diff, gs_diff = sample_changes(df, random_seed=random_seed)
+    newly_allocated_gs = 0 if pd.isna(greenspace) else gs_diff.iloc[0]
+    return (exvars.iloc[0], jobs_diff.iloc[0], newly_allocated_gs)
+
+
+def sample_changes(df, random_seed=None):
+    """Get explanatory variables of changed OAs only
+
+    The values of OAs changed to another signature type are sampled (see
+    :func:`get_signature_values`), those of other OAs are taken from the default
+    data. The ``use``, ``greenspace`` and ``job_types`` adjustments are then
+    applied to all the OAs at once.
+
+    Parameters
+    ----------
+    df : DataFrame
+        DataFrame reflecting the intended change of the changed OAs only.
+    random_seed : int, optional
+        Random seed
+
+    Raises
+    ------
+    ValueError
+        if any of the adjustments is out of its bounds, listing all such OAs
+
+    Returns
+    -------
+    tuple
+        DataFrame of the explanatory variables of changed OAs and Series of
+        the difference in jobs and newly allocated greenspace, all indexed by OA
+        code. Variables which are not sampled are not included.
+    """
     median_form = FILEVAULT["median_form"]
     median_function = FILEVAULT["median_function"]
     oa_key = FILEVAULT["oa_key"]
     oa_area = FILEVAULT["oa_area"].area
     default_data = FILEVAULT["default_data"]
 
-    if signature_type is not None:
-        signature_type = SIGS[signature_type]
-    orig_type = oa_key.primary_type[oa_code]
-    if signature_type is not None and orig_type != signature_type:
-        form = pd.Series(
-            [_form(signature_type, var, random_seed) for var in median_form.columns],
-            index=median_form.columns,
-            name=oa_code,
-        ).abs()
-
-        defaults = pd.Series(
-            [
-                _function(signature_type, var, random_seed)
-                for var in median_function.columns
-            ],
-            index=median_function.columns,
-            name=oa_code,
-        ).abs()
-
-        area_weighted = [
-            "population",
-            "A, B, D, E. Agriculture, energy and water",
-            "C. Manufacturing",
-            "F. Construction",
-            "G, I. Distribution, hotels and restaurants",
-            "H, J. Transport and communication",
-            "K, L, M, N. Financial, real estate, professional and administrative activities",  # noqa
-            "O,P,Q. Public administration, education and health",
-            "R, S, T, U. Other",
-        ]
-        defaults[area_weighted] = defaults[area_weighted] * oa_area[oa_code]
-
-    else:
-        form = default_data.loc[oa_code][median_form.columns]
-        defaults = default_data.loc[oa_code][median_function.columns]
-
-    # population
-    if not pd.isna(use):
-        defaults = _populations(defaults, index=use)
-
-    jobs = [
-        "A, B, D, E. Agriculture, energy and water",
-        "C. Manufacturing",
-        "F. Construction",
-        "G, I. Distribution, hotels and restaurants",
-        "H, J. Transport and communication",
-        "K, L, M, N. Financial, real estate, professional and administrative activities",  # noqa
-        "O,P,Q. Public administration, education and health",
-        "R, S, T, U. Other",
-    ]
+    _validate(df)
+    layout = _function_layout(tuple(median_function.columns))
 
-    # greenspace
-    if not pd.isna(greenspace):
-        defaults, newly_allocated_gs = _greenspace(defaults, greenspace)
-        newly_allocated_gs = newly_allocated_gs * oa_area[oa_code]
-    else:
-        newly_allocated_gs = 0
-
-    if not pd.isna(job_types):
-        defaults = _job_types(defaults, job_types)
-
-    orig_n_jobs = default_data.loc[oa_code][jobs].sum()
-    n_jobs_diff = defaults[jobs].sum() - orig_n_jobs
-
-    df = pd.concat([defaults, form])
-
-    order = [
-        "population",
-        "A, B, D, E. Agriculture, energy and water",
-        "C. Manufacturing",
-        "F. Construction",
-        "G, I. Distribution, hotels and restaurants",
-        "H, J. Transport and communication",
-        "K, L, M, N. Financial, real estate, professional and administrative activities",  # noqa
-        "O,P,Q. Public administration, education and health",
-        "R, S, T, U. Other",
-        "Land cover [Discontinuous urban fabric]",
-        "Land cover [Continuous urban fabric]",
-        "Land cover [Non-irrigated arable land]",
-        "Land cover [Industrial or commercial units]",
-        "Land cover [Green urban areas]",
-        "Land cover [Pastures]",
-        "Land cover [Sport and leisure facilities]",
-        "sdbAre",
-        "sdbCoA",
-        "ssbCCo",
-        "ssbCor",
-        "ssbSqu",
-        "ssbERI",
-        "ssbCCM",
-        "ssbCCD",
-        "stbOri",
-        "sdcAre",
-        "sscCCo",
-        "sscERI",
-        "sicCAR",
-        "stbCeA",
-        "mtbAli",
-        "mtbNDi",
-        "mtcWNe",
-        "ltbIBD",
-        "sdsSPW",
-        "sdsSWD",
-        "sdsSPO",
-        "sdsLen",
-        "sssLin",
-        "ldsMSL",
-        "mtdDeg",
-        "linP3W",
-        "linP4W",
-        "linPDE",
-        "lcnClo",
-        "ldsCDL",
-        "xcnSCl",
-        "linWID",
-        "stbSAl",
-        "sdsAre",
-        "sisBpM",
-        "misCel",
-        "ltcRea",
-        "ldeAre",
-        "lseCCo",
-        "lseERI",
-        "lteOri",
-        "lteWNB",
-        "lieWCe",
+    def adjustment(name):
+        if name not in df.columns:
+            return np.full(len(df), np.nan)
+        return df[name].to_numpy(dtype=float)
+
+    signature_types = [
+        None if pd.isna(sig) else SIGS[sig] for sig in df["signature_type"]
     ]
-    exvars = df[order]
-    return (exvars, n_jobs_diff, newly_allocated_gs)
+    orig_types = oa_key.primary_type.loc[df.index].to_numpy()
+    sampled = np.array(
+        [
+            sig is not None and sig != orig
+            for sig, orig in zip(signature_types, orig_types)
+        ],
+        dtype=bool,
+    )
+
+    form = np.empty((len(df), len(median_form.columns)))
+    defaults = np.empty((len(df), len(median_function.columns)))
+    if sampled.any():
+        # sampling without a seed is not reproducible, hence not cached
+        sample = _cached_sample if random_seed is not None else _sample
+        sources = tuple(FILEVAULT.cache.registry.get(key) for key in SAMPLING_SOURCES)
+        for i in np.flatnonzero(sampled):
+            sampled_form, sampled_defaults = sample(
+                sources, df.index[i], signature_types[i], random_seed
+            )
+            form[i] = sampled_form.to_numpy()
+            defaults[i] = sampled_defaults.to_numpy()
+    if not sampled.all():
+        # the existing values measured in place are used
+        measured = df.index[~sampled]
+        form[~sampled] = default_data.loc[measured, median_form.columns].to_numpy(
+            dtype=float
+        )
+        defaults[~sampled] = default_data.loc[
+            measured, median_function.columns
+        ].to_numpy(dtype=float)
+
+    _populations(defaults, adjustment("use"), layout)
+    area = oa_area.loc[df.index].to_numpy(dtype=float)
+    newly_allocated_gs = _greenspace(defaults, adjustment("greenspace"), layout) * area
+    _job_types(defaults, adjustment("job_types"), layout)
+
+    orig_n_jobs = _row_sum(default_data.loc[df.index, JOBS].to_numpy(dtype=float))
+    n_jobs_diff = _row_sum(defaults[:, layout["jobs"]]) - orig_n_jobs
+
+    exvars = pd.DataFrame(
+        np.hstack([defaults, form]),
+        index=df.index,
+        columns=median_function.columns.append(median_form.columns),
+    )[EXVARS]
+    jobs_diff = pd.Series(n_jobs_diff, index=df.index, dtype=float, name="oa")
+    jobs_diff.index.name = "to_id"
+    gs_diff = pd.Series(newly_allocated_gs, index=df.index, dtype=float, name="oa")
+    gs_diff.index.name = "to_id"
+    return (exvars, jobs_diff, gs_diff)
 
 
 def get_data(df, random_seed=None):
@@ -362,19 +525,12 @@ def get_data(df, random_seed=None):
     # change values in changed locations
     mask = df.notna().any(axis=1)
     if mask.any():
-        exvars_fill = []
-        jobs_diff_fill = []
-        gs_diff_fill = []
-        for vals in df[mask].itertuples(name=None):
-            ex, j, gs = get_signature_values(*vals, random_seed=random_seed)
-            exvars_fill.append(ex)
-            jobs_diff_fill.append(j)
-            gs_diff_fill.append(gs)
-
-        exvars_change = pd.concat(exvars_fill, axis=1).T.astype(float)
+        exvars_change, jobs_diff_change, gs_diff_change = sample_changes(
+            df[mask], random_seed=random_seed
+        )
         exvars.loc[mask, exvars_change.columns] = exvars_change
 
-        jobs_diff[mask] = jobs_diff_fill
-        gs_diff[mask] = gs_diff_fill
+        jobs_diff[mask] = jobs_diff_change.to_numpy()
+        gs_diff[mask] = gs_diff_change.to_numpy()
 
     return (exvars, jobs_diff, gs_diff)
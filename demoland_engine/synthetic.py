@@ -0,0 +1,303 @@
+"""Synthetic study areas for scaling tests
+
+Generates a schema-valid study area of an arbitrary size on a hexagonal lattice
+resembling an H3 grid. The explanatory variables are sampled from the global
+median and IQR tables per signature type, the spatial weights link each cell to
+cells within a number of lattice rings and the accessibility assumes a travel time
+proportional to the lattice distance.
+
+Usage::
+
+    python -m demoland_engine.synthetic N_CELLS PATH [--seed SEED]
+
+The area is written in the layout of the pooch cache and can be registered using
+:func:`demoland_engine.data.register_area`.
+"""
+
+import argparse
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from . import data
+
+# relative frequency of signature types in a hexagonal grid of Tyne and Wear
+SIGNATURE_WEIGHTS = {
+    "Warehouse/Park land": 1589,
+    "Open sprawl": 1549,
+    "Urban buffer": 1291,
+    "Dense residential neighbourhoods": 583,
+    "Dense urban neighbourhoods": 370,
+    "Connected residential neighbourhoods": 320,
+    "Disconnected suburbia": 123,
+    "Accessible suburbia": 114,
+    "Countryside agriculture": 99,
+    "Local urbanity": 92,
+    "Gridded residential quarters": 32,
+    "Regional urbanity": 18,
+}
+
+# maximum travel time in minutes stored in the accessibility, covering the 10, 15
+# and 20 minute variants. The number of stored pairs grows quadratically with it.
+MAX_MINUTES = 20
+
+# travel time per lattice ring and a fixed overhead in minutes per mode
+MODES = {
+    "transit": (1.5, 5),
+    "car": (0.75, 2),
+    "bike": (1.5, 0),
+    "walk": (4, 0),
+}
+
+AREA_WEIGHTED = [
+    "population",
+    "A, B, D, E. Agriculture, energy and water",
+    "C. Manufacturing",
+    "F. Construction",
+    "G, I. Distribution, hotels and restaurants",
+    "H, J. Transport and communication",
+    "K, L, M, N. Financial, real estate, professional and administrative activities",  # noqa
+    "O,P,Q. Public administration, education and health",
+    "R, S, T, U. Other",
+]
+
+# artifacts shared by all areas which are copied from the source area
+GLOBAL_FILES = [
+    "median_form",
+    "iqr_form",
+    "median_function",
+    "iqr_function",
+    "air_quality_model",
+    "house_price_model",
+]
+
+
+def lattice(n_cells):
+    """Axial coordinates of a roughly square patch of a hexagonal lattice
+
+    Parameters
+    ----------
+    n_cells : int
+        number of cells
+
+    Returns
+    -------
+    numpy.ndarray
+        (n_cells, 2) array of axial (q, r) coordinates
+    """
+    width = int(np.ceil(np.sqrt(n_cells)))
+    i = np.arange(n_cells)
+    row, col = np.divmod(i, width)
+    return np.column_stack([col - row // 2, row])
+
+
+def lattice_neighbors(coords, k):
+    """Pairs of cells within ``k`` rings of each other, including self-pairs
+
+    Parameters
+    ----------
+    coords : numpy.ndarray
+        axial coordinates as returned by :func:`lattice`
+    k : int
+        number of rings
+
+    Returns
+    -------
+    tuple
+        arrays of focal and neighbor positions and the lattice distance
+    """
+    n_cells = len(coords)
+    width = int(np.ceil(np.sqrt(n_cells)))
+    focal, neighbor, distance = [], [], []
+    for dq in range(-k, k + 1):
+        for dr in range(max(-k, -dq - k), min(k, -dq + k) + 1):
+            q = coords[:, 0] + dq
+            r = coords[:, 1] + dr
+            col = q + r // 2
+            position = r * width + col
+            valid = (r >= 0) & (col >= 0) & (col < width) & (position < n_cells)
+            focal.append(np.nonzero(valid)[0])
+            neighbor.append(position[valid])
+            distance.append(
+                np.full(valid.sum(), (abs(dq) + abs(dr) + abs(dq + dr)) // 2)
+            )
+    focal = np.concatenate(focal)
+    neighbor = np.concatenate(neighbor)
+    order = np.lexsort((neighbor, focal))
+    return focal[order], neighbor[order], np.concatenate(distance)[order]
+
+
+def _sample(median, iqr, signature_types, rng):
+    """Sample values per signature type as done in ``sampling``"""
+    loc = median.loc[signature_types].to_numpy()
+    scale = iqr.loc[signature_types].to_numpy() / 5
+    return pd.DataFrame(
+        np.abs(rng.normal(loc, scale)), columns=median.columns
+    ).fillna(0)
+
+
+def generate_area(
+    n_cells,
+    path,
+    k=5,
+    cell_area=91_000,
+    accessibility=True,
+    source_area="tyne_and_wear_hex",
+    seed=0,
+):
+    """Generate a synthetic study area
+
+    Parameters
+    ----------
+    n_cells : int
+        number of cells
+    path : str
+        directory to write the files to
+    k : int, default 5
+        number of lattice rings linked by the spatial weights
+    cell_area : float, default 91000
+        area of a cell in square meters, roughly matching H3 resolution 9
+    accessibility : bool, default True
+        generate the accessibility baseline
+    source_area : str, default "tyne_and_wear_hex"
+        study area providing the global tables and models
+    seed : int, default 0
+        random seed
+
+    Returns
+    -------
+    str
+        the path
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(path, exist_ok=True)
+
+    source = data.FileVault(source_area)
+    for key in GLOBAL_FILES:
+        shutil.copyfile(source.cache.fetch(key), os.path.join(path, key))
+    median_form = pd.read_parquet(os.path.join(path, "median_form"))
+    iqr_form = pd.read_parquet(os.path.join(path, "iqr_form"))
+    median_function = pd.read_parquet(os.path.join(path, "median_function"))
+    iqr_function = pd.read_parquet(os.path.join(path, "iqr_function"))
+    model = joblib.load(os.path.join(path, "air_quality_model"))
+
+    coords = lattice(n_cells)
+    index = pd.Index([f"89{i:013x}" for i in range(n_cells)], name="to_id")
+
+    weights = np.array(list(SIGNATURE_WEIGHTS.values()), dtype=float)
+    primary_type = rng.choice(
+        list(SIGNATURE_WEIGHTS), size=n_cells, p=weights / weights.sum()
+    )
+    pd.DataFrame({"primary_type": primary_type}, index=index).to_parquet(
+        os.path.join(path, "oa_key")
+    )
+    area = cell_area * (1 + rng.normal(0, 0.001, size=n_cells))
+    pd.DataFrame({"area": area}, index=index).to_parquet(os.path.join(path, "oa_area"))
+
+    default_data = pd.concat(
+        [
+            _sample(median_function, iqr_function, primary_type, rng),
+            _sample(median_form, iqr_form, primary_type, rng),
+        ],
+        axis=1,
+    )
+    default_data[AREA_WEIGHTED] = default_data[AREA_WEIGHTED].mul(area, axis=0)
+    # position on the lattice with a spacing of ~320m around Newcastle
+    size = np.sqrt(2 * cell_area / (3 * np.sqrt(3)))
+    x = np.sqrt(3) * size * (coords[:, 0] + coords[:, 1] / 2)
+    y = 1.5 * size * coords[:, 1]
+    default_data["lat"] = 54.8 + y / 111_320
+    default_data["lon"] = -1.85 + x / (111_320 * np.cos(np.radians(54.8)))
+    default_data.index = index
+    # variables used by the models followed by those used only when sampling
+    columns = [c for c in model.feature_names_in_ if not c.endswith("_lag")]
+    default_data = default_data[
+        columns + [c for c in default_data.columns if c not in columns]
+    ]
+    default_data.to_parquet(os.path.join(path, "default_data"))
+
+    pd.DataFrame(
+        np.nan,
+        index=index,
+        columns=["signature_type", "use", "greenspace", "job_types"],
+    ).to_parquet(os.path.join(path, "empty"))
+
+    focal, neighbor, distance = lattice_neighbors(coords, k)
+    not_self = distance > 0
+    focal, neighbor = focal[not_self], neighbor[not_self]
+    cardinality = np.bincount(focal, minlength=n_cells)
+    pd.DataFrame(
+        {"weight": 1 / cardinality[focal]},
+        index=pd.MultiIndex.from_arrays(
+            [index[focal], index[neighbor]], names=["focal", "neighbor"]
+        ),
+    ).to_parquet(os.path.join(path, "matrix"))
+
+    if accessibility:
+        _write_accessibility(path, coords, index, default_data)
+
+    return path
+
+
+def _write_accessibility(path, coords, index, default_data):
+    from scipy import sparse
+
+    from .indicators import Accessibility
+
+    n_cells = len(index)
+    jobs = default_data[AREA_WEIGHTED[1:]].sum(axis=1).to_numpy()
+    greenspace = (
+        default_data["Land cover [Green urban areas]"].to_numpy()
+        * pd.read_parquet(os.path.join(path, "oa_area")).area.to_numpy()
+    )
+
+    travel_times = {}
+    for mode, (per_ring, overhead) in MODES.items():
+        rings = int((MAX_MINUTES - overhead) // per_ring)
+        focal, neighbor, distance = lattice_neighbors(coords, rings)
+        minutes = np.ceil(distance * per_ring + overhead).astype(np.uint8)
+        # sort by the travel time within each origin
+        order = np.lexsort((neighbor, minutes, focal))
+        indptr = np.zeros(n_cells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(focal, minlength=n_cells), out=indptr[1:])
+        travel_times[mode] = sparse.csr_array(
+            (minutes[order], neighbor[order], indptr), shape=(n_cells, n_cells)
+        )
+
+    accessibility = Accessibility(
+        travel_times,
+        from_id=index,
+        to_id=index,
+        wpz_population=jobs,
+        green_area=greenspace,
+        max_minutes=MAX_MINUTES,
+    )
+    with open(os.path.join(path, "accessibility"), "wb") as f:
+        joblib.dump(accessibility, f, compress=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m demoland_engine.synthetic",
+        description="Generate a synthetic study area.",
+    )
+    parser.add_argument("n_cells", type=int, help="number of cells")
+    parser.add_argument("path", help="directory to write the files to")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--no-accessibility",
+        action="store_true",
+        help="skip the accessibility baseline",
+    )
+    args = parser.parse_args(argv)
+
+    generate_area(
+        args.n_cells, args.path, accessibility=not args.no_accessibility, seed=args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
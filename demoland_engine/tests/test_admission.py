@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from demoland_engine.admission import AdmissionController, Rejected, scenario_key
+
+
+def test_scenario_key():
+    a = scenario_key({"x": {"use": 0.5, "signature_type": 3}}, "area", modes=None)
+    b = scenario_key({"x": {"signature_type": 3.0, "use": 0.5}}, "area", modes=None)
+    assert a == b
+    assert a != scenario_key({"x": {"use": 0.5, "signature_type": 3}}, "area")
+    assert a != scenario_key({"x": {"use": 0.5, "signature_type": 3}}, "other")
+
+
+def test_coalescing():
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        time.sleep(0.05)
+        return {"value": value}
+
+    async def main():
+        controller = AdmissionController()
+        return await asyncio.gather(
+            controller.submit("a", "area", compute, 1),
+            controller.submit("a", "area", compute, 1),
+            controller.submit("b", "area", compute, 2),
+        )
+
+    first, second, third = asyncio.run(main())
+    assert first is second
+    assert third == {"value": 2}
+    assert sorted(calls) == [1, 2]
+
+
+def test_queue_full():
+    release = threading.Event()
+
+    async def main():
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        running = asyncio.ensure_future(controller.submit("a", "area", release.wait, 5))
+        waiting = asyncio.ensure_future(controller.submit("b", "area", release.wait, 5))
+        await asyncio.sleep(0.05)
+        assert controller.stats()["area"]["running"] == 1
+        assert controller.stats()["area"]["waiting"] == 1
+        try:
+            with pytest.raises(Rejected) as e:
+                await controller.submit("c", "area", release.wait, 5)
+            assert e.value.status_code == 429
+            # identical requests are not queued
+            coalesced = asyncio.ensure_future(
+                controller.submit("b", "area", release.wait, 5)
+            )
+        finally:
+            release.set()
+        await asyncio.gather(running, waiting, coalesced)
+
+    asyncio.run(main())
+
+
+def test_latency_budget():
+    release = threading.Event()
+
+    async def main():
+        controller = AdmissionController(max_concurrency=1, latency_budget=0.1)
+        await controller.submit("a", "area", time.sleep, 0.08)
+        running = asyncio.ensure_future(controller.submit("b", "area", release.wait, 5))
+        await asyncio.sleep(0.01)
+        try:
+            with pytest.raises(Rejected) as e:
+                await controller.submit("c", "area", release.wait, 5)
+            assert e.value.status_code == 503
+            assert e.value.retry_after >= 1
+        finally:
+            release.set()
+        await running
+
+    asyncio.run(main())
+
+
+def test_areas_exclusive():
+    events = []
+
+    def compute(area):
+        events.append(("start", area))
+        time.sleep(0.02)
+        events.append(("end", area))
+
+    async def main():
+        controller = AdmissionController(max_concurrency=2)
+        await asyncio.gather(
+            controller.submit("a", "one", compute, "one"),
+            controller.submit("b", "one", compute, "one"),
+            controller.submit("c", "two", compute, "two"),
+        )
+
+    asyncio.run(main())
+    # both computations of the first area overlap, the other area runs after them
+    assert [area for _, area in events[:2]] == ["one", "one"]
+    assert events[-2:] == [("start", "two"), ("end", "two")]
+
+
+def test_areas_in_turns():
+    events = []
+
+    def compute(area):
+        events.append(area)
+        time.sleep(0.02)
+
+    async def main():
+        controller = AdmissionController(max_concurrency=2)
+        running = asyncio.ensure_future(controller.submit("a", "one", compute, "one"))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(controller.submit("b", "two", compute, "two"))
+        await asyncio.sleep(0)
+        # the running area has a free slot, but the other area is waiting already
+        later = asyncio.ensure_future(controller.submit("c", "one", compute, "one"))
+        await asyncio.sleep(0)
+        assert controller.stats()["one"]["waiting"] == 1
+        await asyncio.gather(running, waiting, later)
+        assert controller.stats()["one"]["waiting"] == 0
+        assert not controller._queue
+
+    asyncio.run(main())
+    assert events == ["one", "two", "one"]
+
+
+def test_cancelled_turn():
+    release = threading.Event()
+    events = []
+
+    def compute(name):
+        if name == "a":
+            release.wait(5)
+        events.append(name)
+
+    async def main():
+        controller = AdmissionController(max_concurrency=1)
+        running = asyncio.ensure_future(controller.submit("a", "one", compute, "a"))
+        await asyncio.sleep(0.01)
+        first = asyncio.ensure_future(controller.submit("b", "two", compute, "b"))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(controller.submit("c", "one", compute, "c"))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(
+            controller.submit("d", "two", compute, "d")
+        )
+        await asyncio.sleep(0.01)
+        # the cancelled computation leaves its own place in the queue
+        controller._inflight["d"].cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert controller.stats()["two"]["waiting"] == 1
+        release.set()
+        await asyncio.gather(running, first, second)
+
+    asyncio.run(main())
+    assert events == ["a", "b", "c"]
+
+
+def test_exclusive():
+    events = []
+
+    def compute(name):
+        events.append(("start", name))
+        time.sleep(0.02)
+        events.append(("end", name))
+
+    async def main():
+        controller = AdmissionController(max_concurrency=2)
+        running = asyncio.ensure_future(controller.submit("a", "one", compute, "a"))
+        await asyncio.sleep(0)
+        exclusive = asyncio.ensure_future(
+            controller.submit_exclusive("b", "one", compute, "b")
+        )
+        await asyncio.sleep(0)
+        later = asyncio.ensure_future(controller.submit("c", "one", compute, "c"))
+        await asyncio.gather(running, exclusive, later)
+        assert controller.stats()["one"]["running"] == 0
+
+    asyncio.run(main())
+    # the exclusive computation waits for the running one and runs alone
+    assert events == [
+        ("start", "a"),
+        ("end", "a"),
+        ("start", "b"),
+        ("end", "b"),
+        ("start", "c"),
+        ("end", "c"),
+    ]
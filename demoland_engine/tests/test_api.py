@@ -0,0 +1,103 @@
+import pandas as pd
+import pytest
+
+import demoland_engine
+from demoland_engine import api
+from demoland_engine.api import ingest, scenario_calc
+
+
+def test_ingest():
+    demoland_engine.data.change_area("tyne_and_wear")
+    empty = demoland_engine.get_empty()
+    codes = empty.index[[10, 3]]
+    scenario = {
+        codes[0]: {"signature_type": 3, "use": 0.4, "greenspace": 0.2},
+        codes[1]: {"job_types": 0.8},
+    }
+    df = ingest(scenario, empty)
+
+    expected = empty.copy()
+    for code, vals in scenario.items():
+        expected.loc[code] = vals
+    pd.testing.assert_frame_equal(df, expected.loc[codes])
+    assert empty.isna().all().all()
+
+
+def test_ingest_unknown():
+    demoland_engine.data.change_area("tyne_and_wear")
+    with pytest.raises(ValueError, match=r"OAs \['foo'\] are not part of"):
+        ingest({"foo": {"signature_type": 3}}, demoland_engine.get_empty())
+
+
+def test_scenario_calc_delta():
+    scenario = {
+        "E00042786": {
+            "signature_type": 3,
+            "use": 0.4,
+            "greenspace": 0.2,
+            "job_types": 0.8,
+        }
+    }
+    full = scenario_calc(scenario, "tyne_and_wear")
+    baseline = scenario_calc({}, "tyne_and_wear")
+    delta = scenario_calc(scenario, "tyne_and_wear", response="delta")
+
+    assert delta["baseline_version"] == demoland_engine.baselines.baseline_version()
+    assert 0 < len(delta["values"]) < len(full)
+    assert {**baseline, **delta["values"]} == full
+
+    loose = scenario_calc(scenario, "tyne_and_wear", response="delta", tolerance=1)
+    assert len(loose["values"]) < len(delta["values"])
+    assert scenario_calc({}, "tyne_and_wear", response="delta")["values"] == {}
+    with pytest.raises(ValueError, match="'response' needs to be one of"):
+        scenario_calc(scenario, "tyne_and_wear", response="foo")
+
+
+def test_scenario_calc_delta_signature():
+    baseline = scenario_calc({}, "tyne_and_wear")
+    signature_type = (baseline["E00042786"]["signature_type"] + 1) % 16
+    scenario = {"E00042786": {"signature_type": signature_type}}
+
+    # a changed signature type is returned whatever the tolerance
+    for tolerance in [0, 5, 100]:
+        delta = scenario_calc(
+            scenario, "tyne_and_wear", response="delta", tolerance=tolerance
+        )
+        assert delta["values"]["E00042786"]["signature_type"] == signature_type
+
+
+def test_scenario_calc_indicators():
+    scenario = {"E00042786": {"signature_type": 3, "use": 0.4}}
+    full = scenario_calc(scenario, "tyne_and_wear")
+    result = scenario_calc(scenario, "tyne_and_wear", indicators=["air_quality"])
+
+    assert result.keys() == full.keys()
+    assert result["E00042786"] == {
+        "air_quality": full["E00042786"]["air_quality"],
+        "signature_type": 3,
+    }
+    with pytest.raises(ValueError, match="'indicators' needs to be"):
+        scenario_calc(scenario, "tyne_and_wear", indicators=[])
+
+
+def test_scenario_calc_baseline_responses(monkeypatch):
+    demoland_engine.data.change_area("tyne_and_wear")
+    monkeypatch.setattr(api, "MAX_BASELINE_RESPONSES", 2)
+    api._BASELINE_RESPONSES.clear()
+
+    first = scenario_calc({}, "tyne_and_wear", modes=["car", "walk"])
+    assert scenario_calc({}, "tyne_and_wear", modes=["walk", "car", "car"]) is first
+    # a lone mode is taken as a list of one mode
+    single = scenario_calc({}, "tyne_and_wear", modes="car")
+    assert "job_accessibility_car" in next(iter(single.values()))
+    scenario_calc({}, "tyne_and_wear", indicators=["air_quality"])
+    scenario_calc({}, "tyne_and_wear", indicators=["house_price"])
+    assert len(api._BASELINE_RESPONSES["tyne_and_wear"]) == 2
+    assert scenario_calc({}, "tyne_and_wear", modes=["car", "walk"]) is not first
+
+    with pytest.raises(ValueError, match="Available modes are"):
+        scenario_calc({}, "tyne_and_wear", modes=["foo"])
+
+    # responses are dropped with the data of the area
+    demoland_engine.data.change_area("tyne_and_wear")
+    assert "tyne_and_wear" not in api._BASELINE_RESPONSES
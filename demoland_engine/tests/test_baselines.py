@@ -1,6 +1,9 @@
+import joblib
 import pandas as pd
+import pytest
 
 import demoland_engine
+from demoland_engine import baselines
 
 
 def test_empty():
@@ -16,3 +19,42 @@ def test_empty():
         "E00042789",
     ]
 
+
+def test_baseline():
+    demoland_engine.data.change_area("tyne_and_wear")
+    baseline = demoland_engine.get_baseline()
+    expected = demoland_engine.get_indicators(
+        demoland_engine.get_empty(), modes="all"
+    )
+
+    assert baseline.index.equals(expected.index)
+    for column in baseline.columns.drop("signature_type"):
+        pd.testing.assert_series_equal(baseline[column], expected[column])
+    assert baseline.signature_type.dropna().between(0, 15).all()
+
+
+def test_baseline_saved(tmp_path):
+    demoland_engine.data.change_area("tyne_and_wear")
+    registry = demoland_engine.data.FILEVAULT.cache.registry
+    version = baselines.baseline_version(registry)
+    assert baselines.baseline_version({**registry, "matrix": "changed"}) != version
+
+    path = str(tmp_path / "baseline")
+    baselines.save_baseline(path)
+    with open(path, "rb") as f:
+        stored = joblib.load(f)
+    assert stored["version"] == version
+    pd.testing.assert_frame_equal(
+        stored["indicators"], demoland_engine.get_baseline()
+    )
+
+
+def test_baseline_other_area(tmp_path):
+    demoland_engine.data.change_area("tyne_and_wear")
+    cache = demoland_engine.data.FileVault("tyne_and_wear").cache
+    cache.registry = {**cache.registry, "matrix": "changed"}
+    cache.path = str(tmp_path)
+
+    with pytest.raises(RuntimeError, match="current area"):
+        baselines.load_baseline(cache)
+    assert not list(tmp_path.iterdir())
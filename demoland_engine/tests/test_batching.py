@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from demoland_engine.batching import MicroBatcher
+
+
+class Sum:
+    def __init__(self):
+        self.calls = []
+        # released once the concurrent calls are done
+        self.busy = threading.Event()
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        if (X == -1).all():
+            self.busy.wait(5)
+        if np.isnan(X).any():
+            raise ValueError("nan")
+        return X.sum(axis=1)
+
+
+def _predict_all(batcher, model, inputs):
+    """Predict concurrently while another call of the model is in flight"""
+    barrier = threading.Barrier(len(inputs))
+
+    def predict(X):
+        barrier.wait()
+        try:
+            return batcher.predict(model, X)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(len(inputs) + 1) as executor:
+        busy = executor.submit(batcher.predict, model, np.full((1, 3), -1.0))
+        while not model.calls:
+            time.sleep(0.001)
+        results = list(executor.map(predict, inputs))
+        model.busy.set()
+        busy.result()
+    return results
+
+
+def test_batching():
+    model = Sum()
+    inputs = [np.full((n, 3), float(n)) for n in (1, 2, 5)]
+    results = _predict_all(MicroBatcher(window=1), model, inputs)
+
+    assert model.calls == [1, 8]
+    for X, result in zip(inputs, results):
+        np.testing.assert_array_equal(result, X.sum(axis=1))
+
+
+def test_alone():
+    model = Sum()
+    start = time.perf_counter()
+    result = MicroBatcher(window=10).predict(model, np.ones((2, 3)))
+
+    # nothing to wait for
+    assert time.perf_counter() - start < 5
+    np.testing.assert_array_equal(result, [3.0, 3.0])
+
+
+def test_max_rows():
+    model = Sum()
+    inputs = [np.ones((5, 3)) for _ in range(4)]
+    # the batch is closed by its rows long before the end of the window
+    results = _predict_all(MicroBatcher(window=10, max_rows=10), model, inputs)
+
+    assert sorted(model.calls) == [1, 10, 10]
+    assert all((result == 3).all() for result in results)
+
+
+def test_max_batch():
+    model = Sum()
+    start = time.perf_counter()
+    # the call in flight and this one are all the calls that can run at once
+    (result,) = _predict_all(
+        MicroBatcher(window=10, max_batch=2), model, [np.ones((2, 3))]
+    )
+
+    # predicted without waiting for the end of the window
+    assert time.perf_counter() - start < 5
+    np.testing.assert_array_equal(result, [3.0, 3.0])
+
+
+def test_error():
+    model = Sum()
+    inputs = [np.ones((2, 3)), np.full((1, 3), np.nan), np.ones((1, 3))]
+    errors = _predict_all(MicroBatcher(window=1), model, inputs)
+
+    # the caller predicting the batch raises the error, the others their own
+    # exception caused by it
+    (original,) = [e for e in errors if isinstance(e, ValueError)]
+    wrapped = [e for e in errors if isinstance(e, RuntimeError)]
+    assert len(wrapped) == 2
+    assert wrapped[0] is not wrapped[1]
+    assert all(e.__cause__ is original for e in wrapped)
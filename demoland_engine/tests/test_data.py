@@ -0,0 +1,172 @@
+import os
+import subprocess
+import sys
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from demoland_engine import data
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    rng = np.random.default_rng(0)
+    model = HistGradientBoostingRegressor(max_iter=5).fit(
+        rng.random((50, 3)), rng.random(50)
+    )
+    fname = str(tmp_path / "air_quality_model")
+    joblib.dump(model, fname)
+    return fname
+
+
+def test_pyodide_convertor_outside_pyodide(model_file):
+    assert data.pyodide_convertor(model_file, "fetch", None) == model_file
+    assert os.listdir(os.path.dirname(model_file)) == ["air_quality_model"]
+
+
+def test_pyodide_convertor(model_file, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyodide_js", types.ModuleType("pyodide_js"))
+
+    converted = data.pyodide_convertor(model_file, "fetch", None)
+    assert converted != model_file
+    model = joblib.load(converted)
+    for predictor in model._predictors:
+        assert predictor[0].nodes.dtype == data.PREDICTOR_RECORD_DTYPE_2
+
+    # the converted file is reused for the same source
+    mtime = os.path.getmtime(converted)
+    assert data.pyodide_convertor(model_file, "fetch", None) == converted
+    assert os.path.getmtime(converted) == mtime
+
+    # corrupted conversion is redone
+    with open(converted, "ab") as f:
+        f.write(b"0")
+    assert data.pyodide_convertor(model_file, "fetch", None) == converted
+    assert joblib.load(converted)._predictors
+
+
+def test_lazy_import():
+    code = (
+        "import sys, demoland_engine; "
+        "print(any(m in sys.modules for m in ('xarray', 'sklearn', 'scipy')))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "False"
+
+
+def test_filevault_lazy():
+    data.change_area("tyne_and_wear")
+    assert dict(data.FILEVAULT) == {"case": "tyne_and_wear"}
+    data.FILEVAULT["empty"]
+    assert set(data.FILEVAULT) == {"case", "empty"}
+    with pytest.raises(KeyError):
+        data.FILEVAULT["unknown"]
+
+
+def test_filevault_concurrent(monkeypatch):
+    calls = []
+
+    def load(cache):
+        calls.append(cache)
+        time.sleep(0.05)
+        return object()
+
+    monkeypatch.setitem(data.ARTIFACTS, "slow", load)
+    data.change_area("tyne_and_wear")
+    with ThreadPoolExecutor(4) as executor:
+        loaded = list(executor.map(lambda _: data.FILEVAULT["slow"], range(4)))
+    assert len(calls) == 1
+    assert all(artifact is loaded[0] for artifact in loaded)
+    data.change_area("tyne_and_wear")
+
+
+def test_use_area(tmp_path, monkeypatch):
+    pd.DataFrame({"use": [np.nan]}, index=["a"]).to_parquet(tmp_path / "empty")
+    data.register_area("other", str(tmp_path))
+    data.change_area("tyne_and_wear")
+    calls = []
+    change_area = data.change_area
+
+    def slow_change_area(study_area):
+        calls.append(study_area)
+        time.sleep(0.05)
+        change_area(study_area)
+
+    monkeypatch.setattr(data, "change_area", slow_change_area)
+    try:
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(lambda _: data.use_area("other"), range(4)))
+        assert calls == ["other"]
+        assert data.FILEVAULT["case"] == "other"
+    finally:
+        del data.files["other"]
+        change_area("tyne_and_wear")
+
+
+def test_keep_resident(tmp_path):
+    pd.DataFrame({"use": [np.nan]}, index=["a"]).to_parquet(tmp_path / "empty")
+    data.register_area("resident", str(tmp_path))
+    data.change_area("tyne_and_wear")
+    data.FILEVAULT["empty"]
+    try:
+        data.keep_resident(["resident"], load=False)
+        assert data.FILEVAULT["case"] == "tyne_and_wear"
+
+        data.change_area("resident")
+        empty = data.FILEVAULT["empty"]
+        data.change_area("tyne_and_wear")
+        # areas which are not resident are loaded again
+        assert dict(data.FILEVAULT) == {"case": "tyne_and_wear"}
+        data.change_area("resident")
+        assert data.FILEVAULT["empty"] is empty
+    finally:
+        data.RESIDENT.pop("resident")
+        data.PINNED.discard("resident")
+        del data.files["resident"]
+        data.change_area("tyne_and_wear")
+
+
+def test_memory_budget(tmp_path):
+    for area in ["one", "two"]:
+        (tmp_path / area).mkdir()
+        pd.DataFrame({"use": np.zeros(100_000)}).to_parquet(tmp_path / area / "empty")
+        data.register_area(area, str(tmp_path / area))
+    try:
+        data.change_area("one")
+        data.FILEVAULT["empty"]
+        data.set_memory_budget("2M")
+        data.change_area("two")
+        data.FILEVAULT["empty"]
+        report = data.memory_report()
+        assert list(report["areas"]) == ["one", "two"]
+        assert report["areas"]["one"]["artifacts"]["empty"]["nbytes"] > 800_000
+
+        data.change_area("one")
+        assert "two" in data.RESIDENT
+        # loading the artifact again would exceed the budget
+        data.set_memory_budget(1_000_000)
+        assert "two" not in data.RESIDENT
+        assert data.memory_report()["total"] < 1_000_000
+
+        # areas kept resident are never dropped
+        data.keep_resident(["two"], load=False)
+        data.change_area("two")
+        data.FILEVAULT["empty"]
+        data.change_area("one")
+        data.FILEVAULT["empty"]
+        assert "two" in data.RESIDENT
+        assert data.memory_report()["total"] > 1_000_000
+    finally:
+        data.set_memory_budget(None)
+        data.RESIDENT.clear()
+        data.PINNED.clear()
+        del data.files["one"], data.files["two"]
+        data.change_area("tyne_and_wear")
@@ -0,0 +1,17 @@
+import numpy as np
+
+from demoland_engine import data
+from demoland_engine.drift import precision_drift
+
+
+def test_precision_drift():
+    data.change_area("tyne_and_wear")
+    drift = precision_drift("tyne_and_wear")
+
+    assert data.PRECISION == np.float64
+    assert data.FILEVAULT["case"] == "tyne_and_wear"
+    assert {"air_quality", "house_price", "job_accessibility_walk"} <= set(drift.index)
+    accessibility = drift.index.str.contains("accessibility")
+    assert (drift.loc[accessibility, "max_rel"] < 1e-5).all()
+    # the features of the models are kept in double precision
+    assert (drift.loc[~accessibility, "max_abs"] == 0).all()
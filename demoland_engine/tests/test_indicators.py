@@ -0,0 +1,224 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+import demoland_engine
+from demoland_engine.indicators import Accessibility, Features, Model
+
+
+def test_features():
+    demoland_engine.data.change_area("tyne_and_wear")
+    matrix = demoland_engine.data.FILEVAULT["matrix"]
+    default_data = demoland_engine.data.FILEVAULT["default_data"]
+    features = Features(matrix, default_data)
+
+    assert features.values.shape == (3795, len(features.columns))
+    np.testing.assert_array_equal(
+        features.take(["population", "population_lag"]),
+        np.column_stack(
+            [default_data.population, matrix.lag(default_data.population)]
+        ),
+    )
+
+
+def test_features_rows():
+    demoland_engine.data.change_area("tyne_and_wear")
+    matrix = demoland_engine.data.FILEVAULT["matrix"]
+    default_data = demoland_engine.data.FILEVAULT["default_data"]
+    patch = default_data.iloc[[2, 5], :3] + 1
+    patched = default_data.copy()
+    patched.iloc[[2, 5], :3] = patch
+
+    expected = Features(matrix, patched)
+    rows = np.array([0, 2, 40])
+    features = Features(matrix, default_data, rows=rows, patch=([2, 5], patch))
+
+    assert features.index.equals(default_data.index[rows])
+    np.testing.assert_array_equal(features.values, expected.values[rows])
+
+
+def test_features_float32():
+    demoland_engine.data.change_area("tyne_and_wear")
+    matrix = demoland_engine.data.FILEVAULT["matrix"]
+    default_data = demoland_engine.data.FILEVAULT["default_data"]
+    expected = Features(matrix, default_data)
+
+    features = Features(matrix, default_data, dtype=np.float32)
+    assert features.values.dtype == np.float32
+    np.testing.assert_allclose(features.values, expected.values, rtol=1e-5)
+
+    rows = np.array([0, 2, 40])
+    subset = Features(matrix, default_data, rows=rows, dtype=np.float32)
+    np.testing.assert_array_equal(subset.values, features.values[rows])
+
+
+def test_model_predict():
+    demoland_engine.data.change_area("tyne_and_wear")
+    matrix = demoland_engine.data.FILEVAULT["matrix"]
+    default_data = demoland_engine.data.FILEVAULT["default_data"]
+    aq_model = demoland_engine.data.FILEVAULT["aq_model"]
+
+    data = default_data.copy()
+    for col in default_data.columns.drop(["lat", "lon"], errors="ignore"):
+        data[f"{col}_lag"] = matrix.lag(data[col])
+    expected = aq_model.predict(data[aq_model.feature_names_in_])
+
+    np.testing.assert_array_equal(
+        Model(matrix, aq_model).predict(default_data), expected
+    )
+
+
+def _travel_times():
+    ttm = pd.DataFrame(
+        {
+            "walk": [0, 10, 20, 12, 0, np.nan, 5, 14, 0],
+            "car": [0, 3, 5, 3, 0, 4, 5, 4, 0],
+        },
+        index=pd.MultiIndex.from_product(
+            [["a", "b", "c"], ["a", "b", "c"]], names=["from_id", "to_id"]
+        ),
+    )
+    wpz_population = pd.Series([10.0, 20.0, 30.0], index=["a", "b", "c"])
+    green_area = pd.Series([1.0, 2.0, 4.0], index=["a", "b", "c"])
+    return ttm, wpz_population, green_area
+
+
+def test_accessibility():
+    acc = Accessibility.from_travel_times(*_travel_times())
+    jobs = pd.Series([1.0, -2.0], index=pd.Index(["c", "a"], name="to_id"))
+
+    assert acc.travel_times["walk"].dtype == np.uint8
+    pd.testing.assert_series_equal(
+        acc.job_accessibility(jobs, "walk"),
+        pd.Series([28.0, 28.0, 59.0], index=acc.from_id),
+    )
+    pd.testing.assert_series_equal(
+        acc.greenspace_accessibility(jobs, "walk"),
+        pd.Series([1.0 - 2.0 + 2.0, 1.0 - 2.0 + 2.0, 6.0], index=acc.from_id),
+    )
+    pd.testing.assert_series_equal(
+        acc.job_accessibility(jobs, "car"),
+        pd.Series([59.0, 59.0, 59.0], index=acc.from_id),
+    )
+
+    restored = pickle.loads(pickle.dumps(acc))
+    pd.testing.assert_series_equal(
+        restored.job_accessibility(jobs, "walk"), acc.job_accessibility(jobs, "walk")
+    )
+
+
+def test_accessibility_max_minutes():
+    acc = Accessibility.from_travel_times(*_travel_times(), max_minutes=60)
+    jobs = pd.Series([1.0, -2.0], index=pd.Index(["c", "a"], name="to_id"))
+
+    pd.testing.assert_series_equal(
+        acc.job_accessibility(jobs, "walk", max_minutes=10),
+        pd.Series([28.0, 20.0, 39.0], index=acc.from_id),
+    )
+    pd.testing.assert_series_equal(
+        acc.greenspace_accessibility(jobs, "walk", max_minutes=10),
+        pd.Series([1.0, 2.0, 4.0], index=acc.from_id),
+    )
+    pd.testing.assert_series_equal(
+        acc.job_accessibility(jobs, "walk", max_minutes=0),
+        pd.Series([8.0, 20.0, 31.0], index=acc.from_id),
+    )
+    pd.testing.assert_series_equal(
+        acc.job_accessibility(jobs, "walk", max_minutes=60),
+        pd.Series([59.0, 28.0, 59.0], index=acc.from_id),
+    )
+    with pytest.raises(ValueError, match="computed within 60 minutes"):
+        acc.job_accessibility(jobs, "walk", max_minutes=61)
+    assert pickle.loads(pickle.dumps(acc)).max_minutes == 60
+
+    # the horizon defaults to the longest stored travel time
+    acc = Accessibility.from_travel_times(*_travel_times())
+    assert acc.max_minutes == 20
+    with pytest.raises(ValueError, match="computed within 20 minutes"):
+        acc.accessibility(jobs, jobs, max_minutes=30)
+
+
+def test_accessibility_modes():
+    acc = Accessibility.from_travel_times(*_travel_times())
+    jobs = pd.Series([1.0, -2.0], index=pd.Index(["c", "a"], name="to_id"))
+    greenspace = pd.Series([5.0], index=pd.Index(["b"], name="to_id"))
+
+    result = acc.accessibility(jobs, greenspace, max_minutes=10)
+    assert list(result.columns) == [
+        "job_accessibility_walk",
+        "job_accessibility_car",
+        "greenspace_accessibility_walk",
+        "greenspace_accessibility_car",
+    ]
+    for mode in acc.modes:
+        pd.testing.assert_series_equal(
+            result[f"job_accessibility_{mode}"],
+            acc.job_accessibility(jobs, mode, max_minutes=10),
+            check_names=False,
+        )
+        pd.testing.assert_series_equal(
+            result[f"greenspace_accessibility_{mode}"],
+            acc.greenspace_accessibility(greenspace, mode, max_minutes=10),
+            check_names=False,
+        )
+
+    with pytest.raises(ValueError, match=r"Available modes are \['walk', 'car'\]"):
+        acc.accessibility(jobs, greenspace, modes=["walk", "bus"])
+    with pytest.raises(ValueError, match=r"Modes \['bus'\] are not available"):
+        acc.job_accessibility(jobs, "bus")
+
+
+def test_accessibility_origins():
+    acc = Accessibility.from_travel_times(*_travel_times())
+    jobs = pd.Series([1.0, -2.0], index=pd.Index(["c", "a"], name="to_id"))
+
+    np.testing.assert_array_equal(acc.reaching([2], modes=["walk"]), [2])
+    np.testing.assert_array_equal(acc.reaching([2]), [0, 1, 2])
+    pd.testing.assert_frame_equal(
+        acc.accessibility(jobs, jobs, origins=[2, 0]),
+        acc.accessibility(jobs, jobs).iloc[[2, 0]],
+    )
+
+
+def test_accessibility_legacy():
+    ttm, wpz_population, _ = _travel_times()
+    ttm.columns.name = "mode"
+    ttm_15 = xr.DataArray.from_series(ttm.stack(dropna=False)) <= 15
+    ttm_15.name = "ttm_15"
+    wpz = xr.DataArray.from_series(wpz_population.rename_axis("to_id"))
+    wpz.name = "wpz_population"
+    green_accessibility = pd.DataFrame(
+        {"walk": [1.0, 2.0, 3.0], "car": [4.0, 5.0, 6.0]}, index=["a", "b", "c"]
+    )
+    green = xr.DataArray.from_series(
+        green_accessibility.rename_axis(index="from_id", columns="mode").stack()
+    )
+    green.name = "green_accessibility"
+    baseline = xr.merge([ttm_15, wpz, green])
+
+    # state of an instance pickled by the older releases storing the dataset
+    acc = Accessibility.__new__(Accessibility)
+    acc.__setstate__({"baseline": baseline})
+
+    expected = Accessibility.from_travel_times(*_travel_times())
+    jobs = pd.Series([1.0, -2.0], index=pd.Index(["c", "a"], name="to_id"))
+    for mode in ["walk", "car"]:
+        pd.testing.assert_series_equal(
+            acc.job_accessibility(jobs, mode), expected.job_accessibility(jobs, mode)
+        )
+    pd.testing.assert_series_equal(
+        acc.greenspace_accessibility(jobs, "walk"),
+        pd.Series([1.0 - 2.0, 2.0 - 2.0, 3.0 + 1.0 - 2.0], index=acc.from_id),
+    )
+    pd.testing.assert_series_equal(
+        acc.accessibility(jobs, jobs, modes=["car"])["greenspace_accessibility_car"],
+        acc.greenspace_accessibility(jobs, "car"),
+        check_names=False,
+    )
+    with pytest.raises(ValueError, match="precomputed within 15 minutes"):
+        acc.job_accessibility(jobs, "walk", max_minutes=10)
+    with pytest.raises(ValueError, match="computed within 15 minutes"):
+        acc.job_accessibility(jobs, "walk", max_minutes=20)
@@ -0,0 +1,72 @@
+import types
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from demoland_engine.memory import area_memory, nbytes
+
+
+def test_nbytes():
+    array = np.zeros(1000)
+    assert nbytes(array) == 8000
+    # views and repeated references are counted once
+    seen = set()
+    assert nbytes(array[10:], seen) == 8000
+    assert nbytes(array, seen) == 0
+
+    df = pd.DataFrame({"a": np.zeros(1000), "b": np.zeros(1000, dtype=np.float32)})
+    assert nbytes(df) == df.memory_usage(deep=True).sum()
+
+    matrix = sparse.random(100, 100, density=0.1, format="csr")
+    assert nbytes(matrix) == (
+        matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    )
+
+    class Model:
+        def __init__(self):
+            self.nodes = [np.zeros(100), np.zeros(100)]
+
+    assert nbytes(Model()) > 1600
+
+
+def test_area_memory():
+    array = np.zeros(1000)
+    vault = {"case": "area", "a": pd.DataFrame({"x": array}), "b": array, "c": array}
+    memory = area_memory(vault)
+
+    assert list(memory) == ["a", "b", "c"]
+    assert memory["a"]["type"] == "DataFrame"
+    assert memory["b"] == {"type": "ndarray", "nbytes": 8000}
+    assert memory["c"]["nbytes"] == 0
+
+
+def test_area_memory_measured_once():
+    class Vault(dict):
+        _measured = None
+
+    graph = types.SimpleNamespace(weights=np.zeros(1000))
+    items = [np.zeros(1000)]
+    vault = Vault(case="area", graph=graph, items=items)
+    memory = area_memory(vault)
+    assert memory["items"]["nbytes"] > 8000
+
+    # measured artifacts are not measured again
+    items.append(np.zeros(1000))
+    assert area_memory(vault)["items"] == memory["items"]
+
+    # unless they gain attributes
+    graph.cached = np.zeros(1000)
+    assert area_memory(vault)["graph"]["nbytes"] > memory["graph"]["nbytes"] + 8000
+
+    # or the dictionaries among their attributes change
+    graph.cache = {}
+    before = area_memory(vault)["graph"]["nbytes"]
+    graph.cache["a"] = np.zeros(1000)
+    assert area_memory(vault)["graph"]["nbytes"] > before + 8000
+    graph.cache["a"] = np.zeros(2000)
+    assert area_memory(vault)["graph"]["nbytes"] > before + 16000
+
+    # or other artifacts are dropped
+    del vault["graph"]
+    assert area_memory(vault)["items"]["nbytes"] > memory["items"]["nbytes"] + 8000
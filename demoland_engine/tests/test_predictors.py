@@ -1,5 +1,7 @@
 import pandas as pd
+import pytest
 import demoland_engine
+from demoland_engine.predictors import update_indicators
 
 
 def test_from_empty():
@@ -101,3 +103,101 @@ def test_from_adapted():
     }
 
     pd.testing.assert_frame_equal(pd.DataFrame(expected), result.describe())
+
+
+def test_all_modes():
+    demoland_engine.data.change_area("tyne_and_wear")
+    df = demoland_engine.get_empty()
+    df.loc["E00042786"] = [3, 0.4, 0.2, 0.8]
+    default = demoland_engine.get_indicators(df, random_seed=0)
+    result = demoland_engine.get_indicators(df, random_seed=0, modes="all")
+
+    pd.testing.assert_frame_equal(result[default.columns], default)
+    for mode in ["transit", "car", "bike", "walk"]:
+        single = demoland_engine.get_indicators(df, mode=mode, random_seed=0)
+        pd.testing.assert_series_equal(
+            result[f"job_accessibility_{mode}"],
+            single.job_accessibility,
+            check_names=False,
+        )
+        pd.testing.assert_series_equal(
+            result[f"greenspace_accessibility_{mode}"],
+            single.greenspace_accessibility,
+            check_names=False,
+        )
+
+
+def test_update_indicators():
+    demoland_engine.data.change_area("tyne_and_wear")
+    df = demoland_engine.get_empty().copy()
+    df.loc["E00042786"] = [3, 0.4, 0.2, 0.8]
+    df.loc["E00042707"] = [7, None, None, None]
+    expected = demoland_engine.get_indicators(df, random_seed=0)
+
+    baseline = demoland_engine.get_baseline()
+    changes = df.loc[["E00042786", "E00042707"]]
+    result = update_indicators(changes, baseline, random_seed=0)
+
+    assert len(result) < len(df)
+    pd.testing.assert_frame_equal(result, expected.loc[result.index])
+    unchanged = expected.index.difference(result.index)
+    pd.testing.assert_frame_equal(
+        expected.loc[unchanged, ["air_quality", "house_price"]],
+        baseline.loc[unchanged, ["air_quality", "house_price"]],
+    )
+
+
+def test_baseline_subset():
+    demoland_engine.data.change_area("tyne_and_wear")
+    df = demoland_engine.get_empty().copy()
+    df.loc["E00042786"] = [3, 0.4, 0.2, 0.8]
+    expected = demoland_engine.get_indicators(df, random_seed=0)
+
+    # neighbors of the changed OA are not part of the subset
+    subset = df.loc[["E00042786", df.index[-1]]]
+    result = demoland_engine.get_indicators(
+        subset, random_seed=0, baseline=demoland_engine.get_baseline()
+    )
+    pd.testing.assert_frame_equal(result, expected.loc[subset.index])
+
+
+def test_indicator_selection():
+    demoland_engine.data.change_area("tyne_and_wear")
+    df = demoland_engine.get_empty()
+    df.loc["E00042786"] = [3, 0.4, 0.2, 0.8]
+    expected = demoland_engine.get_indicators(df, random_seed=0, modes=["car"])
+
+    for indicators in [
+        ["air_quality"],
+        ["job_accessibility"],
+        ["greenspace_accessibility", "house_price"],
+    ]:
+        result = demoland_engine.get_indicators(
+            df, random_seed=0, modes=["car"], indicators=indicators
+        )
+        assert all(column.startswith(tuple(indicators)) for column in result.columns)
+        pd.testing.assert_frame_equal(result, expected[result.columns])
+
+    with pytest.raises(ValueError, match="'indicators' needs to be"):
+        demoland_engine.get_indicators(df, indicators=["foo"])
+
+
+def test_chunked():
+    demoland_engine.data.change_area("tyne_and_wear")
+    df = demoland_engine.get_empty()
+    df.loc["E00042786"] = [3, 0.4, 0.2, 0.8]
+    expected = demoland_engine.get_indicators(df, random_seed=0, modes=["car"])
+    result = demoland_engine.get_indicators(
+        df, random_seed=0, modes=["car"], chunk_size=1000, n_workers=2
+    )
+    pd.testing.assert_frame_equal(result, expected)
+
+    baseline = demoland_engine.get_baseline()
+    expected = update_indicators(df.loc[["E00042786"]], baseline, random_seed=0)
+    result = update_indicators(
+        df.loc[["E00042786"]], baseline, random_seed=0, chunk_size=7, n_workers=2
+    )
+    pd.testing.assert_frame_equal(result, expected)
+
+    with pytest.raises(ValueError, match="'chunk_size' needs to be at least 1"):
+        demoland_engine.get_indicators(df, chunk_size=0)
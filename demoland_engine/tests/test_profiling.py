@@ -0,0 +1,24 @@
+import pytest
+
+from demoland_engine.profiling import profile_scenario
+
+
+def test_profile_scenario():
+    scenario = {
+        "E00042786": {
+            "signature_type": 3,
+            "use": 0.4,
+            "greenspace": 0.2,
+            "job_types": 0.8,
+        }
+    }
+    result = profile_scenario(scenario, "tyne_and_wear", limit=10)
+    assert "scenario_calc" in result["stats"]
+    stages = {stage["stage"]: stage for stage in result["stages"]}
+    assert {"sampling", "lag", "to_dict", "scenario_calc"} <= set(stages)
+    assert stages["lag"]["peak_memory"] > 0
+
+
+def test_profile_scenario_sort():
+    with pytest.raises(ValueError, match="'sort' needs to be one of"):
+        profile_scenario({}, "tyne_and_wear", sort="foo")
@@ -1,5 +1,6 @@
 import demoland_engine
 import pandas as pd
+import pytest
 
 
 def test_get_signature_values():
@@ -277,3 +278,64 @@ def test_get_signature_values_custom():
     )
     assert jobs_diff == -84.38557934212872
     assert gs == 6638.863416049736
+
+
+def test_sampling_cache(monkeypatch):
+    demoland_engine.data.change_area("tyne_and_wear")
+    sampling = demoland_engine.sampling
+    samples = sampling._SAMPLES
+    samples.clear()
+
+    first = sampling.get_signature_values("E00042707", 3, use=0.5, random_seed=0)
+    (values,) = samples["tyne_and_wear"].values()
+    second = sampling.get_signature_values("E00042707", 3, use=0.5, random_seed=0)
+    assert next(iter(samples["tyne_and_wear"].values())) is values
+    pd.testing.assert_series_equal(first[0], second[0])
+    assert first[1:] == second[1:]
+
+    # adjustments applied on a hit do not modify the cached values
+    adjusted = sampling.get_signature_values(
+        "E00042707", 3, use=-0.5, greenspace=0.5, random_seed=0
+    )
+    samples.clear()
+    expected = sampling.get_signature_values(
+        "E00042707", 3, use=-0.5, greenspace=0.5, random_seed=0
+    )
+    pd.testing.assert_series_equal(adjusted[0], expected[0])
+    assert adjusted[1:] == expected[1:]
+
+    # sampling without a seed is not cached
+    sampling.get_signature_values("E00042707", 3, random_seed=None)
+    assert len(samples["tyne_and_wear"]) == 1
+
+    # the least recently used values are dropped
+    monkeypatch.setattr(sampling, "MAX_SAMPLES", 2)
+    sampling.get_signature_values("E00042707", 3, random_seed=1)
+    sampling.get_signature_values("E00042707", 3, random_seed=0)
+    sampling.get_signature_values("E00042707", 3, random_seed=2)
+    assert [key[-1] for key in samples["tyne_and_wear"]] == [0, 2]
+
+    # the values are accounted to the area and dropped with its data
+    report = demoland_engine.data.memory_report()
+    assert report["areas"]["tyne_and_wear"]["caches"]["samples"]["entries"] == 2
+    demoland_engine.data.change_area("tyne_and_wear")
+    assert "tyne_and_wear" not in samples
+
+
+def test_sample_changes_invalid():
+    codes = demoland_engine.get_empty().index[:3]
+    df = pd.DataFrame(
+        {
+            "signature_type": [3, 3, 3],
+            "use": [1.5, 0.1, -2],
+            "greenspace": [0.1, -0.2, None],
+            "job_types": [None, None, None],
+        },
+        index=codes,
+    )
+    with pytest.raises(ValueError) as e:
+        demoland_engine.sampling.sample_changes(df, random_seed=0)
+    message = str(e.value)
+    assert f"1.5 given for {codes[0]}, -2.0 given for {codes[2]}." in message
+    assert f"-0.2 given for {codes[1]}." in message
+    assert "job_types" not in message
@@ -0,0 +1,34 @@
+import numpy as np
+
+import demoland_engine
+from demoland_engine import data
+from demoland_engine.synthetic import generate_area, lattice, lattice_neighbors
+
+
+def test_lattice_neighbors():
+    coords = lattice(100)
+    focal, neighbor, distance = lattice_neighbors(coords, 1)
+    counts = np.bincount(focal[distance > 0])
+    # inner cells have six neighbors, cells on the edge fewer
+    assert counts.max() == 6
+    assert counts.min() >= 2
+    # adjacency is symmetric
+    pairs = set(zip(focal, neighbor))
+    assert all((j, i) in pairs for i, j in pairs)
+
+
+def test_generate_area(tmp_path):
+    generate_area(200, str(tmp_path), k=2)
+    data.register_area("synthetic", str(tmp_path))
+    original = data.FILEVAULT["case"]
+    data.change_area("synthetic")
+    try:
+        df = demoland_engine.get_empty()
+        assert df.shape == (200, 4)
+        df.iloc[0] = [3, 0.4, 0.2, 0.8]
+        result = demoland_engine.get_indicators(df, random_seed=0)
+    finally:
+        data.change_area(original)
+
+    assert result.shape == (200, 4)
+    assert result.notna().all().all()
@@ -0,0 +1,61 @@
+import pytest
+import threadpoolctl
+
+from demoland_engine import threads
+
+
+@pytest.fixture
+def policy():
+    previous = threads.POLICY
+    yield
+    threads.set_threads(previous)
+
+
+def test_set_threads(policy, monkeypatch):
+    threads.set_threads(None)
+    assert threads.THREADS is None
+    threads.set_threads("3")
+    assert threads.THREADS == 3
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    monkeypatch.setattr(threads, "_cpu_count", lambda: 8)
+    threads.set_threads("auto")
+    assert threads.THREADS == 4
+    assert 'demoland_native_threads{policy="auto"} 4' in threads.render_metrics()
+
+    with pytest.raises(ValueError, match="'threads' needs to be"):
+        threads.set_threads(0)
+
+
+def test_limit(policy):
+    # loads OpenMP
+    import sklearn.ensemble  # noqa
+
+    threads.set_threads(1)
+    with threads.limit():
+        info = threadpoolctl.threadpool_info()
+    assert all(lib["num_threads"] == 1 for lib in info if lib["user_api"] == "openmp")
+
+
+def test_limit_workers(policy, monkeypatch):
+    # loads OpenMP
+    import sklearn.ensemble  # noqa
+
+    def openmp():
+        info = threadpoolctl.threadpool_info()
+        return {lib["num_threads"] for lib in info if lib["user_api"] == "openmp"}
+
+    threads.set_threads(4)
+    with threads.limit(2):
+        assert openmp() == {2}
+        # nested limits divide the threads among the same workers
+        with threads.limit():
+            assert openmp() == {2}
+    with threads.limit():
+        assert openmp() == {4}
+
+    # the CPUs are divided under the library defaults
+    threads.set_threads(None)
+    monkeypatch.setattr(threads, "_cpu_count", lambda: 8)
+    with threads.limit(4):
+        assert openmp() == {2}
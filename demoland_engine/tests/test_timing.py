@@ -0,0 +1,65 @@
+import pytest
+
+from demoland_engine import timing
+
+
+def test_disabled():
+    timing.enable(False)
+    timing.reset()
+    assert timing.stage("sampling", area="tyne_and_wear") is timing._NULL_STAGE
+    with timing.collect() as records:
+        with timing.stage("sampling", area="tyne_and_wear"):
+            pass
+    # collected without being aggregated
+    assert [name for name, *_ in records] == ["sampling"]
+    assert timing.render_metrics() == "\n"
+
+
+@pytest.mark.parametrize("reset_peak", [True, False])
+def test_collect_memory(reset_peak, monkeypatch):
+    if not reset_peak:
+        # Python 3.8
+        monkeypatch.setattr(timing, "_RESET_PEAK", None)
+    with timing.collect(memory=True) as records:
+        with timing.stage("outer", area="tyne_and_wear"):
+            with timing.stage("inner", area="tyne_and_wear"):
+                data = bytearray(10_000_000)
+                del data
+            # the peak of the earlier stage is not attributed to this one
+            with timing.stage("later", area="tyne_and_wear"):
+                pass
+    peaks = {name: peak for name, _, peak in records}
+    assert peaks["inner"] >= 10_000_000
+    assert peaks["outer"] >= peaks["inner"]
+    assert peaks["later"] < 1_000_000
+
+
+def test_enabled():
+    timing.enable()
+    timing.reset()
+    try:
+        with timing.collect() as records:
+            with timing.stage("sampling", area="tyne_and_wear"):
+                pass
+            timing.observe("lag", 0.02, area="tyne_and_wear")
+        timing.count("scenarios", area="tyne_and_wear")
+    finally:
+        timing.enable(False)
+
+    assert [name for name, *_ in records] == ["sampling", "lag"]
+    assert timing.server_timing(records).endswith("lag;dur=20.0")
+
+    metrics = timing.render_metrics()
+    assert 'demoland_scenarios_total{area="tyne_and_wear"} 1' in metrics
+    assert (
+        'demoland_stage_duration_seconds_bucket{area="tyne_and_wear",stage="lag",'
+        'le="0.01"} 0' in metrics
+    )
+    assert (
+        'demoland_stage_duration_seconds_bucket{area="tyne_and_wear",stage="lag",'
+        'le="0.025"} 1' in metrics
+    )
+    assert (
+        'demoland_stage_duration_seconds_count{area="tyne_and_wear",stage="sampling"} 1'
+        in metrics
+    )
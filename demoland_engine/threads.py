@@ -0,0 +1,138 @@
+"""Limits of the native thread pools used by the models
+
+The gradient boosting models of scikit-learn predict in an OpenMP thread pool using
+a thread per core by default. Several server processes or concurrent computations
+predicting at once then oversubscribe the CPU. The threading policy limits the
+number of OpenMP threads per call around the predictions and the accessibility
+computation using threadpoolctl.
+
+The policy is read from the ``DEMOLAND_THREADS`` environment variable and can be
+changed using :func:`set_threads`:
+
+- unset or empty: the libraries use their defaults,
+- an integer: the number of threads per call,
+- ``"auto"``: the CPUs available to the process divided by the number of server
+  processes given by the ``WEB_CONCURRENCY`` environment variable.
+
+OpenMP limits apply to the calling thread only, so concurrent computations are
+limited independently. The chunks of a single computation computed by several
+workers divide the threads per call (all the CPUs under the library defaults)
+among the workers. BLAS pools are not limited, as their limits are process
+wide and the engine does not use dense linear algebra.
+"""
+
+import contextvars
+import os
+import sys
+from contextlib import contextmanager
+
+
+def _cpu_count():
+    """Number of CPUs available to the process"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _resolve(policy):
+    """Number of threads per call of a policy, None for the library defaults"""
+    if policy is None or policy == "":
+        return None
+    if policy == "auto":
+        processes = int(os.environ.get("WEB_CONCURRENCY", 1))
+        return max(1, _cpu_count() // processes)
+    try:
+        threads = int(policy)
+    except (TypeError, ValueError):
+        threads = 0
+    if threads < 1:
+        raise ValueError(
+            "'threads' needs to be a positive integer, 'auto' or None. "
+            f"'{policy}' was given."
+        )
+    return threads
+
+
+POLICY = os.environ.get("DEMOLAND_THREADS") or None
+THREADS = _resolve(POLICY)
+
+# number of workers of the current computation sharing the threads, see limit
+_WORKERS = contextvars.ContextVar("demoland_workers", default=1)
+
+# (number of imported modules, controller)
+_CONTROLLER = None
+
+
+def _controller():
+    """Controller of the loaded thread pools, refreshed after new imports
+
+    Libraries such as OpenMP are loaded by the imported extension modules, so the
+    controller is created again whenever modules have been imported since.
+    """
+    global _CONTROLLER
+    from threadpoolctl import ThreadpoolController
+
+    if _CONTROLLER is None or _CONTROLLER[0] != len(sys.modules):
+        _CONTROLLER = (len(sys.modules), ThreadpoolController())
+    return _CONTROLLER[1]
+
+
+def set_threads(policy):
+    """Set the threading policy
+
+    Parameters
+    ----------
+    policy : int | "auto" | None
+        number of OpenMP threads per call, ``"auto"`` to divide the available
+        CPUs among the server processes or None for the library defaults. See the
+        module documentation.
+    """
+    global POLICY, THREADS
+    THREADS = _resolve(policy)
+    POLICY = None if policy is None or policy == "" else str(policy)
+
+
+@contextmanager
+def limit(workers=None):
+    """Context manager limiting the OpenMP threads of the calling thread
+
+    Does nothing if the policy uses the library defaults, unless the calling
+    thread is one of several workers.
+
+    Parameters
+    ----------
+    workers : int, optional
+        Number of workers running concurrently, among which the threads per call
+        are divided. Applies also to the limits nested within the context. By
+        default, the number of workers of the enclosing context, 1 otherwise.
+    """
+    if workers is None:
+        workers = _WORKERS.get()
+    token = _WORKERS.set(workers)
+    try:
+        if THREADS is None and workers == 1:
+            yield
+        else:
+            threads = max(1, (THREADS or _cpu_count()) // workers)
+            with _controller().limit(limits=threads, user_api="openmp"):
+                yield
+    finally:
+        _WORKERS.reset(token)
+
+
+def threads_per_call():
+    """Number of OpenMP threads used per call under the current policy"""
+    if THREADS is not None:
+        return THREADS
+    info = _controller().select(user_api="openmp").info()
+    return max((lib["num_threads"] for lib in info), default=_cpu_count())
+
+
+def render_metrics():
+    """Render the threading policy as a Prometheus gauge"""
+    metric = "demoland_native_threads"
+    return (
+        f"# HELP {metric} OpenMP threads per prediction call.\n"
+        f"# TYPE {metric} gauge\n"
+        f'{metric}{{policy="{POLICY or "default"}"}} {threads_per_call()}\n'
+    )
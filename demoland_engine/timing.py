@@ -0,0 +1,229 @@
+"""Lightweight timing of the engine stages
+
+Timing is disabled by default and enabled either by setting the ``DEMOLAND_TIMING``
+environment variable to ``1`` or by calling :func:`enable`. When disabled,
+:func:`stage` returns a shared no-op context manager, so the instrumentation costs
+a single function call per stage.
+
+Durations are aggregated into histograms labeled by study area and stage and can
+be exported in the Prometheus text format using :func:`render_metrics`. Durations
+of stages within a single request can be collected using :func:`collect`, even if
+timing is disabled, and formatted as a ``Server-Timing`` header using
+:func:`server_timing`.
+"""
+
+import contextvars
+import os
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+ENABLED = os.environ.get("DEMOLAND_TIMING", "0") == "1"
+
+# upper bounds of histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_NULL_STAGE = nullcontext()
+_LOCK = threading.Lock()
+_RECORDS = contextvars.ContextVar("demoland_timing_records", default=None)
+# stack of peaks of traced memory of open stages, set when collecting memory
+_PEAKS = contextvars.ContextVar("demoland_timing_peaks", default=None)
+
+# resets the peak of the traced memory, available since Python 3.9
+_RESET_PEAK = getattr(tracemalloc, "reset_peak", None)
+
+# (area, stage) -> [bucket counts..., count, sum]
+_HISTOGRAMS = {}
+# (name, area) -> value
+_COUNTERS = {}
+
+
+def enable(enabled=True):
+    """Enable or disable timing of the engine stages"""
+    global ENABLED
+    ENABLED = enabled
+
+
+def reset():
+    """Drop all the aggregated metrics"""
+    with _LOCK:
+        _HISTOGRAMS.clear()
+        _COUNTERS.clear()
+
+
+def _current_area():
+    from .data import FILEVAULT
+
+    return FILEVAULT["case"]
+
+
+def _within(entry, peak, current):
+    """Traced peak if reached within the stage of ``entry``, the current memory else
+
+    Without ``tracemalloc.reset_peak``, the traced peak is the peak since the
+    tracing started, so it is attributed to the stage only if it grew since.
+    """
+    if _RESET_PEAK is None and peak <= entry[2]:
+        return current
+    return peak
+
+
+class _Stage:
+    __slots__ = ("name", "area", "start", "peaks")
+
+    def __init__(self, name, area):
+        self.name = name
+        self.area = area
+
+    def __enter__(self):
+        self.peaks = _PEAKS.get()
+        if self.peaks is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            parent = self.peaks[-1]
+            parent[1] = max(parent[1], _within(parent, peak, current))
+            # memory at the start of the stage, the peak within it and the
+            # traced peak at the start
+            self.peaks.append([current, current, peak])
+            if _RESET_PEAK is not None:
+                _RESET_PEAK()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        peak_memory = None
+        if self.peaks is not None:
+            entry = self.peaks.pop()
+            current, traced = tracemalloc.get_traced_memory()
+            peak = max(entry[1], _within(entry, traced, current))
+            self.peaks[-1][1] = max(self.peaks[-1][1], peak)
+            peak_memory = peak - entry[0]
+        observe(self.name, duration, area=self.area, peak_memory=peak_memory)
+        return False
+
+
+def stage(name, area=None):
+    """Time a stage of the computation
+
+    Parameters
+    ----------
+    name : str
+        name of the stage
+    area : str, optional
+        study area label, defaults to the currently loaded area
+
+    Returns
+    -------
+    context manager
+
+    Examples
+    --------
+    >>> with timing.stage("sampling"):
+    ...     vars, jobs, gsp = get_data(df)
+    """
+    if not ENABLED and _RECORDS.get() is None:
+        return _NULL_STAGE
+    return _Stage(name, area)
+
+
+def observe(name, duration, area=None, peak_memory=None):
+    """Record a duration of a stage in seconds
+
+    The peak memory in bytes, allocated on top of the memory in use at the start
+    of the stage, is stored only in the collected records.
+    """
+    records = _RECORDS.get()
+    if records is not None:
+        records.append((name, duration, peak_memory))
+    if not ENABLED:
+        return
+    if area is None:
+        area = _current_area()
+    with _LOCK:
+        histogram = _HISTOGRAMS.get((area, name))
+        if histogram is None:
+            histogram = _HISTOGRAMS[(area, name)] = [0] * (len(BUCKETS) + 2)
+        histogram[bisect_left(BUCKETS, duration)] += 1
+        histogram[-2] += 1
+        histogram[-1] += duration
+
+
+def count(name, area=None, value=1):
+    """Increase a counter labeled by the study area"""
+    if not ENABLED:
+        return
+    if area is None:
+        area = _current_area()
+    with _LOCK:
+        _COUNTERS[(name, area)] = _COUNTERS.get((name, area), 0) + value
+
+
+@contextmanager
+def collect(memory=False):
+    """Collect durations of stages executed within the context
+
+    Parameters
+    ----------
+    memory : bool, default False
+        Track the peak memory allocated within each stage using
+        :mod:`tracemalloc`. This considerably slows down the computation.
+
+    Yields
+    ------
+    list
+        list of (stage, duration, peak memory) tuples filled when the stages
+        finish. The peak memory is None unless ``memory=True``.
+    """
+    records = []
+    token = _RECORDS.set(records)
+    if memory:
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        peaks_token = _PEAKS.set([[0, 0, 0]])
+    try:
+        yield records
+    finally:
+        _RECORDS.reset(token)
+        if memory:
+            _PEAKS.reset(peaks_token)
+            if not tracing:
+                tracemalloc.stop()
+
+
+def server_timing(records):
+    """Format collected durations as a value of the ``Server-Timing`` header"""
+    return ", ".join(
+        f"{name};dur={duration * 1000:.1f}" for name, duration, _ in records
+    )
+
+
+def render_metrics():
+    """Render the aggregated metrics in the Prometheus text exposition format"""
+    lines = []
+    with _LOCK:
+        counters = sorted(_COUNTERS.items())
+        histograms = sorted((key, list(value)) for key, value in _HISTOGRAMS.items())
+
+    for name in sorted({name for (name, _), _ in counters}):
+        lines.append(f"# TYPE demoland_{name}_total counter")
+        for (counter, area), value in counters:
+            if counter == name:
+                lines.append(f'demoland_{name}_total{{area="{area}"}} {value}')
+
+    if histograms:
+        metric = "demoland_stage_duration_seconds"
+        lines.append(f"# HELP {metric} Duration of the engine stages.")
+        lines.append(f"# TYPE {metric} histogram")
+    for (area, name), histogram in histograms:
+        labels = f'area="{area}",stage="{name}"'
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ("+Inf",), histogram[:-2]):
+            cumulative += n
+            lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{metric}_count{{{labels}}} {histogram[-2]}")
+        lines.append(f"{metric}_sum{{{labels}}} {histogram[-1]}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,44 @@
+"""Write the baseline indicators of study areas to be shipped with them
+
+Usage::
+
+    python -m demoland_engine.write_baselines [AREA ...] [--output DIR]
+
+The baseline of each area is written to ``DIR/AREA/baseline.joblib`` using
+:func:`demoland_engine.baselines.save_baseline` and its sha256 hash is printed,
+to be added to the registry of the area under the ``"baseline"`` key.
+"""
+
+import argparse
+import hashlib
+import os
+
+from . import data
+from .baselines import save_baseline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m demoland_engine.write_baselines",
+        description="Write the baseline indicators of study areas.",
+    )
+    parser.add_argument(
+        "areas", nargs="*", help="study areas, the default one if empty"
+    )
+    parser.add_argument(
+        "--output", default="data", help="directory with a folder per study area"
+    )
+    args = parser.parse_args(argv)
+
+    for area in args.areas or [data.FILEVAULT["case"]]:
+        data.change_area(area)
+        os.makedirs(os.path.join(args.output, area), exist_ok=True)
+        path = os.path.join(args.output, area, "baseline.joblib")
+        save_baseline(path)
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        print(f"{area}: {path} {digest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,63 @@ https://urban-analytics-technology-platform.github.io/demoland-project/book/deve
 
 or trigger the deploy_azure_functions GitHub Action:
 https://github.com/Urban-Analytics-Technology-Platform/demoland-engine/actions/workflows/deploy_azure_functions.yaml
+
+Areas listed in the ``DEMOLAND_PRELOAD_AREAS`` app setting (comma separated) are
+loaded when the host starts and kept in memory for its lifetime, so that even the
+first invocation is served warm. Other areas are loaded on demand and replace each
+other, unless the ``DEMOLAND_MEMORY_BUDGET`` app setting is set, in which case the
+most recently used areas are kept in memory within the budget.
 """
 
 import azure.functions as func
 import json
 import os
 import logging
+import time
+
+PRELOAD_AREAS = [
+    area.strip()
+    for area in os.environ.get("DEMOLAND_PRELOAD_AREAS", "").split(",")
+    if area.strip()
+]
+if PRELOAD_AREAS:
+    # set up the first preloaded area on import instead of the default one
+    os.environ.setdefault("DEMOLAND", PRELOAD_AREAS[0])
+
+from demoland_engine import data  # noqa: E402
+from demoland_engine.api import scenario_calc  # noqa: E402
+
+
+def _preload(areas):
+    for area in areas:
+        start = time.perf_counter()
+        try:
+            data.keep_resident([area])
+            # the response to the empty scenario is shared by all the invocations
+            scenario_calc({}, area)
+        except Exception as e:
+            data.RESIDENT.pop(area, None)
+            data.PINNED.discard(area)
+            logging.error("Preloading %s failed: %s", area, e)
+            continue
+        logging.info("Preloaded %s in %.3f s", area, time.perf_counter() - start)
+
+
+_preload(PRELOAD_AREAS)
+
+# artifacts used by every invocation, loaded by the first one for an area
+_WARM_ARTIFACTS = {"matrix", "accessibility", "aq_model", "hp_model", "baseline"}
+
+
+def _loaded(area):
+    """Names of the artifacts of an area held in memory"""
+    if data.FILEVAULT["case"] == area:
+        return set(data.FILEVAULT)
+    return set(data.RESIDENT.get(area, {}))
+
+
+# number of invocations served by this host
+_INVOCATIONS = 0
 
 app = func.FunctionApp()
 
@@ -19,6 +70,9 @@ app = func.FunctionApp()
 @app.function_name(name="DemoLandEngine")
 @app.route(route="scenario", auth_level=func.AuthLevel.ANONYMOUS)
 def test_function(req: func.HttpRequest) -> func.HttpResponse:
+    global _INVOCATIONS
+    _INVOCATIONS += 1
+    start = time.perf_counter()
     try:
         req_body = req.get_json()
         logging.info("Received request with body:")
@@ -26,9 +80,23 @@ def test_function(req: func.HttpRequest) -> func.HttpResponse:
 
         scenario = req_body["scenario_json"]
         model_identifier = req_body["model_identifier"]
-        os.environ["DEMOLAND"] = model_identifier
-        from demoland_engine.api import scenario_calc
-        pred_dict = scenario_calc(scenario, model_identifier)
+        # warm if the data of the area have been loaded by an earlier invocation
+        warm = _WARM_ARTIFACTS <= _loaded(model_identifier)
+        pred_dict = scenario_calc(
+            scenario,
+            model_identifier,
+            modes=req_body.get("modes"),
+            indicators=req_body.get("indicators"),
+            response=req.params.get("response", "full"),
+            tolerance=float(req.params.get("tolerance", 0)),
+        )
+        logging.info(
+            "%s invocation %d of %s took %.3f s",
+            "Warm" if warm else "Cold",
+            _INVOCATIONS,
+            model_identifier,
+            time.perf_counter() - start,
+        )
         return func.HttpResponse(json.dumps(pred_dict))
     except Exception as e:
         logging.error(e)
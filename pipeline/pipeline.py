@@ -29,8 +29,7 @@ import joblib
 import numpy as np
 import pandas as pd
 import requests
-import tracc
-import xarray as xr
+from demoland_engine import baselines, data
 from demoland_engine.indicators import Accessibility, Model
 from libpysal import graph
 from r5py import TransportMode, TransportNetwork, TravelTimeMatrixComputer
@@ -280,7 +279,9 @@ def main():
     empty_ttm.columns = ["from_id", "to_id"]
 
     # defining variables
-    max_time = dt.timedelta(seconds=900)  # SET TO 15 MIN
+    # horizon of the travel times, the accessibility can use any time within it
+    max_minutes = 60
+    max_time = dt.timedelta(minutes=max_minutes)
     walking_speed = 4.8
     cycling_speed = 16
 
@@ -346,10 +347,6 @@ def main():
 
     ttm = ttm_complete.set_index(["from_id", "to_id"])
     ttm.columns = ["transit", "car", "bike", "walk"]
-    ttm.columns.name = "mode"
-    ttm_arr = xr.DataArray.from_series(ttm.stack())
-    ttm_15 = ttm_arr <= 15
-    ttm_15.name = "ttm_15"
 
     wpz_population = grid_aoi[
         [
@@ -365,11 +362,6 @@ def main():
     ].sum(axis=1)
     wpz_population.index.name = "to_id"
 
-    da = xr.DataArray.from_series(wpz_population)
-    da.name = "wpz_population"
-    baseline = xr.merge([ttm_15, da])
-    baseline["wpz_population"] = baseline["wpz_population"].fillna(0)
-
     # Load greenspace data.
 
     gs_sites = gpd.read_file(f"{temp_folder}/greenspace.gpkg", layer="sites").rename(
@@ -379,85 +371,33 @@ def main():
         columns={"id": "id_entrance"}
     )
 
-    # associate park area to entrances
-    gs_entrances_with_parkarea = pd.merge(
-        gs_entrances[["id_entrance", "ref_to_greenspace_site"]],
-        gs_sites[["id_site", "function", "area_m2"]],
-        left_on="ref_to_greenspace_site",
-        right_on="id_site",
-        how="right",
-    )
-
-    ttm_greenspace = ttm_complete.copy()  # saving a copy of the matrix (the following operations will add columns to it, but we want to keep the original one also)
-
-    ttm_gs_with_area = pd.merge(
-        ttm_greenspace,
-        gs_entrances_with_parkarea[
-            ["id_entrance", "ref_to_greenspace_site", "area_m2"]
-        ],
-        left_on="to_id",
-        right_on="id_entrance",
-        how="left",
-    )
-    # generate tracc cost object
-    ttm_gs_tracc = tracc.costs(ttm_gs_with_area)
-
-    modes_list = ["transit", "car", "bicycle", "walk"]
-
-    # empty dataframes to be filled up in the next for loop
-    gs_acc = []
-
-    for m in modes_list:
-        # generate variable names to be used in the tracc function below
-        cost_name = "time_" + m
-        impedence_param = 15  # value for impedence function, to be changed as needed
-        impedence_param_string = str(impedence_param)
-        # name of the column
-        cost_output = (
-            "cum_" + impedence_param_string + "_" + m
-        )  # naming depends on impedence function threshold
-        area_column_name = "area_" + impedence_param_string + "_" + m
-        # Computing impedence function based on a 15 minute travel time threshold.
-        ttm_gs_tracc.impedence_calc(
-            cost_column=cost_name,
-            impedence_func="cumulative",
-            impedence_func_params=impedence_param,  # to calculate opportunities in X min threshold
-            output_col_name=cost_output,
-            prune_output=False,
+    # travel time to a greenspace site is the travel time to its closest entrance
+    ttm_sites = (
+        ttm.reset_index()
+        .merge(
+            gs_entrances[["id_entrance", "ref_to_greenspace_site"]],
+            left_on="to_id",
+            right_on="id_entrance",
         )
-        ttm_gs_df = ttm_gs_tracc.data
-        # Setting up the accessibility object. This includes joining the destination data to the travel time data
-        # this needed to be done differently for greenspace, as opportunity is sites's area cumulative sum
-        # A. Filtering only rows with time travel within the threshold
-        ttm_gs_tracc.data[area_column_name] = (
-            ttm_gs_tracc.data["area_m2"] * ttm_gs_tracc.data[cost_output]
-        )
-        ttm_gs_df = ttm_gs_tracc.data
-
-        # B. Filter entrances (only one per park)
-        oneaccess_perpark = ttm_gs_df.sort_values(cost_name).drop_duplicates(
-            ["from_id", "ref_to_greenspace_site"]
-        )
-        # C. Assign metric as sum[parks' area]
-        # generate df with one row per OA centroid ('from_id') and sum of sites' areas - per each mode
-        gs_metric_per_mode = oneaccess_perpark.groupby(["from_id"])[
-            area_column_name
-        ].sum()  # .reset_index()
-        gs_acc.append(gs_metric_per_mode)
-    gs_acc = pd.concat(gs_acc, axis=1)
-
-    gs_acc.to_parquet(f"{temp_folder}/acc_greenspace_allmodes_15min.parquet")
-
-    gs_acc.columns = ["transit", "car", "bike", "walk"]
-    greenspace = xr.DataArray.from_series(gs_acc.stack()).rename({"level_1": "mode"})
-    greenspace.name = "green_accessibility"
+        .groupby(["from_id", "ref_to_greenspace_site"])[ttm.columns]
+        .min()
+        .rename_axis(["from_id", "to_id"])
+    )
+    entrances = ttm.index.get_level_values("to_id").isin(gs_entrances.id_entrance)
+    ttm = pd.concat([ttm[~entrances], ttm_sites])
 
-    baseline = xr.merge([baseline, greenspace])
-    baseline["green_accessibility"] = baseline["green_accessibility"].fillna(0)
+    green_area = gs_sites.set_index("id_site")["area_m2"]
+    green_area.index.name = "to_id"
 
-    # Create demoland class
+    # Create demoland class storing sparse travel times per mode
 
-    acc = Accessibility(baseline)
+    acc = Accessibility.from_travel_times(
+        ttm,
+        wpz_population,
+        green_area=green_area,
+        threshold=15,
+        max_minutes=max_minutes,
+    )
 
     with open(f"{engine_folder}/{name}/accessibility.joblib", "wb") as f:
         joblib.dump(acc, f, compress=True)
@@ -546,8 +486,8 @@ def main():
         {
             "air_quality": pd.Series(baseline_aq, index=grid_aoi.index),
             "house_price": pd.Series(baseline_hp, index=grid_aoi.index),
-            "job_accessibility": baseline_ja.to_series(),
-            "greenspace_accessibility": baseline_ga.to_series()
+            "job_accessibility": baseline_ja,
+            "greenspace_accessibility": baseline_ga
         }
     ).reindex(grid_aoi.index)
     baseline["signature_type"] = grid_aoi.signature_type.map(mapping)
@@ -586,6 +526,28 @@ def main():
         columns={"signature_type": "primary_type"}
     ).to_parquet(f"{engine_folder}/{name}/oa_key.parquet")
 
+    # Baseline indicators of all modes, shipped under the "baseline" key so the
+    # engine does not compute them on the first request. The local files are
+    # registered under their keys, the global ones are shared with other areas.
+    local_folder = tempfile.mkdtemp()
+    for fp in glob(f"{engine_folder}/{name}/*"):
+        key = os.path.basename(fp).split(".")[0]
+        shutil.copyfile(fp, f"{local_folder}/{key}")
+    data.register_area(name, local_folder)
+    shared = data.files["tyne_and_wear_hex"]
+    for key in [
+        "air_quality_model",
+        "house_price_model",
+        "median_form",
+        "median_function",
+        "iqr_form",
+        "iqr_function",
+    ]:
+        data.files[name]["registry"][key] = shared["registry"][key]
+        data.files[name]["urls"][key] = shared["urls"][key]
+    data.change_area(name)
+    baselines.save_baseline(f"{engine_folder}/{name}/baseline.joblib")
+
     # Generate sha256
 
     registry = {}
@@ -607,7 +569,8 @@ def main():
     Next steps are manual.
     
     14. Take the folder with engine files and upload it to `Urban-Analytics-Technology-Platform/demoland-engine/data/`.
-    15. Use the information in `sha256.py` to update `data.py` in the `demoland_engine` code.
+    15. Use the information in `hashes.json` to update `data.py` in the `demoland_engine` code,
+        including the `baseline` key pointing to `baseline.joblib`.
     16. Take the folder with the app files and use it to generate the app.
     """)
 